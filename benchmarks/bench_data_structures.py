@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Queue and PriorityQueue builtins against the list-based
+implementations they replaced.
+
+Usage: python3 benchmarks/bench_data_structures.py [sizes...]
+Default sizes: 100000 1000000 (the list-based versions are only run up to
+LEGACY_LIMIT elements, since they are quadratic).
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import Queue, PriorityQueue
+
+LEGACY_LIMIT = 100000
+
+
+class LegacyQueue:
+    def __init__(self):
+        self._items = []
+
+    def enqueue(self, item):
+        self._items.append(item)
+        return self
+
+    def dequeue(self):
+        if self._items:
+            return self._items.pop(0)
+        return None
+
+
+class LegacyPriorityQueue:
+    def __init__(self):
+        self._items = []
+
+    def enqueue(self, item, priority):
+        self._items.append((priority, item))
+        self._items.sort(key=lambda x: x[0])
+        return self
+
+    def dequeue(self):
+        if self._items:
+            return self._items.pop(0)[1]
+        return None
+
+
+def bench_queue(cls, n):
+    queue = cls()
+    start = time.perf_counter()
+    for i in range(n):
+        queue.enqueue(i)
+    for _ in range(n):
+        queue.dequeue()
+    return time.perf_counter() - start
+
+
+def bench_priority_queue(cls, n, priorities):
+    queue = cls()
+    start = time.perf_counter()
+    for i, priority in enumerate(priorities):
+        queue.enqueue(i, priority)
+    for _ in range(n):
+        queue.dequeue()
+    return time.perf_counter() - start
+
+
+def bench_push_many(n, priorities):
+    start = time.perf_counter()
+    queue = PriorityQueue()
+    queue.push_many([[i, priority] for i, priority in enumerate(priorities)])
+    for _ in range(n):
+        queue.dequeue()
+    return time.perf_counter() - start
+
+
+def report(name, n, seconds):
+    print(f"  {name:<32} {seconds:10.3f}s  {n / seconds:14,.0f} ops/s")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    random.seed(42)
+    for n in sizes:
+        print(f"n = {n:,}")
+        report("Queue (deque)", n, bench_queue(Queue, n))
+        if n <= LEGACY_LIMIT:
+            report("Queue (legacy list)", n, bench_queue(LegacyQueue, n))
+        priorities = [random.randint(0, n) for _ in range(n)]
+        report("PriorityQueue (heapq)", n, bench_priority_queue(PriorityQueue, n, priorities))
+        report("PriorityQueue.push_many", n, bench_push_many(n, priorities))
+        # Re-sorting on every insert is far too slow beyond a few thousand
+        legacy_n = min(n, LEGACY_LIMIT // 20)
+        report(f"PriorityQueue (legacy, n={legacy_n:,})", legacy_n,
+               bench_priority_queue(LegacyPriorityQueue, legacy_n, priorities[:legacy_n]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark net.fetch_all against sequential http_get calls on a local server
+that answers every request after a fixed delay.
+
+Usage: python3 benchmarks/bench_fetch_all.py [requests] [delay_ms]
+Default: 64 requests, 50ms per response, concurrency 1 to 32.
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import HTTPSession, fetch_all
+
+CONCURRENCY = [1, 2, 4, 8, 16, 32]
+
+
+class DelayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    delay = 0.05
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = self.path.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connection bursts, adding SYN retries
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def report(name, n, seconds, baseline):
+    print(f"  {name:<28} {seconds:8.3f}s  {n / seconds:10,.1f} req/s  {baseline / seconds:6.1f}x")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    DelayHandler.delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    server = Server(('127.0.0.1', 0), DelayHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f'http://127.0.0.1:{server.server_address[1]}/item/{i}' for i in range(n)]
+    print(f"{n} requests, {DelayHandler.delay * 1000:.0f}ms per response")
+    try:
+        with HTTPSession() as session:
+            start = time.perf_counter()
+            for url in urls:
+                session.get(url)
+            baseline = time.perf_counter() - start
+        report("sequential http_get", n, baseline, baseline)
+        for concurrency in CONCURRENCY:
+            start = time.perf_counter()
+            results = fetch_all(None, urls, concurrency)
+            seconds = time.perf_counter() - start
+            assert all(result['ok'] for result in results)
+            report(f"fetch_all(concurrency={concurrency})", n, seconds, baseline)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark JWT verification: a reused web.jwt_signer against the previous
+jwt_decode, which re-imported its modules and re-keyed HMAC per token.
+
+Distinct tokens exercise the full signature check; the gateway case
+verifies requests from a smaller set of clients that reuse their tokens.
+
+Usage: python3 benchmarks/bench_jwt.py [tokens] [clients]
+Default: 20000 tokens, 500 clients.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import jwt_signer
+
+SECRET = 'gateway-secret'
+
+
+def legacy_encode(payload, secret):
+    # The encoder and decoder jwt_encode/jwt_decode used before jwt_signer
+    header_b64 = base64.b64encode(json.dumps({'typ': 'JWT', 'alg': 'HS256'}).encode()).decode()
+    payload_b64 = base64.b64encode(json.dumps(payload).encode()).decode()
+    signing_input = header_b64 + '.' + payload_b64
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return signing_input + '.' + base64.b64encode(signature).decode()
+
+
+def legacy_decode(token, secret):
+    import hmac
+    import hashlib
+    import json
+    import base64
+    header_b64, payload_b64, signature_b64 = token.split('.')
+    signing_input = header_b64 + '.' + payload_b64
+    expected = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    if signature_b64 != base64.b64encode(expected).decode():
+        return None
+    return json.loads(base64.b64decode(payload_b64).decode())
+
+
+def report(name, n, seconds, baseline):
+    print(f"  {name:<28} {n / seconds:12,.0f} tokens/s  {baseline / seconds:6.1f}x")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    signer = jwt_signer(SECRET)
+    payloads = [{'sub': i, 'role': 'user', 'exp': time.time() + 3600} for i in range(n)]
+    legacy_tokens = [legacy_encode(payload, SECRET) for payload in payloads]
+    tokens = [signer.sign(payload) for payload in payloads]
+    print(f"{n} distinct HS256 tokens")
+
+    start = time.perf_counter()
+    assert all(legacy_decode(token, SECRET) for token in legacy_tokens)
+    baseline = time.perf_counter() - start
+    report("jwt_decode (previous)", n, baseline, baseline)
+
+    start = time.perf_counter()
+    assert all(signer.verify(token) for token in tokens)
+    report("signer.verify", n, time.perf_counter() - start, baseline)
+
+    signer = jwt_signer(SECRET)
+    start = time.perf_counter()
+    assert all(signer.verify_many(tokens))
+    report("signer.verify_many", n, time.perf_counter() - start, baseline)
+
+    print(f"{n} requests from {clients} clients")
+    legacy_requests = [legacy_tokens[i % clients] for i in range(n)]
+    requests = [tokens[i % clients] for i in range(n)]
+    start = time.perf_counter()
+    assert all(legacy_decode(token, SECRET) for token in legacy_requests)
+    baseline = time.perf_counter() - start
+    report("jwt_decode (previous)", n, baseline, baseline)
+
+    signer = jwt_signer(SECRET)
+    start = time.perf_counter()
+    assert all(signer.verify_many(requests))
+    report("signer.verify_many", n, time.perf_counter() - start, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark web.render_template against the previous str.replace renderer.
+
+The page substitutes the same number of values both ways; the compiled
+engine additionally escapes every value and builds the rows with a loop.
+
+Usage: python3 benchmarks/bench_templates.py [rows] [renders]
+Default: 200 rows, 200 renders.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import render_template
+
+
+def replace_render(template_string, context):
+    # The renderer render_template used before templates were compiled
+    result = template_string
+    for key, value in context.items():
+        result = result.replace('{{' + key + '}}', str(value))
+    return result
+
+
+def timed(render, renders):
+    start = time.perf_counter()
+    for _ in range(renders):
+        output = render()
+    return (time.perf_counter() - start) / renders, output
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    renders = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    users = [{'name': f'user{i}', 'email': f'user{i}@example.com'} for i in range(rows)]
+    flat = {f'name{i}': user['name'] for i, user in enumerate(users)}
+    flat.update({f'email{i}': user['email'] for i, user in enumerate(users)})
+    flat_page = '<table>' + ''.join(f'<tr><td>{{{{name{i}}}}}</td><td>{{{{email{i}}}}}</td></tr>'
+                                    for i in range(rows)) + '</table>'
+    page = ('<table>{% for user in users %}'
+            '<tr><td>{{ user.name }}</td><td>{{ user.email }}</td></tr>'
+            '{% endfor %}</table>')
+    print(f"{rows} rows, {renders} renders")
+    baseline, expected = timed(lambda: replace_render(flat_page, flat), renders)
+    seconds, output = timed(lambda: render_template(None, page, {'users': users}), renders)
+    assert output == expected
+    print(f"  {'str.replace loop':<20} {baseline * 1e6:10,.0f} us/render")
+    print(f"  {'compiled template':<20} {seconds * 1e6:10,.0f} us/render  {baseline / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark web.serve with a small keep-alive load generator.
+
+Each client thread holds one pooled connection and sends requests back to
+back; the table reports requests per second for a script handler with a
+path parameter, a handler that blocks for 10ms, a static file, and a static
+file revalidated with ETag. Slow handlers run concurrently, so the 10ms row
+should approach clients x 100 req/s; one handler at a time caps it at 100.
+
+Usage: python3 benchmarks/bench_web_server.py [clients] [requests_per_client]
+Default: 8 clients, 250 requests each, for both worker models.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import Interpreter, get_ast, HTTPSession
+from shiboscript.webserver import WebServer
+
+APP = '\n'.join([
+    'var server = web.create_web_server(0)',
+    'func show_user(request) {',
+    '    return "user " + request["params"]["id"]',
+    '}',
+    'func slow(request) {',
+    '    time.sleep(0.01)',
+    '    return "done"',
+    '}',
+    'web.add_route(server, "/users/:id", "GET", show_user)',
+    'web.add_route(server, "/slow", "GET", slow)',
+])
+
+
+def load(base, path, clients, requests, headers=None):
+    def client():
+        with HTTPSession(retries=0) as session:
+            for _ in range(requests):
+                session.get(base + path, headers)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return clients * requests / (time.perf_counter() - start)
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    print(f"{clients} keep-alive clients x {requests} requests")
+    with tempfile.TemporaryDirectory() as static:
+        with open(os.path.join(static, 'page.html'), 'w') as f:
+            f.write('<p>' + 'x' * 16384 + '</p>')
+        for model in WebServer.MODELS:
+            interpreter = Interpreter()
+            interpreter.eval(get_ast(APP))
+            config = interpreter.env['server']
+            config['static_files']['/static'] = static
+            server = WebServer(config, interpreter, model=model, workers=max(clients, 4))
+            base = f'http://127.0.0.1:{server.start()}'
+            try:
+                etag = HTTPSession().get(base + '/static/page.html')['headers']['ETag']
+                print(f"  {model}")
+                for name, path, count, headers in (
+                        ('script handler', '/users/42', requests, None),
+                        ('slow handler (10ms)', '/slow', max(1, requests // 10), None),
+                        ('static file (16KB)', '/static/page.html', requests, None),
+                        ('static file, 304', '/static/page.html', requests, {'If-None-Match': etag})):
+                    print(f"    {name:<22} {load(base, path, clients, count, headers):10,.0f} req/s")
+            finally:
+                server.stop()
+
+
+if __name__ == "__main__":
+    main()
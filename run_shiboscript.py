@@ -11,18 +11,19 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 try:
-    from shiboscript.core import repl, run_file
+    from shiboscript.core import repl, run_file, parse_run_options
     
     def main():
-        if len(sys.argv) > 1:
+        options, args = parse_run_options(sys.argv[1:])
+        if args:
             # If a file is provided, run it
-            filename = sys.argv[1]
+            filename = args[0]
             if os.path.exists(filename):
                 print(f"Running {filename}...")
-                run_file(filename)
+                run_file(filename, **options)
             else:
                 print(f"File not found: {filename}")
-                print("Usage: python3 run_shiboscript.py [filename.shibo]")
+                print("Usage: python3 run_shiboscript.py [--engine=interp|pycode] [--jit-threshold=N] [filename.shibo]")
                 print("Or run without arguments to start REPL")
         else:
             # Otherwise, start the REPL
@@ -1,21 +1,25 @@
 """Command Line Interface for ShiboScript"""
 import sys
 import os
-from ..shiboscript.core import run_file, repl
+from ..shiboscript.core import run_file, repl, parse_run_options
 
 def main():
     """Main CLI entry point"""
-    if len(sys.argv) > 1:
+    options, args = parse_run_options(sys.argv[1:])
+    if args:
         # Check if it's a command
-        command = sys.argv[1]
+        command = args[0]
         
         if command == "repl":
             repl()
         elif command == "run":
-            if len(sys.argv) > 2:
-                run_file(sys.argv[2])
+            if len(args) > 1:
+                run_file(args[1], **options)
             else:
                 print("Usage: shiboscript run <filename>")
+        elif command == "serve-workers":
+            from ..shiboscript.core import serve_workers_main
+            serve_workers_main(args[1:])
         elif command == "version":
             print("ShiboScript v0.3.0")
         elif command == "help":
@@ -23,7 +27,7 @@ def main():
         else:
             # Assume it's a filename
             if os.path.exists(command):
-                run_file(command)
+                run_file(command, **options)
             else:
                 print(f"File not found: {command}")
                 print("Use 'shiboscript help' for usage information")
@@ -40,6 +44,12 @@ Usage:
     shiboscript repl              # Start REPL
     shiboscript run <file>        # Run a .shibo file
     shiboscript <file>            # Run a .shibo file
+    shiboscript run <file> --engine=pycode
+                                  # Run as a cached CPython code object
+    shiboscript run <file> --jit-threshold=100
+                                  # Compile functions after 100 calls/iterations
+    shiboscript serve-workers     # Serve jobs from pre-forked interpreters
+        [--workers=N] [--socket=PATH] [--preload=mod1,mod2] [--timeout=SECONDS]
     shiboscript version           # Show version
     shiboscript help              # Show this help
 
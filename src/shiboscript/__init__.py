@@ -6,7 +6,9 @@ from .core import (
     Lexer, Parser, Interpreter, ShiboClass, ShiboInstance,
     run_file, repl, eval_expression, get_ast, disassemble_bytecode,
     compile_file, run_compiled_bytecode, ShiboVM, BytecodeGenerator,
-    Optimizer, ShiboModule, ShiboPackageManager, ShiboCompilerBackend
+    Optimizer, ShiboModule, ShiboPackageManager, ShiboCompilerBackend,
+    PythonTranspiler, PyCodeGenerator, compile_file_to_code, run_code,
+    jit_stats, set_jit_threshold
 )
 from .compiler import ShiboCompiler, ShiboScriptCompiler
 
@@ -17,5 +19,7 @@ __all__ = [
     'run_file', 'repl', 'eval_expression', 'get_ast', 'disassemble_bytecode',
     'compile_file', 'run_compiled_bytecode', 'ShiboVM', 'BytecodeGenerator',
     'Optimizer', 'ShiboModule', 'ShiboPackageManager', 'ShiboCompilerBackend',
+    'PythonTranspiler', 'PyCodeGenerator', 'compile_file_to_code', 'run_code',
+    'jit_stats', 'set_jit_threshold',
     'ShiboCompiler', 'ShiboScriptCompiler'
 ]
\ No newline at end of file
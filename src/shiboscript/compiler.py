@@ -10,7 +10,8 @@ from typing import Any, Dict, List, Optional, Union
 from pathlib import Path
 import tempfile
 import subprocess
-from .core import Lexer, Parser, Interpreter
+import py_compile
+from .core import Lexer, Parser, Interpreter, PythonTranspiler
 
 
 class CompilationError(Exception):
@@ -76,87 +77,17 @@ class ShiboCompiler:
         """
         Convert ShiboScript AST to Python code
         """
-        if hasattr(ast_node, 'statements'):
-            # Program node
-            code_lines = []
-            for stmt in ast_node.statements:
-                code_lines.append(self._convert_statement(stmt))
-            return '\n'.join(code_lines)
-        else:
-            return self._convert_statement(ast_node)
-    
-    def _convert_statement(self, stmt) -> str:
-        """
-        Convert individual statement to Python code
-        """
-        from collections import namedtuple
-        
-        # Handle different statement types
-        if hasattr(stmt, '_fields') and 'name' in stmt._fields:
-            if hasattr(stmt, 'params') and hasattr(stmt, 'body'):
-                # Function definition
-                params = ', '.join(stmt.params) if stmt.params else ''
-                body_lines = []
-                for sub_stmt in stmt.body:
-                    body_lines.append('    ' + self._convert_statement(sub_stmt))
-                
-                return f"def {stmt.name}({params}):\n" + '\n'.join(body_lines)
-            elif hasattr(stmt, 'value'):
-                # Variable declaration
-                value_code = self._convert_expression(stmt.value)
-                return f"{stmt.name} = {value_code}"
-        elif hasattr(stmt, 'condition'):
-            # If statement
-            condition_code = self._convert_expression(stmt.condition)
-            then_lines = []
-            for sub_stmt in stmt.then_branch:
-                then_lines.append('    ' + self._convert_statement(sub_stmt))
-            
-            code = f"if {condition_code}:\n" + '\n'.join(then_lines)
-            
-            if stmt.else_branch:
-                else_lines = []
-                for sub_stmt in stmt.else_branch:
-                    else_lines.append('    ' + self._convert_statement(sub_stmt))
-                code += f"\nelse:\n" + '\n'.join(else_lines)
-            
-            return code
-        elif type(stmt).__name__ == 'PrintStmt':
-            # Print statement - check this first to avoid general expression catch-all
-            expr_code = self._convert_expression(stmt.expression)
-            return f"print({expr_code})"
-        elif hasattr(stmt, 'expression'):
-            # General expression statement
-            expr_code = self._convert_expression(stmt.expression)
-            return f"{expr_code}"
-        
-        return "# Unhandled statement"
+        return PythonTranspiler(optimize=self.optimize_level > 0).transpile(ast_node)
     
-    def _convert_expression(self, expr) -> str:
+    def compile_to_code(self, code: str, filename: str = '<shiboscript>'):
         """
-        Convert expression to Python code
+        Compile ShiboScript code to a CPython code object
         """
-        if hasattr(expr, 'value'):
-            if hasattr(expr, '_fields') and 'value' in expr._fields:
-                if isinstance(expr.value, (int, float)):
-                    return str(expr.value)
-                elif isinstance(expr.value, str):
-                    return f'"{expr.value}"'
-                elif isinstance(expr.value, bool):
-                    return str(expr.value)
-            elif hasattr(expr, 'name'):
-                return expr.name
-        elif hasattr(expr, 'left') and hasattr(expr, 'right'):
-            # Binary operation
-            left_code = self._convert_expression(expr.left)
-            right_code = self._convert_expression(expr.right)
-            return f"({left_code} {expr.op} {right_code})"
-        elif hasattr(expr, 'operand'):
-            # Unary operation
-            operand_code = self._convert_expression(expr.operand)
-            return f"{expr.op}{operand_code}"
-        
-        return "None"
+        python_code = self.compile_to_python(code)
+        try:
+            return compile(python_code, filename, 'exec')
+        except SyntaxError as e:
+            raise CompilationError(f"Generated Python failed to compile: {str(e)}")
     
     def execute_compiled(self, code: str, use_interpreter: bool = True):
         """
@@ -171,8 +102,9 @@ class ShiboCompiler:
             return self.interpreter.eval(ast_tree)
         else:
             # Compile to Python and execute
-            python_code = self.compile_to_python(code)
-            exec(python_code, globals())
+            namespace = {'__name__': '__main__'}
+            exec(self.compile_to_code(code), namespace)
+            return namespace
     
     def compile_and_save(self, code: str, output_path: str):
         """
@@ -230,6 +162,8 @@ class ShiboScriptCompiler:
                 f.write("# Source: " + input_file + "\n\n")
                 f.write(python_code)
             
+            # Byte-compile right away so CPython can reuse the cached .pyc
+            py_compile.compile(output_file, doraise=True)
             return output_file
         else:
             bytecode = self.compiler.compile_to_bytecode(code)
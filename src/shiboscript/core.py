@@ -15,101 +15,581 @@ from typing import Any, Dict, List, Optional, Union, Callable
 # Enhanced AST Node Classes with more Python-like features
 
 import re
-from collections import namedtuple
+from collections import ChainMap, namedtuple, OrderedDict, deque
+import copy
+import heapq
+import itertools
 from PIL import Image
 import math
 import sys
+import builtins as python_builtins
+import keyword
 import urllib.request
 import urllib.parse
+import urllib.error
+import http.client
+import zlib
 import base64
+import binascii
 import hashlib
+import hmac
+import html
+import codecs
+import io
 import subprocess
 import os
 import random
+import select
 import string
 import json
 import time
 import datetime
 import sqlite3
+import threading
+import pickle
+import operator
+import importlib.util
+import marshal
+import struct
+import weakref
+import atexit
+import multiprocessing
 
 # Database ORM Implementation
+class ConnectionPool:
+    """Hand out one sqlite3 connection per thread for a database file.
+    
+    File databases are opened in WAL mode so readers in other threads run
+    alongside a writer; busy_timeout makes writers wait for each other
+    instead of failing. ":memory:" maps to a shared-cache in-memory database
+    so every thread sees the same tables. Shared-cache table locks fail at
+    once rather than honouring busy_timeout, so writers to a memory database
+    take write_lock in turn instead.
+    """
+    
+    PRAGMAS = ("synchronous", "cache_size", "mmap_size", "temp_store", "foreign_keys", "journal_size_limit")
+    
+    def __init__(self, db_path=":memory:", cached_statements=256, wal=True, busy_timeout=5000, pragmas=None):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self.wal = wal
+        self.busy_timeout = busy_timeout
+        self.pragmas = dict(pragmas or {})
+        for name in self.pragmas:
+            if name not in self.PRAGMAS:
+                raise ValidationError(f"Unsupported pragma '{name}'")
+        self.memory = db_path == ":memory:"
+        self.uri = f"file:shiboscript-{id(self)}?mode=memory&cache=shared" if self.memory else db_path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        # Held for each write statement, and from begin() to the outermost
+        # commit() or rollback(), by one thread at a time
+        self.write_lock = threading.RLock() if self.memory else None
+        self.connections = []
+    
+    def get(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = self.connect()
+        return connection
+    
+    def connect(self):
+        # sqlite3 keeps cached_statements prepared statements per connection
+        connection = sqlite3.connect(self.uri, uri=self.memory, cached_statements=self.cached_statements,
+                                     timeout=self.busy_timeout / 1000, check_same_thread=False)
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        if self.memory:
+            # Shared-cache readers would otherwise block on table locks
+            connection.execute("PRAGMA read_uncommitted = 1")
+        elif self.wal:
+            connection.execute("PRAGMA journal_mode = WAL")
+        for name, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {name} = {value if isinstance(value, (int, float)) else repr(str(value))}")
+        with self.lock:
+            self.connections.append(connection)
+        return connection
+    
+    def close_all(self):
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            connection.close()
+        self.local = threading.local()
+
 class Database:
-    def __init__(self, db_path=":memory:"):
+    # Distinct (operation, table, columns) shapes kept in sql_cache
+    SQL_CACHE_SIZE = 1024
+    # Statements that never need the memory database's write lock
+    READ_STATEMENTS = ("SELECT", "EXPLAIN", "PRAGMA")
+    
+    def __init__(self, db_path=":memory:", cached_statements=256, wal=True, busy_timeout=5000, pragmas=None):
         self.db_path = db_path
-        self.connection = None
-        self.cursor = None
+        self.pool = None
         self.models = {}
+        self.cached_statements = cached_statements
+        self.wal = wal
+        self.busy_timeout = busy_timeout
+        self.pragmas = pragmas
+        self.sql_cache = {}
+        # Model caches skip tables that an open transaction has written to,
+        # and keep a result only if no write landed while it was read
+        self.cache_lock = threading.RLock()
+        self.pending_writes = {}
+        self.generation = 0
+        # Cursor, open transaction depth, last insert id and the tables the
+        # open transaction wrote to belong to the calling thread's connection.
+        self.local = threading.local()
     
     def connect(self):
-        self.connection = sqlite3.connect(self.db_path)
-        self.cursor = self.connection.cursor()
+        if self.pool is None:
+            self.pool = ConnectionPool(self.db_path, self.cached_statements, self.wal, self.busy_timeout, self.pragmas)
+        self.pool.get()
         return self
     
     def disconnect(self):
-        if self.connection:
-            self.connection.close()
+        if self.pool:
+            self.pool.close_all()
+            self.pool = None
+            self.local = threading.local()
+    
+    @property
+    def connection(self):
+        return self.pool.get() if self.pool else None
+    
+    @property
+    def cursor(self):
+        cursor = getattr(self.local, "cursor", None)
+        if cursor is None:
+            cursor = self.local.cursor = self.connection.cursor()
+        return cursor
+    
+    @property
+    def transaction_depth(self):
+        return getattr(self.local, "transaction_depth", 0)
+    
+    @transaction_depth.setter
+    def transaction_depth(self, value):
+        self.local.transaction_depth = value
+    
+    @property
+    def last_insert_id(self):
+        return getattr(self.local, "last_insert_id", None)
+    
+    @last_insert_id.setter
+    def last_insert_id(self, value):
+        self.local.last_insert_id = value
+    
+    def write_lock(self, query):
+        """Return the lock a statement must hold, or a no-op context"""
+        lock = self.pool.write_lock
+        # A transaction already holds the lock from begin()
+        if lock is None or self.transaction_depth or query.lstrip()[:7].upper().startswith(self.READ_STATEMENTS):
+            return contextlib.nullcontext()
+        return lock
     
     def execute(self, query, params=None):
         if not self.connection:
             self.connect()
         try:
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
-            self.connection.commit()
+            with self.write_lock(query):
+                if params:
+                    self.cursor.execute(query, params)
+                else:
+                    self.cursor.execute(query)
+                # Inside a transaction the commit is deferred to commit()
+                if not self.transaction_depth:
+                    self.connection.commit()
             return self.cursor.fetchall()
         except Exception as e:
             raise DatabaseError(f"Database query failed: {str(e)}", query)
     
+    def executemany(self, query, rows):
+        if not self.connection:
+            self.connect()
+        try:
+            with self.write_lock(query):
+                self.cursor.executemany(query, rows)
+                if not self.transaction_depth:
+                    self.connection.commit()
+            return self.cursor.rowcount
+        except Exception as e:
+            raise DatabaseError(f"Database query failed: {str(e)}", query)
+    
+    def iterate(self, query, params=None, batch_size=500, row_format="tuple"):
+        """Yield rows lazily, fetching batch_size rows at a time.
+        
+        row_format is "tuple" or "row" (sqlite3.Row, indexable by name).
+        """
+        if not self.connection:
+            self.connect()
+        # A private cursor, so queries run while iterating do not reset it
+        cursor = self.connection.cursor()
+        if row_format == "row":
+            cursor.row_factory = sqlite3.Row
+        try:
+            cursor.execute(query, params or [])
+        except Exception as e:
+            cursor.close()
+            raise DatabaseError(f"Database query failed: {str(e)}", query)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+    
+    # Nested begin() calls open savepoints, so an inner rollback undoes only
+    # the inner block's writes and the outer transaction carries on
+    def begin(self):
+        if not self.connection:
+            self.connect()
+        depth = self.transaction_depth
+        if depth:
+            self.cursor.execute(f"SAVEPOINT shibo_{depth}")
+        else:
+            if self.pool.write_lock is not None:
+                self.pool.write_lock.acquire()
+            if not self.connection.in_transaction:
+                # An explicit BEGIN, so the first savepoint nests inside it
+                # rather than starting (and on RELEASE, committing) one
+                self.cursor.execute("BEGIN")
+        self.transaction_depth = depth + 1
+        return self
+    
+    def commit(self):
+        depth = self.transaction_depth
+        if depth > 1:
+            self.cursor.execute(f"RELEASE SAVEPOINT shibo_{depth - 1}")
+            self.transaction_depth = depth - 1
+        elif self.connection:
+            try:
+                self.connection.commit()
+            finally:
+                self.end_transaction(depth)
+        return self
+    
+    def rollback(self):
+        depth = self.transaction_depth
+        if depth > 1:
+            self.cursor.execute(f"ROLLBACK TO SAVEPOINT shibo_{depth - 1}")
+            self.cursor.execute(f"RELEASE SAVEPOINT shibo_{depth - 1}")
+            self.transaction_depth = depth - 1
+        elif self.connection:
+            try:
+                self.connection.rollback()
+            finally:
+                self.end_transaction(depth)
+        # Results read inside the transaction may include undone writes
+        self.invalidate()
+        return self
+    
+    def end_transaction(self, depth):
+        self.transaction_depth = 0
+        if depth != 1:
+            return
+        # Other threads may have cached the old rows while the writes were
+        # pending, so the tables are invalidated again once they land
+        touched = getattr(self.local, "touched", None)
+        if touched:
+            self.local.touched = set()
+            with self.cache_lock:
+                for table_name in touched:
+                    self.pending_writes[table_name] -= 1
+                    self.invalidate(table_name)
+        # Only the outermost begin() took the write lock
+        if self.pool.write_lock is not None:
+            self.pool.write_lock.release()
+    
+    def transaction(self):
+        return Transaction(self)
+    
     def create_table(self, table_name, columns):
         columns_def = ", ".join([f"{name} {type_def}" for name, type_def in columns.items()])
         query = f"CREATE TABLE IF NOT EXISTS {table_name} ({columns_def})"
         return self.execute(query)
     
+    def sql_text(self, operation, table_name, columns=(), where=()):
+        """Return the SQL for an ORM operation, built once per column set"""
+        key = (operation, table_name, columns, where)
+        query = self.sql_cache.get(key)
+        if query is None:
+            where_clause = " AND ".join([f"{key} = ?" for key in where])
+            if operation == "insert":
+                placeholders = ", ".join(["?" for _ in columns])
+                query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+            elif operation == "select":
+                query = f"SELECT {columns} FROM {table_name}"
+                if where_clause:
+                    query += f" WHERE {where_clause}"
+            elif operation == "update":
+                set_clause = ", ".join([f"{key} = ?" for key in columns])
+                query = f"UPDATE {table_name} SET {set_clause} WHERE {where_clause}"
+            elif operation == "delete":
+                query = f"DELETE FROM {table_name} WHERE {where_clause}"
+            else:
+                raise ValueError(f"Unknown SQL operation '{operation}'")
+            if len(self.sql_cache) >= self.SQL_CACHE_SIZE:
+                self.sql_cache.clear()
+            self.sql_cache[key] = query
+        return query
+    
     def insert(self, table_name, data):
-        columns = ", ".join(data.keys())
-        placeholders = ", ".join(["?" for _ in data])
-        values = list(data.values())
-        query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-        return self.execute(query, values)
+        query = self.sql_text("insert", table_name, tuple(data))
+        result = self.execute(query, list(data.values()))
+        self.last_insert_id = self.cursor.lastrowid
+        self.written(table_name)
+        return result
+    
+    def insert_many(self, table_name, rows):
+        """Insert a list of row dicts with one executemany per column set"""
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(row.keys()), []).append(tuple(row.values()))
+        count = 0
+        with self.transaction():
+            for columns, values in groups.items():
+                count += self.executemany(self.sql_text("insert", table_name, columns), values)
+            self.written(table_name)
+        return count
     
     def select(self, table_name, conditions=None, columns="*"):
-        query = f"SELECT {columns} FROM {table_name}"
-        params = []
-        if conditions:
-            where_clause = " AND ".join([f"{key} = ?" for key in conditions.keys()])
-            query += f" WHERE {where_clause}"
-            params = list(conditions.values())
+        query, params = self.select_query(table_name, conditions, columns)
         return self.execute(query, params)
     
+    def select_iter(self, table_name, conditions=None, columns="*", batch_size=500, row_format="tuple"):
+        query, params = self.select_query(table_name, conditions, columns)
+        return self.iterate(query, params, batch_size, row_format)
+    
+    def select_query(self, table_name, conditions=None, columns="*"):
+        if isinstance(columns, list):
+            columns = ", ".join(columns)
+        where = tuple(conditions) if conditions else ()
+        params = list(conditions.values()) if conditions else []
+        return self.sql_text("select", table_name, columns, where), params
+    
     def update(self, table_name, data, conditions):
-        set_clause = ", ".join([f"{key} = ?" for key in data.keys()])
-        where_clause = " AND ".join([f"{key} = ?" for key in conditions.keys()])
-        values = list(data.values()) + list(conditions.values())
-        query = f"UPDATE {table_name} SET {set_clause} WHERE {where_clause}"
-        return self.execute(query, values)
+        query = self.sql_text("update", table_name, tuple(data), tuple(conditions))
+        result = self.execute(query, list(data.values()) + list(conditions.values()))
+        self.written(table_name)
+        return result
     
     def delete(self, table_name, conditions):
-        where_clause = " AND ".join([f"{key} = ?" for key in conditions.keys()])
-        params = list(conditions.values())
-        query = f"DELETE FROM {table_name} WHERE {where_clause}"
-        return self.execute(query, params)
+        query = self.sql_text("delete", table_name, where=tuple(conditions))
+        result = self.execute(query, list(conditions.values()))
+        self.written(table_name)
+        return result
+    
+    def written(self, table_name):
+        """Invalidate a table after a write, and again at commit if in a transaction"""
+        if self.transaction_depth:
+            touched = getattr(self.local, "touched", None)
+            if touched is None:
+                touched = self.local.touched = set()
+            if table_name not in touched:
+                touched.add(table_name)
+                with self.cache_lock:
+                    self.pending_writes[table_name] = self.pending_writes.get(table_name, 0) + 1
+        self.invalidate(table_name)
+    
+    def invalidate(self, table_name=None):
+        """Drop cached Model results for a table, or for every table"""
+        with self.cache_lock:
+            self.generation += 1
+            for table, models in self.models.items():
+                if table_name is None or table == table_name:
+                    for model in models:
+                        if model.cache is not None:
+                            model.cache.clear()
+    
+    def cache_token(self, table_name):
+        """Return a token for caching reads of a table, or None while writes to it are uncommitted"""
+        with self.cache_lock:
+            return None if self.pending_writes.get(table_name) else self.generation
+    
+    def cache_put(self, cache, token, key, value):
+        """Cache a result read under token unless a write has happened since"""
+        with self.cache_lock:
+            if token == self.generation:
+                cache.put(key, value)
+
+class Transaction:
+    """Context manager that commits on success and rolls back on error"""
+    
+    def __init__(self, db):
+        self.db = db
+    
+    def __enter__(self):
+        self.db.begin()
+        return self.db
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.db.commit()
+        else:
+            self.db.rollback()
+        return False
+
+class ResultCache:
+    """Thread-safe LRU cache with an optional time-to-live.
+    
+    Hits, misses and evictions are counted on the cache and, when
+    metric_prefix is set, reported to MetricsCollector.
+    """
+    
+    def __init__(self, max_size=256, ttl=None, metric_prefix="cache"):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.metric_prefix = metric_prefix
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def count(self, event):
+        setattr(self, event, getattr(self, event) + 1)
+        if self.metric_prefix:
+            _metrics_collector.increment(f"{self.metric_prefix}_{event}")
+    
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.count("hits")
+                    return value
+                del self.entries[key]
+            self.count("misses")
+        return default
+    
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while self.max_size is not None and len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.count("evictions")
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def __len__(self):
+        return len(self.entries)
 
 class Model:
-    def __init__(self, db, table_name, schema):
+    def __init__(self, db, table_name, schema, indexes=None, unique=None, scan_warning_rows=10000,
+                 cache_size=0, cache_ttl=None):
         self.db = db
         self.table_name = table_name
         self.schema = schema
+        self.scan_warning_rows = scan_warning_rows
+        self.checked_plans = set()
+        self.cache = None
+        if cache_size:
+            self.enable_cache(cache_size, cache_ttl)
+        # Writes through any Model or Database method invalidate the cache
+        self.db.models.setdefault(table_name, []).append(self)
         self.db.create_table(table_name, schema)
+        # Each entry is a column name or a list of columns for a composite index
+        for columns in indexes or []:
+            self.create_index(columns)
+        for columns in unique or []:
+            self.create_index(columns, unique=True)
+    
+    def enable_cache(self, max_size=256, ttl=None):
+        """Cache find results by conditions (opt-in); writes to the table clear it.
+        
+        Finds skip the cache while a transaction has uncommitted writes to
+        the table, and the cache is cleared again when they commit.
+        """
+        self.cache = ResultCache(max_size, ttl, "model_cache")
+        return self
     
-    def create(self, data):
+    def create_index(self, columns, unique=False):
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        prefix = "uq" if unique else "idx"
+        name = f"{prefix}_{self.table_name}_{'_'.join(columns)}"
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        self.db.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {self.table_name} ({', '.join(columns)})")
+        return name
+    
+    def explain(self, conditions=None):
+        """Return SQLite's EXPLAIN QUERY PLAN details for find(conditions)"""
+        query, params = self.db.select_query(self.table_name, conditions)
+        return [row[-1] for row in self.db.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    
+    def check_scan(self, conditions):
+        """Warn once per condition shape when a find would scan a large table"""
+        if not conditions or not self.scan_warning_rows:
+            return
+        shape = tuple(conditions)
+        if shape in self.checked_plans:
+            return
+        self.checked_plans.add(shape)
+        if not any(detail.startswith("SCAN") for detail in self.explain(conditions)):
+            return
+        # MAX(rowid) is an index lookup, unlike COUNT(*)
+        rows = self.db.execute(f"SELECT MAX(rowid) FROM {self.table_name}")[0][0] or 0
+        if rows > self.scan_warning_rows:
+            _default_logger.warn(f"find on {self.table_name} by {', '.join(shape)} scans ~{rows} rows; "
+                                 f"consider an index", table=self.table_name, columns=list(shape))
+    
+    def create(self, data, return_id=False):
         self.db.insert(self.table_name, data)
-        return self.find_one(data)
-    
-    def find(self, conditions=None):
+        if return_id:
+            return self.db.last_insert_id
+        # Fetch the new row by rowid rather than matching on its values
+        rows = self.db.execute(f"SELECT * FROM {self.table_name} WHERE rowid = ?", [self.db.last_insert_id])
+        return dict(zip(self.schema.keys(), rows[0])) if rows else None
+    
+    def create_many(self, rows):
+        return self.db.insert_many(self.table_name, rows)
+    
+    def find(self, conditions=None, row_format="dict"):
+        key = token = None
+        if self.cache is not None and row_format != "row":
+            key = self.cache_key(conditions, row_format)
+            if key is not None:
+                token = self.db.cache_token(self.table_name)
+            if token is not None:
+                rows = self.cache.get(key)
+                if rows is not None:
+                    # Copies, so callers cannot modify the cached rows
+                    return [dict(row) for row in rows] if row_format == "dict" else list(rows)
+        self.check_scan(conditions)
+        if row_format == "row":
+            return list(self.find_iter(conditions, row_format=row_format))
         results = self.db.select(self.table_name, conditions)
-        return [dict(zip(self.schema.keys(), row)) for row in results]
+        if row_format != "tuple":
+            results = [dict(zip(self.schema.keys(), row)) for row in results]
+        if token is not None:
+            self.db.cache_put(self.cache, token, key,
+                              [dict(row) for row in results] if row_format == "dict" else list(results))
+        return results
+    
+    def cache_key(self, conditions, row_format):
+        key = (row_format, tuple(sorted(conditions.items())) if conditions else ())
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+    
+    def find_iter(self, conditions=None, batch_size=500, row_format="dict"):
+        """Stream matching rows as dicts, tuples or sqlite3.Row objects"""
+        self.check_scan(conditions)
+        rows = self.db.select_iter(self.table_name, conditions, batch_size=batch_size,
+                                   row_format="row" if row_format == "row" else "tuple")
+        if row_format != "dict":
+            return rows
+        columns = list(self.schema.keys())
+        return (dict(zip(columns, row)) for row in rows)
     
     def find_one(self, conditions):
         results = self.find(conditions)
@@ -126,6 +606,8 @@ class Model:
 
 # Query Builder
 class QueryBuilder:
+    OPERATORS = ("=", "!=", "<>", "<", ">", "<=", ">=", "LIKE", "NOT LIKE", "IN", "NOT IN", "BETWEEN", "IS", "IS NOT")
+    
     def __init__(self, db):
         self.db = db
         self.reset()
@@ -134,9 +616,11 @@ class QueryBuilder:
         self.table = None
         self.columns = "*"
         self.conditions = []
-        self.order_by = None
-        self.limit = None
+        self.params = []
+        self.ordering = []
+        self.limit_count = None
         self.joins = []
+        return self
     
     def from_table(self, table_name):
         self.table = table_name
@@ -146,52 +630,117 @@ class QueryBuilder:
         self.columns = ", ".join(columns) if isinstance(columns, list) else columns
         return self
     
+    def condition(self, column, operator, value):
+        """Return (sql, params) for one comparison"""
+        operator = operator.upper()
+        if operator not in self.OPERATORS:
+            raise ValidationError(f"Unsupported operator '{operator}'")
+        if operator in ("IN", "NOT IN"):
+            values = list(value)
+            if not values:
+                # An empty IN list matches nothing; NOT IN matches everything
+                return ("0" if operator == "IN" else "1"), []
+            return f"{column} {operator} ({', '.join(['?' for _ in values])})", values
+        if operator == "BETWEEN":
+            low, high = value
+            return f"{column} BETWEEN ? AND ?", [low, high]
+        return f"{column} {operator} ?", [value]
+    
     def where(self, column, operator, value):
-        self.conditions.append(f"{column} {operator} ?")
+        clause, params = self.condition(column, operator, value)
+        self.conditions.append(clause)
+        self.params.extend(params)
+        return self
+    
+    def where_in(self, column, values):
+        return self.where(column, "IN", values)
+    
+    def where_between(self, column, low, high):
+        return self.where(column, "BETWEEN", [low, high])
+    
+    def where_any(self, conditions):
+        """AND a group of [column, operator, value] conditions joined by OR"""
+        clauses = []
+        for column, operator, value in conditions:
+            clause, params = self.condition(column, operator, value)
+            clauses.append(clause)
+            self.params.extend(params)
+        if clauses:
+            self.conditions.append("(" + " OR ".join(clauses) + ")")
         return self
     
     def order_by(self, column, direction="ASC"):
-        self.order_by = f"{column} {direction}"
+        direction = direction.upper()
+        if direction not in ("ASC", "DESC"):
+            raise ValidationError(f"Invalid sort direction '{direction}'")
+        self.ordering.append(f"{column} {direction}")
         return self
     
     def limit(self, count):
-        self.limit = count
+        self.limit_count = count
+        return self
+    
+    def after(self, column, value, direction="ASC"):
+        """Keyset pagination: rows past `value` in `column` order, no OFFSET scan"""
+        self.where(column, ">" if direction.upper() == "ASC" else "<", value)
+        if not self.ordering:
+            self.order_by(column, direction)
         return self
     
     def join(self, table, condition):
         self.joins.append(f"JOIN {table} ON {condition}")
         return self
     
-    def execute(self):
+    def compile(self, columns=None, aggregate=False):
+        """Return (sql, params); SQL text is cached by query shape"""
         if not self.table:
             raise ValidationError("No table specified for query")
-        
-        query = f"SELECT {self.columns} FROM {self.table}"
-        
-        # Add joins
-        for join in self.joins:
-            query += f" {join}"
-        
-        # Add conditions
-        if self.conditions:
-            query += " WHERE " + " AND ".join(self.conditions)
-        
-        # Add ordering
-        if self.order_by:
-            query += f" ORDER BY {self.order_by}"
-        
-        # Add limit
-        if self.limit:
-            query += f" LIMIT {self.limit}"
-        
-        return self.db.execute(query)
+        columns = columns or self.columns
+        key = ("query", self.table, columns, tuple(self.joins), tuple(self.conditions),
+               () if aggregate else tuple(self.ordering), not aggregate and self.limit_count is not None)
+        query = self.db.sql_cache.get(key)
+        if query is None:
+            query = f"SELECT {columns} FROM {self.table}"
+            for join in self.joins:
+                query += f" {join}"
+            if self.conditions:
+                query += " WHERE " + " AND ".join(self.conditions)
+            if not aggregate:
+                if self.ordering:
+                    query += " ORDER BY " + ", ".join(self.ordering)
+                if self.limit_count is not None:
+                    query += " LIMIT ?"
+            if len(self.db.sql_cache) >= self.db.SQL_CACHE_SIZE:
+                self.db.sql_cache.clear()
+            self.db.sql_cache[key] = query
+        params = list(self.params)
+        if not aggregate and self.limit_count is not None:
+            params.append(self.limit_count)
+        return query, params
+    
+    def execute(self):
+        query, params = self.compile()
+        return self.db.execute(query, params)
+    
+    def iterate(self, batch_size=500, row_format="tuple"):
+        query, params = self.compile()
+        return self.db.iterate(query, params, batch_size, row_format)
+    
+    def count(self):
+        query, params = self.compile("COUNT(*)", aggregate=True)
+        return self.db.execute(query, params)[0][0]
+    
+    def exists(self):
+        query, params = self.compile("1", aggregate=True)
+        return bool(self.db.execute(query + " LIMIT 1", params))
 
 # Database utilities
-def create_database(db_path=":memory:"):
-    return Database(db_path).connect()
+def create_database(db_path=":memory:", cached_statements=256, wal=True, busy_timeout=5000, pragmas=None):
+    return Database(db_path, cached_statements, wal, busy_timeout, pragmas).connect()
 
-def create_model(db, table_name, schema):
-    return Model(db, table_name, schema)
+def create_model(db, table_name, schema, indexes=None, unique=None, scan_warning_rows=10000,
+                 cache_size=0, cache_ttl=None):
+    return Model(db, table_name, schema, indexes, unique, scan_warning_rows, cache_size, cache_ttl)
 
 def query_builder(db):
     return QueryBuilder(db)
@@ -532,6 +1081,26 @@ class NetworkError(ShiboException):
         super().__init__(message, "NetworkError")
         self.url = url
 
+class HTTPError(NetworkError, urllib.error.HTTPError):
+    """A 4xx/5xx response; also a urllib.error.HTTPError, as the http_* builtins raised before pooling"""
+    
+    def __init__(self, url, status, reason='', headers=None, body=b''):
+        urllib.error.HTTPError.__init__(self, url, status, reason, headers, io.BytesIO(body))
+        # ShiboException.__init__ would chain into urllib's constructor, and
+        # its file attribute is the response body here
+        self.message = f"HTTP Error {status}: {reason}"
+        self.error_type = "NetworkError"
+        self.line = None
+        self.stack_trace = []
+        self.args = (self.format_message(),)
+    
+    def format_message(self):
+        return f"{self.error_type}: {self.message}"
+    
+    @property
+    def status(self):
+        return self.code
+
 class DatabaseError(ShiboException):
     def __init__(self, message, query=None):
         super().__init__(message, "DatabaseError")
@@ -579,19 +1148,27 @@ def validate_range(value, min_val=None, max_val=None, field_name=None):
 # Advanced data structures
 
 class Set:
+    # Backed by a dict with None values so iteration keeps insertion order;
+    # keys views give C-speed membership and comparisons
     def __init__(self, items=None):
-        self._items = {}
-        if items:
-            for item in items:
-                self._items[item] = True
+        self._items = dict.fromkeys(items) if items else {}
+    
+    @classmethod
+    def _wrap(cls, items):
+        new_set = cls()
+        new_set._items = items
+        return new_set
+    
+    @staticmethod
+    def _elements(other):
+        return other._items if isinstance(other, Set) else dict.fromkeys(other)
     
     def add(self, item):
-        self._items[item] = True
+        self._items[item] = None
         return self
     
     def remove(self, item):
-        if item in self._items:
-            del self._items[item]
+        self._items.pop(item, None)
         return self
     
     def contains(self, item):
@@ -601,39 +1178,84 @@ class Set:
         return len(self._items)
     
     def to_list(self):
-        return list(self._items.keys())
+        return list(self._items)
+    
+    def copy(self):
+        return self._wrap(self._items.copy())
     
     def union(self, other_set):
-        new_set = Set(self.to_list())
-        for item in other_set.to_list():
-            new_set.add(item)
-        return new_set
+        items = self._items.copy()
+        items.update(self._elements(other_set))
+        return self._wrap(items)
     
     def intersection(self, other_set):
-        new_set = Set()
-        for item in self.to_list():
-            if other_set.contains(item):
-                new_set.add(item)
-        return new_set
+        other = self._elements(other_set)
+        return self._wrap(dict.fromkeys(filter(other.__contains__, self._items)))
     
     def difference(self, other_set):
-        new_set = Set()
-        for item in self.to_list():
-            if not other_set.contains(item):
-                new_set.add(item)
-        return new_set
+        other = self._elements(other_set)
+        return self._wrap(dict.fromkeys(itertools.filterfalse(other.__contains__, self._items)))
+    
+    def symmetric_difference(self, other_set):
+        other = self._elements(other_set)
+        items = dict.fromkeys(itertools.filterfalse(other.__contains__, self._items))
+        items.update(dict.fromkeys(itertools.filterfalse(self._items.__contains__, other)))
+        return self._wrap(items)
+    
+    def update(self, other_set):
+        self._items.update(self._elements(other_set))
+        return self
+    
+    def intersect_update(self, other_set):
+        other = self._elements(other_set)
+        self._items = dict.fromkeys(filter(other.__contains__, self._items))
+        return self
+    
+    def difference_update(self, other_set):
+        items = self._items
+        other = self._elements(other_set)
+        if other is items:
+            items.clear()
+        for item in other:
+            items.pop(item, None)
+        return self
+    
+    def is_subset(self, other_set):
+        return self._items.keys() <= self._elements(other_set).keys()
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def __contains__(self, item):
+        return item in self._items
+    
+    def __iter__(self):
+        return iter(self._items)
+    
+    def __eq__(self, other):
+        return isinstance(other, Set) and self._items.keys() == other._items.keys()
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f"Set({self.to_list()!r})"
 
 class Queue:
-    def __init__(self):
-        self._items = []
+    def __init__(self, items=None, capacity=None):
+        self._items = deque(items or [])
+        self.capacity = capacity
+        if capacity is not None and len(self._items) > capacity:
+            raise ValidationError(f"Queue capacity {capacity} exceeded")
     
     def enqueue(self, item):
+        if self.capacity is not None and len(self._items) >= self.capacity:
+            raise ValidationError(f"Queue is full (capacity {self.capacity})")
         self._items.append(item)
         return self
     
     def dequeue(self):
         if self._items:
-            return self._items.pop(0)
+            return self._items.popleft()
         return None
     
     def front(self):
@@ -642,11 +1264,24 @@ class Queue:
     def is_empty(self):
         return len(self._items) == 0
     
+    def is_full(self):
+        return self.capacity is not None and len(self._items) >= self.capacity
+    
     def size(self):
         return len(self._items)
     
     def to_list(self):
-        return self._items[:]
+        return list(self._items)
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def __iter__(self):
+        return iter(list(self._items))
+
+class BoundedQueue(Queue):
+    def __init__(self, capacity, items=None):
+        super().__init__(items, capacity)
 
 class Stack:
     def __init__(self):
@@ -673,28 +1308,113 @@ class Stack:
     def to_list(self):
         return self._items[:]
 
+# Marks a heap entry superseded by decrease_key
+_REMOVED = object()
+
 class PriorityQueue:
-    def __init__(self):
-        self._items = []
+    """Min-priority queue on heapq; equal priorities dequeue in insertion order"""
+    
+    def __init__(self, items=None, capacity=None):
+        # Heap entries are [priority, insertion counter, item]
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self._size = 0
+        self.capacity = capacity
+        if items:
+            self.push_many(items)
+    
+    def _entry(self, item, priority):
+        entry = [priority, next(self._counter), item]
+        try:
+            self._entries[item] = entry
+        except TypeError:
+            pass  # unhashable items cannot use decrease_key
+        self._size += 1
+        return entry
+    
+    def _check_capacity(self, count=1):
+        if self.capacity is not None and self._size + count > self.capacity:
+            raise ValidationError(f"Priority queue is full (capacity {self.capacity})")
     
     def enqueue(self, item, priority):
-        self._items.append((priority, item))
-        self._items.sort(key=lambda x: x[0])
+        self._check_capacity()
+        heapq.heappush(self._heap, self._entry(item, priority))
+        return self
+    
+    def push_many(self, pairs):
+        """Add [item, priority] pairs; large batches are heapified in O(n)"""
+        pairs = list(pairs)
+        self._check_capacity(len(pairs))
+        if len(pairs) > len(self._heap):
+            self._heap.extend(self._entry(item, priority) for item, priority in pairs)
+            heapq.heapify(self._heap)
+        else:
+            for item, priority in pairs:
+                heapq.heappush(self._heap, self._entry(item, priority))
+        return self
+    
+    def heapify(self):
+        """Drop entries superseded by decrease_key and rebuild the heap"""
+        self._heap = [entry for entry in self._heap if entry[2] is not _REMOVED]
+        heapq.heapify(self._heap)
+        return self
+    
+    def decrease_key(self, item, priority):
+        """Lower the priority of a queued item; higher priorities are ignored"""
+        try:
+            entry = self._entries.get(item)
+        except TypeError:
+            raise TypeError("decrease_key requires a hashable item")
+        if entry is None:
+            raise ValueError(f"Item {item!r} is not in the priority queue")
+        if priority < entry[0]:
+            entry[2] = _REMOVED
+            self._size -= 1
+            heapq.heappush(self._heap, self._entry(item, priority))
         return self
     
+    def _discard_removed(self):
+        while self._heap and self._heap[0][2] is _REMOVED:
+            heapq.heappop(self._heap)
+    
     def dequeue(self):
-        if self._items:
-            return self._items.pop(0)[1]
+        self._discard_removed()
+        if self._heap:
+            entry = heapq.heappop(self._heap)
+            item = entry[2]
+            self._size -= 1
+            try:
+                if self._entries.get(item) is entry:
+                    del self._entries[item]
+            except TypeError:
+                pass
+            return item
         return None
     
     def peek(self):
-        return self._items[0][1] if self._items else None
+        self._discard_removed()
+        return self._heap[0][2] if self._heap else None
     
     def is_empty(self):
-        return len(self._items) == 0
+        return self._size == 0
+    
+    def is_full(self):
+        return self.capacity is not None and self._size >= self.capacity
     
     def size(self):
-        return len(self._items)
+        return self._size
+    
+    def to_list(self):
+        """Return [item, priority] pairs in dequeue order"""
+        return [[item, priority] for priority, _, item in sorted(self._heap) if item is not _REMOVED]
+    
+    def __len__(self):
+        return self._size
+
+class BoundedPriorityQueue(PriorityQueue):
+    def __init__(self, capacity, items=None):
+        super().__init__(items, capacity)
 
 # Functional programming utilities
 def map_func(func, iterable):
@@ -715,6 +1435,144 @@ def reduce_func(func, iterable, initial=None):
         result = func(result, item)
     return result
 
+class InterpreterBuiltin:
+    """A builtin that receives the calling interpreter as its first argument"""
+    
+    def __init__(self, function):
+        self.function = function
+    
+    def __call__(self, *args):
+        # Called from compiled code, where there is no interpreter
+        return self.function(None, *args)
+
+# Parallel map over worker processes. Each worker holds a warm Interpreter;
+# script functions travel as their FuncDef plus the globals they reference.
+_parallel_worker_interpreter = None
+_parallel_worker_functions = {}
+_parallel_pools = {}
+_parallel_pools_lock = threading.Lock()
+
+def _init_parallel_worker():
+    global _parallel_worker_interpreter
+    _parallel_worker_interpreter = Interpreter()
+
+def _worker_function(func):
+    key = (func.name, len(func.body))
+    cached = _parallel_worker_functions.get(key)
+    if cached is not None and cached == func:
+        return cached
+    _parallel_worker_functions[key] = func
+    return func
+
+def _run_parallel_chunk(payload, chunk):
+    # Every chunk unpickles a fresh FuncDef; reuse the first copy so the
+    # tiering profile (keyed by node identity) carries over between chunks.
+    func, closure = pickle.loads(payload)
+    func = _worker_function(func)
+    for name, value in closure.items():
+        if isinstance(value, FuncDef):
+            closure[name] = _worker_function(value)
+    env = dict(_parallel_worker_interpreter.env)
+    env.update(closure)
+    frame = Interpreter.frame(env, profiles=_parallel_worker_interpreter.profiles)
+    return [frame.call_function(func, [item]) for item in chunk]
+
+def _map_pickled(payload, chunk):
+    return map_func(pickle.loads(payload), chunk)
+
+def _referenced_names(node, names):
+    if isinstance(node, Identifier):
+        names.add(node.name)
+    elif isinstance(node, (tuple, list)):
+        for child in node:
+            _referenced_names(child, names)
+    return names
+
+def _function_closure(func, env):
+    """Collect the globals a script function needs, following called functions"""
+    builtin_names = PyCodeGenerator.builtin_names()
+    closure = {}
+    pending = [func]
+    while pending:
+        current = pending.pop()
+        for name in _referenced_names(current.body, set()):
+            if name in closure or name in current.params or name not in env:
+                continue
+            value = env[name]
+            if name in builtin_names and not isinstance(value, FuncDef):
+                continue
+            closure[name] = value
+            if isinstance(value, FuncDef):
+                pending.append(value)
+    return closure
+
+def _pickle_function(func, closure):
+    """Pickle a script function with its closure once, for every chunk to share"""
+    try:
+        return pickle.dumps((func, closure))
+    except Exception:
+        for name, value in closure.items():
+            try:
+                pickle.dumps(value)
+            except Exception:
+                raise TypeError(f"parallel_map cannot send '{name}' to worker processes")
+        raise
+
+def _parallel_context():
+    # Forking copies a process that is running other threads (the event
+    # loop, server workers), along with any locks they held at the time
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def _parallel_pool(workers):
+    with _parallel_pools_lock:
+        pool = _parallel_pools.get(workers)
+        if pool is None:
+            pool = _parallel_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=_parallel_context(), initializer=_init_parallel_worker)
+    return pool
+
+@atexit.register
+def _shutdown_parallel_pools():
+    with _parallel_pools_lock:
+        pools = list(_parallel_pools.values())
+        _parallel_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def parallel_map(interpreter, func, items, workers=None, chunksize=None):
+    """Map func over items in worker processes, returning results in order"""
+    items = list(items)
+    workers = workers or os.cpu_count() or 1
+    in_process = workers == 1 or len(items) <= 1
+    if isinstance(func, FuncDef):
+        if in_process:
+            if interpreter is None:
+                # Without a caller's environment, run as a worker would
+                if _parallel_worker_interpreter is None:
+                    _init_parallel_worker()
+                interpreter = Interpreter.frame(dict(_parallel_worker_interpreter.env),
+                                                profiles=_parallel_worker_interpreter.profiles)
+            return [interpreter.call_function(func, [item]) for item in items]
+        closure = _function_closure(func, interpreter.env if interpreter is not None else {})
+        task, payload = _run_parallel_chunk, _pickle_function(func, closure)
+    else:
+        if in_process:
+            return map_func(func, items)
+        try:
+            task, payload = _map_pickled, pickle.dumps(func)
+        except Exception:
+            # Python lambdas and bound methods cannot reach other processes
+            return map_func(func, items)
+    if not chunksize:
+        chunksize = max(1, math.ceil(len(items) / (workers * 4)))
+    pool = _parallel_pool(workers)
+    futures = [pool.submit(task, payload, items[i:i + chunksize]) for i in range(0, len(items), chunksize)]
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
+
 def compose(*functions):
     def composed_function(x):
         result = x
@@ -785,8 +1643,19 @@ def _deep_copy(obj):
         return [_deep_copy(item) for item in obj]
     elif isinstance(obj, dict):
         return {key: _deep_copy(value) for key, value in obj.items()}
-    elif isinstance(obj, (Set, Queue, Stack, PriorityQueue)):
-        return obj.__class__(obj.to_list())
+    elif isinstance(obj, Set):
+        # Set elements are hashable and so treated as immutable
+        return obj.copy()
+    elif isinstance(obj, (Queue, Stack)):
+        new_obj = copy.copy(obj)
+        new_obj._items = obj._items.__class__(_deep_copy(item) for item in obj._items)
+        return new_obj
+    elif isinstance(obj, PriorityQueue):
+        new_obj = copy.copy(obj)
+        new_obj._heap, new_obj._entries, new_obj._size = [], {}, 0
+        new_obj._counter = itertools.count()
+        new_obj.push_many([[_deep_copy(item), priority] for item, priority in obj.to_list()])
+        return new_obj
     else:
         return obj
 
@@ -818,95 +1687,407 @@ def _debounce(func, delay):
             return func(*args, **kwargs)
     return debounced_func
 
-def _memoize(func):
-    cache = {}
-    def memoized_func(*args, **kwargs):
-        key = str(args) + str(sorted(kwargs.items()))
-        if key not in cache:
-            cache[key] = func(*args, **kwargs)
-        return cache[key]
-    return memoized_func
+def _freeze(value):
+    """Return a hashable stand-in for value, tagged with its type so 1, 1.0 and True differ"""
+    kind = type(value)
+    if isinstance(value, (list, tuple)):
+        return (kind, tuple(_freeze(item) for item in value))
+    elif isinstance(value, dict):
+        return (kind, frozenset((_freeze(key), _freeze(item)) for key, item in value.items()))
+    elif isinstance(value, (set, frozenset, Set)):
+        return (kind, frozenset(_freeze(item) for item in value))
+    return (kind, value)
+
+# Arguments of these types are keyed as they are, plus their types
+_ATOMIC_KEY_TYPES = frozenset([int, float, complex, str, bytes, bool, type(None)])
+
+_MISSING = object()
+
+class Memoized:
+    """A function wrapped with a bounded LRU/TTL result cache"""
+    
+    def __init__(self, func, interpreter=None, max_size=1024, ttl=None):
+        self.func = func
+        self.interpreter = interpreter
+        self.cache = ResultCache(max_size, ttl, metric_prefix=None)
+    
+    def __call__(self, *args, **kwargs):
+        if not kwargs and all(type(arg) in _ATOMIC_KEY_TYPES for arg in args):
+            key = (args, tuple(map(type, args)))
+        else:
+            # Containers are keyed by their typed contents, and keyword
+            # arguments separately from positional ones
+            key = (_freeze(args), _freeze(kwargs))
+        result = self.cache.get(key, _MISSING)
+        if result is _MISSING:
+            if isinstance(self.func, FuncDef):
+                if self.interpreter is None:
+                    raise TypeError("memoize needs an interpreter to call script functions")
+                result = self.interpreter.call_function(self.func, list(args))
+            else:
+                result = self.func(*args, **kwargs)
+            self.cache.put(key, result)
+        return result
+    
+    def cache_info(self):
+        return {
+            'hits': self.cache.hits,
+            'misses': self.cache.misses,
+            'evictions': self.cache.evictions,
+            'size': len(self.cache),
+            'max_size': self.cache.max_size,
+            'ttl': self.cache.ttl,
+        }
+    
+    def cache_clear(self):
+        self.cache.clear()
+        self.cache.hits = self.cache.misses = self.cache.evictions = 0
+        return self
+
+def memoize(interpreter, func, max_size=1024, ttl=None):
+    """Cache func results by argument values; script FuncDefs are supported"""
+    return Memoized(func, interpreter, max_size, ttl)
 
 # Async/Await Support
 import asyncio
+import contextlib
 import threading
-from concurrent.futures import ThreadPoolExecutor
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 # Event Loop Implementation
+#
+# An asyncio loop runs on a background thread and owns every awaitable.
+# Builtin I/O (sleep_async, the *_async network and file functions) are plain
+# asyncio coroutines, so thousands of them can be in flight at once. Script
+# code keeps running on ordinary threads: a script coroutine gets a thread of
+# its own, and only the thread holding the loop's baton evaluates script code.
+# `await` hands the awaitable to the loop, passes the baton on and blocks until
+# the result is ready, which is how a script frame suspends and resumes.
+# Only script coroutines take the baton, for their own duration, giving it
+# back in a finally block. Plain programs never wait for it, so separate
+# interpreters on separate threads run (and block in builtins) side by side.
 class EventLoop:
-    def __init__(self):
+    def __init__(self, max_workers=None):
+        self.loop = None
+        self.thread = None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
         self.tasks = []
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        # The baton is handed over in request order: each waiting thread
+        # holds a locked "turn" that leave() releases for the next in line
+        self._baton_guard = threading.Lock()
+        self._baton_held = False
+        self._baton_queue = deque()
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+    
+    def start(self):
+        """Start the asyncio loop thread on first use and return the loop"""
+        with self._start_lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(self.executor)
+                self.thread = threading.Thread(target=loop.run_forever, name='shiboscript-event-loop', daemon=True)
+                self.thread.start()
+                self.loop = loop
+        return self.loop
+    
+    def reserve(self):
+        """Queue for the baton now; pass the result to enter() to wait for that turn"""
+        turn = threading.Lock()
+        with self._baton_guard:
+            if self._baton_held:
+                turn.acquire()
+                self._baton_queue.append(turn)
+            else:
+                self._baton_held = True
+        return turn
+    
+    def enter(self, turn=None):
+        """Take the baton, so this thread is the one running script code"""
+        if not getattr(self._local, 'holding', False):
+            (turn or self.reserve()).acquire()
+            self._local.holding = True
+    
+    def leave(self):
+        if getattr(self._local, 'holding', False):
+            self._local.holding = False
+            with self._baton_guard:
+                if self._baton_queue:
+                    self._baton_queue.popleft().release()
+                else:
+                    self._baton_held = False
+    
+    @contextlib.contextmanager
+    def released(self):
+        """Let other threads run script code during the block"""
+        if not getattr(self._local, 'holding', False):
+            yield
+            return
+        self.leave()
+        try:
+            yield
+        finally:
+            self.enter()
+    
+    def submit(self, awaitable):
+        """Schedule awaitable on the loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(_resolve_awaitable(awaitable), self.start())
     
     def create_task(self, coro):
         task = Task(coro, self)
         self.tasks.append(task)
         return task
     
-    def run_until_complete(self):
+    def wait(self, awaitable, timeout=None):
+        """Block the calling thread until awaitable resolves.
+        
+        A thread holding the baton passes it on, so other script coroutines
+        run while it waits. Values that are not awaitable are returned
+        unchanged.
+        """
+        if not _is_awaitable(awaitable):
+            return awaitable
+        future = awaitable.future if isinstance(awaitable, Task) else self.submit(awaitable)
+        with self.released():
+            try:
+                return future.result(timeout)
+            except concurrent.futures.TimeoutError:
+                if future.done():
+                    raise
+                future.cancel()
+                raise TimeoutError(f"Timed out after {timeout} seconds")
+    
+    def run_until_complete(self, awaitable=None):
+        """Await awaitable, or every task created so far when none is given.
+        
+        Without an argument the results come back in creation order, with the
+        exception in place of the result for tasks that failed.
+        """
+        if awaitable is not None:
+            return self.wait(awaitable)
+        results = []
         while self.tasks:
             task = self.tasks.pop(0)
             try:
-                task.step()
-                if not task.done:
-                    self.tasks.append(task)
+                results.append(self.wait(task))
             except Exception as e:
-                print(f"Task error: {e}")
-                task.done = True
-                task.result = e
+                results.append(e)
+        return results
     
     def run_in_thread(self, func, *args, **kwargs):
-        future = self.executor.submit(func, *args, **kwargs)
-        return future
+        return self.executor.submit(func, *args, **kwargs)
 
 class Task:
+    """A scheduled awaitable; await it, or poll done() and result()"""
+    
     def __init__(self, coro, loop):
         self.coro = coro
         self.loop = loop
-        self.done = False
-        self.result = None
-        self.exception = None
+        self.future = loop.submit(coro)
     
-    def step(self):
+    def done(self):
+        return self.future.done()
+    
+    def cancel(self):
+        return self.future.cancel()
+    
+    def result(self):
+        return self.loop.wait(self)
+    
+    def exception(self):
+        if not self.future.done() or self.future.cancelled():
+            return None
+        return self.future.exception()
+    
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+class CoroutineThreads:
+    """Threads for script coroutines, kept for reuse once their coroutine ends.
+    
+    A suspended script coroutine keeps its thread blocked in the await, so the
+    number in flight at once is bounded by how many threads the OS allows
+    (typically several thousand), not by a pool size: a fixed pool would
+    deadlock as soon as every thread awaited a coroutine still queued for one.
+    Reuse spares each new coroutine the cost of starting a thread; threads
+    idle for idle_timeout seconds exit.
+    """
+    
+    def __init__(self, idle_timeout=30):
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle = []  # [event, job] slots of parked threads
+        self.threads = 0  # live threads, running or parked
+    
+    def run(self, target, *args):
+        with self.lock:
+            if self.idle:
+                slot = self.idle.pop()
+                slot[1] = (target, args)
+                slot[0].set()
+                return
+            self.threads += 1
+        threading.Thread(target=self.work, args=(target, args), name='shiboscript-coroutine', daemon=True).start()
+    
+    def work(self, target, args):
+        slot = [threading.Event(), None]
+        while True:
+            target(*args)
+            slot[0].clear()
+            with self.lock:
+                self.idle.append(slot)
+            if not slot[0].wait(self.idle_timeout):
+                with self.lock:
+                    if slot in self.idle:
+                        self.idle.remove(slot)
+                        self.threads -= 1
+                        return
+                # run() picked this thread just as it timed out
+                slot[0].wait()
+            (target, args), slot[1] = slot[1], None
+
+_coroutine_threads = CoroutineThreads()
+
+class ScriptCoroutine:
+    """A pending call of an async script function.
+    
+    Nothing runs until the coroutine is awaited or handed to create_task; it
+    then evaluates on a thread of its own (see CoroutineThreads), taking turns
+    with the other script coroutines at each await.
+    """
+    
+    def __init__(self, interpreter, func, args, instance_env=None):
+        self.interpreter = interpreter
+        self.func = func
+        self.args = args
+        self.instance_env = instance_env
+        self.started = False
+    
+    def __await__(self):
+        return self.run().__await__()
+    
+    async def run(self):
+        if self.started:
+            raise RuntimeError("Coroutine has already been awaited")
+        self.started = True
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Reserve the baton here so coroutines start in the order they were awaited
+        turn = _event_loop.reserve()
+        _coroutine_threads.run(self._run_thread, loop, future, turn)
+        return await future
+    
+    def _run_thread(self, loop, future, turn):
+        _event_loop.enter(turn)
         try:
-            if hasattr(self.coro, '__next__'):
-                # Generator-based coroutine
-                result = next(self.coro)
-                if result is None:
-                    return
-                elif hasattr(result, '__await__'):
-                    # Nested await
-                    nested_task = self.loop.create_task(result)
-                    nested_task.step()
-                    if nested_task.done:
-                        self.coro.send(nested_task.result)
+            if self.interpreter is None:
+                # Called from compiled code, where functions are Python callables
+                result = self.func(*self.args)
             else:
-                # Regular function
-                self.result = self.coro
-                self.done = True
-        except StopIteration as e:
-            self.result = e.value
-            self.done = True
-        except Exception as e:
-            self.exception = e
-            self.done = True
+                result = self.interpreter.call_function(self.func, list(self.args), self.instance_env, as_coroutine=False)
+        except BaseException as e:
+            loop.call_soon_threadsafe(_settle_future, future, None, e)
+        else:
+            loop.call_soon_threadsafe(_settle_future, future, result, None)
+        finally:
+            _event_loop.leave()
+
+def _settle_future(future, result, exception):
+    if future.cancelled():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+def _is_awaitable(value):
+    return inspect.isawaitable(value) or isinstance(value, concurrent.futures.Future)
+
+async def _resolve_awaitable(value):
+    if isinstance(value, concurrent.futures.Future):
+        value = asyncio.wrap_future(value)
+    elif not inspect.isawaitable(value):
+        return value
+    return await value
+
+# Structured helpers. Each returns an awaitable, so scripts write
+# `await gather(a, b)` and can nest them inside tasks. Timeouts stop waiting
+# but cannot interrupt script code already running; it finishes unobserved.
+async def gather(*awaitables):
+    """Await all awaitables concurrently; results keep argument order.
+    
+    A single list argument is treated as the list of awaitables.
+    """
+    if len(awaitables) == 1 and isinstance(awaitables[0], list):
+        awaitables = awaitables[0]
+    return list(await asyncio.gather(*[_resolve_awaitable(a) for a in awaitables]))
+
+async def with_timeout(awaitable, seconds):
+    try:
+        return await asyncio.wait_for(_resolve_awaitable(awaitable), seconds)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Timed out after {seconds} seconds")
+
+def as_completed(awaitables, timeout=None):
+    """Start awaitables and return a list of awaitables in completion order.
+    
+    The first element resolves to whichever result is ready first, and so on.
+    """
+    return _event_loop.wait(_completion_order(list(awaitables), timeout))
+
+async def _completion_order(awaitables, timeout):
+    loop = asyncio.get_running_loop()
+    finished = asyncio.Queue()
+    for awaitable in awaitables:
+        asyncio.ensure_future(_resolve_awaitable(awaitable)).add_done_callback(finished.put_nowait)
+    deadline = None if timeout is None else loop.time() + timeout
+    
+    async def next_result():
+        remaining = None if deadline is None else max(0, deadline - loop.time())
+        try:
+            task = await asyncio.wait_for(finished.get(), remaining)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timed out after {timeout} seconds")
+        return task.result()
+    return [_CompletionSlot(next_result) for _ in awaitables]
+
+class _CompletionSlot:
+    """One as_completed result; its coroutine is only made once awaited,
+    so slots a script never awaits leave nothing behind."""
+    
+    def __init__(self, next_result):
+        self.next_result = next_result
+    
+    def __await__(self):
+        return self.next_result().__await__()
 
 # Async function decorators
 def async_func(func):
-    def wrapper(*args, **kwargs):
-        # Create a generator that yields control
-        def coroutine():
-            result = func(*args, **kwargs)
-            return result
-        return coroutine()
-    return wrapper
-
-def await_func(future):
-    # In a real implementation, this would yield control to the event loop
-    # For now, we'll just return the result directly
-    if hasattr(future, 'result'):
-        return future.result()
-    return future
+    """Wrap func so that calling it returns a coroutine instead of running it"""
+    return InterpreterBuiltin(lambda interpreter, *args: ScriptCoroutine(interpreter, func, args))
+
+def await_func(future, timeout=None):
+    return _event_loop.wait(future, timeout)
+
+def sleep_async(seconds, result=None):
+    return asyncio.sleep(seconds, result)
+
+async def read_file_async(path):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _read_text_file, path)
+
+async def write_file_async(path, content):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _write_text_file, path, content)
+
+def _read_text_file(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+def _write_text_file(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
 
 # Global event loop
 _event_loop = EventLoop()
@@ -947,7 +2128,7 @@ def highlight_syntax(code):
     keywords = [
         'var', 'func', 'if', 'else', 'for', 'while', 'do', 'in', 'break', 'continue',
         'return', 'try', 'catch', 'class', 'interface', 'implements', 'import', 'from',
-        'true', 'false', 'null', 'set', 'instanceof', 'print'
+        'true', 'false', 'null', 'set', 'instanceof', 'print', 'async', 'await'
     ]
     
     # Create a copy of the code to work with
@@ -978,81 +2159,851 @@ def highlight_syntax(code):
     return result
 
 # Enhanced Web Helper Functions
+# Pooled HTTP client. Each session keeps idle keep-alive connections per
+# (scheme, host, port, proxy), so repeated calls to the same service skip
+# the TCP and TLS handshakes. The http_* builtins share one default session.
+class HTTPSession:
+    """Keep-alive HTTP client with per-host connection pools and retries.
+    
+    Proxies come from the environment (HTTP_PROXY, HTTPS_PROXY, NO_PROXY)
+    as urllib reads them when the session is created, unless a
+    {'http': ..., 'https': ..., 'no': ...} mapping is given; pass {} to
+    connect directly.
+    """
+    
+    RETRY_STATUSES = (502, 503, 504)
+    IDEMPOTENT = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+    REDIRECTS = (301, 302, 303, 307, 308)
+    
+    def __init__(self, pool_size=10, timeout=30, retries=2, backoff=0.1, headers=None, max_redirects=10, proxies=None):
+        self.pool_size = pool_size
+        # Reading the environment costs more than a pooled request, so the
+        # proxy settings and each host's route are looked up once
+        self.system_proxies = proxies is None
+        self.proxies = urllib.request.getproxies() if proxies is None else dict(proxies)
+        self.routes = {}
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_redirects = max_redirects
+        self.headers = {'User-Agent': 'ShiboScript', 'Accept-Encoding': 'gzip, deflate'}
+        self.headers.update(headers or {})
+        self.pools = {}
+        self.lock = threading.Lock()
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.requests_sent = 0
+        self.retries_made = 0
+    
+    def get(self, url, headers=None, params=None, timeout=None):
+        return self.request('GET', url, headers=headers, params=params, timeout=timeout)
+    
+    def post(self, url, data=None, headers=None):
+        return self.request('POST', url, data, headers)
+    
+    def put(self, url, data=None, headers=None):
+        return self.request('PUT', url, data, headers)
+    
+    def delete(self, url, headers=None):
+        return self.request('DELETE', url, headers=headers)
+    
+    def head(self, url, headers=None):
+        return self.request('HEAD', url, headers=headers)
+    
+    def request(self, method, url, data=None, headers=None, params=None, timeout=None):
+        """Send a request and return {'status', 'text', 'headers', 'url'}.
+        
+        Redirects are followed; 4xx/5xx responses raise NetworkError. A
+        timeout overrides the session's socket timeout for this request.
+        """
+        response = self.open(method, url, data, headers, params, timeout)
+        try:
+            body = _decode_body(response.read(), response.getheader('Content-Encoding'))
+        finally:
+            response.release()
+        charset = _charset(response.getheader('Content-Type')) or 'utf-8'
+        return {'status': response.status, 'text': body.decode(charset), 'headers': dict(response.headers), 'url': response.url}
+    
+    def open(self, method, url, data=None, headers=None, params=None, timeout=None):
+        """Send a request and return the PooledResponse with its body unread.
+        
+        Call ``release()`` once done reading, so the connection returns to
+        the pool.
+        """
+        method = method.upper()
+        if params:
+            url += ('&' if '?' in url else '?') + urllib.parse.urlencode(params)
+        request_headers = dict(self.headers)
+        if isinstance(data, dict):
+            data = urllib.parse.urlencode(data).encode('utf-8')
+            request_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif isinstance(data, str):
+            data = data.encode('utf-8')
+        request_headers.update(headers or {})
+        for _ in range(self.max_redirects + 1):
+            response = self.send(method, url, data, request_headers, timeout)
+            location = response.getheader('Location')
+            if response.status not in self.REDIRECTS or not location:
+                break
+            response.read()
+            response.release()
+            url = urllib.parse.urljoin(url, location)
+            if response.status == 303 or (response.status in (301, 302) and method == 'POST'):
+                method, data = 'GET', None
+                request_headers.pop('Content-Type', None)
+        else:
+            raise NetworkError(f"Too many redirects (more than {self.max_redirects})", url)
+        if response.status >= 400:
+            body = response.read()
+            response.release()
+            raise HTTPError(url, response.status, response.reason, response.headers, body)
+        return response
+    
+    def send(self, method, url, data, headers, timeout=None):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise NetworkError(f"Unsupported URL scheme: {parts.scheme}", url)
+        proxy = self.proxy_for(parts.scheme, parts.hostname)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80), proxy)
+        target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        if proxy and parts.scheme == 'http':
+            # Plain HTTP goes to the proxy with the absolute URL as target;
+            # HTTPS is tunnelled with CONNECT instead (see connect)
+            target = urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path or '/', parts.query, ''))
+            authorization = _proxy_authorization(proxy)
+            if authorization:
+                headers = dict(headers, **{'Proxy-Authorization': authorization})
+        timeout = self.timeout if timeout is None else timeout
+        attempt = 0
+        while True:
+            conn, reused = self.acquire(key)
+            # Pooled connections keep whichever timeout they last ran with
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            sent = False
+            try:
+                conn.request(method, target, body=data, headers=headers)
+                sent = True
+                response = conn.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                # A pooled connection the server has since closed fails
+                # before any response; that is not the server's fault. Once
+                # the request went out it may still have been processed, so
+                # only idempotent methods are sent again.
+                stale = reused and isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if stale and (not sent or method in self.IDEMPOTENT):
+                    continue
+                if attempt >= self.retries or method not in self.IDEMPOTENT:
+                    raise NetworkError(str(e) or type(e).__name__, url)
+            else:
+                self.requests_sent += 1
+                if response.status not in self.RETRY_STATUSES or attempt >= self.retries or method not in self.IDEMPOTENT:
+                    return PooledResponse(response, self, key, conn, url)
+                response.read()
+                self.release(key, conn, response)
+            attempt += 1
+            self.retries_made += 1
+            time.sleep(self.backoff * (2 ** (attempt - 1)))
+    
+    def acquire(self, key):
+        while True:
+            with self.lock:
+                idle = self.pools.get(key)
+                if not idle:
+                    self.connections_opened += 1
+                    break
+                conn = idle.pop()
+            if _connection_usable(conn):
+                with self.lock:
+                    self.connections_reused += 1
+                return conn, True
+            conn.close()
+        return self.connect(key), False
+    
+    def connect(self, key):
+        scheme, host, port, proxy = key
+        if not proxy:
+            if scheme == 'https':
+                return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+            return http.client.HTTPConnection(host, port, timeout=self.timeout)
+        proxy_parts = urllib.parse.urlsplit(proxy)
+        proxy_port = proxy_parts.port or 80
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(proxy_parts.hostname, proxy_port, timeout=self.timeout)
+            authorization = _proxy_authorization(proxy)
+            conn.set_tunnel(host, port, {'Proxy-Authorization': authorization} if authorization else None)
+            return conn
+        return http.client.HTTPConnection(proxy_parts.hostname, proxy_port, timeout=self.timeout)
+    
+    def proxy_for(self, scheme, host):
+        """The proxy URL to reach host over scheme, or None to go direct"""
+        try:
+            return self.routes[scheme, host]
+        except KeyError:
+            pass
+        proxy = self.proxies.get(scheme)
+        if proxy:
+            # proxy_bypass also consults the system settings on macOS/Windows
+            bypass = urllib.request.proxy_bypass(host) if self.system_proxies else urllib.request.proxy_bypass_environment(host, self.proxies)
+            proxy = None if bypass else proxy if '://' in proxy else 'http://' + proxy
+        self.routes[scheme, host] = proxy
+        return proxy
+    
+    def release(self, key, conn, response):
+        if response.will_close or not response.isclosed():
+            conn.close()
+            return
+        with self.lock:
+            idle = self.pools.setdefault(key, deque())
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+    
+    def stats(self):
+        with self.lock:
+            idle = sum(len(conns) for conns in self.pools.values())
+        return {
+            'requests': self.requests_sent,
+            'connections_opened': self.connections_opened,
+            'connections_reused': self.connections_reused,
+            'retries': self.retries_made,
+            'idle_connections': idle,
+        }
+    
+    def close(self):
+        with self.lock:
+            pools, self.pools = self.pools, {}
+        for idle in pools.values():
+            for conn in idle:
+                conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+def _proxy_authorization(proxy):
+    """Basic Proxy-Authorization value for credentials in a proxy URL"""
+    parts = urllib.parse.urlsplit(proxy)
+    if parts.username is None:
+        return None
+    credentials = f"{urllib.parse.unquote(parts.username)}:{urllib.parse.unquote(parts.password or '')}"
+    return 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+
+def _connection_usable(conn):
+    """Whether an idle pooled connection can carry another request.
+    
+    An idle keep-alive socket has nothing to read; if it is readable the
+    server has closed it (or sent something unsolicited).
+    """
+    if conn.sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+class PooledResponse:
+    """An http.client response that hands its connection back when released"""
+    
+    def __init__(self, response, session, key, conn, url):
+        self.response = response
+        self.session = session
+        self.key = key
+        self.conn = conn
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+    
+    def getheader(self, name, default=None):
+        return self.response.getheader(name, default)
+    
+    def read(self, amount=None):
+        return self.response.read(amount)
+    
+    def release(self):
+        if self.conn is not None:
+            self.session.release(self.key, self.conn, self.response)
+            self.conn = None
+
+def _decode_body(body, encoding):
+    encoding = (encoding or '').lower()
+    if encoding == 'gzip':
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    elif encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib header
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+def _charset(content_type):
+    for param in (content_type or '').split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset':
+            return value.strip().strip('"')
+    return None
+
+_default_session = HTTPSession()
+
+def http_session(pool_size=10, timeout=30, retries=2, backoff=0.1, headers=None):
+    return HTTPSession(pool_size, timeout, retries, backoff, headers)
+
 def http_get(url, headers=None, params=None):
-    if params:
-        url += '?' + urllib.parse.urlencode(params)
-    req = urllib.request.Request(url, headers=headers or {})
-    with urllib.request.urlopen(req) as response:
-        return {'status': response.status, 'text': response.read().decode('utf-8'), 'headers': dict(response.headers)}
+    return _default_session.get(url, headers, params)
 
 def http_post(url, data, headers=None):
-    if isinstance(data, dict):
-        data = urllib.parse.urlencode(data).encode('utf-8')
-    req = urllib.request.Request(url, data=data, headers=headers or {}, method='POST')
-    with urllib.request.urlopen(req) as response:
-        return {'status': response.status, 'text': response.read().decode('utf-8'), 'headers': dict(response.headers)}
+    return _default_session.post(url, data, headers)
 
 def http_put(url, data, headers=None):
-    if isinstance(data, dict):
-        data = urllib.parse.urlencode(data).encode('utf-8')
-    req = urllib.request.Request(url, data=data, headers=headers or {}, method='PUT')
-    with urllib.request.urlopen(req) as response:
-        return {'status': response.status, 'text': response.read().decode('utf-8'), 'headers': dict(response.headers)}
+    return _default_session.put(url, data, headers)
 
 def http_delete(url, headers=None):
-    req = urllib.request.Request(url, headers=headers or {}, method='DELETE')
-    with urllib.request.urlopen(req) as response:
-        return {'status': response.status, 'text': response.read().decode('utf-8'), 'headers': dict(response.headers)}
+    return _default_session.delete(url, headers)
 
 def http_request(method, url, data=None, headers=None, params=None):
+    return _default_session.request(method, url, data, headers, params)
+
+def fetch_all(interpreter, urls, concurrency=8, timeout=None, callback=None, session=None):
+    """GET every URL through at most `concurrency` workers sharing one session.
+    
+    Returns one result per URL in input order, each with url, ok, status,
+    text, headers, error and elapsed_ms. Failures do not abort the batch. If
+    given, callback(result) runs on the calling thread as each one finishes.
+    A timeout applies to each request, including on a passed-in session.
+    """
+    urls = list(urls)
+    concurrency = max(1, min(int(concurrency or 1), len(urls) or 1))
+    owned = session is None
+    if owned:
+        session = HTTPSession(pool_size=concurrency, timeout=timeout if timeout is not None else 30)
+    batch_started = time.perf_counter()
+    results = [None] * len(urls)
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(_fetch_one, session, url, batch_started, timeout): index for index, url in enumerate(urls)}
+            for future in concurrent.futures.as_completed(futures):
+                result = results[futures[future]] = future.result()
+                if callback is not None:
+                    _invoke(interpreter, callback, [result])
+    finally:
+        if owned:
+            session.close()
+    return results
+
+def _fetch_one(session, url, batch_started, timeout):
+    started = time.perf_counter()
+    result = {'url': url, 'ok': False, 'status': None, 'text': None, 'headers': {}, 'error': None}
+    try:
+        response = session.get(url, timeout=timeout)
+        result.update(ok=True, status=response['status'], text=response['text'], headers=response['headers'])
+    except Exception as e:
+        result['status'] = getattr(e, 'status', None)
+        result['error'] = str(e)
+    finished = time.perf_counter()
+    result['started_ms'] = (started - batch_started) * 1000
+    result['elapsed_ms'] = (finished - started) * 1000
+    return result
+
+def download_file(interpreter, url, filename, headers=None, chunk_size=65536, resume=False, progress=None, checksum=None):
+    """Stream url to filename in chunk_size pieces, hashing as it goes.
+    
+    With resume, an existing partial file is continued with an HTTP Range
+    request (servers that ignore Range send the whole body again).
+    progress(downloaded, total) is called after each chunk; total is null
+    when the server does not say. checksum, if given, is the expected
+    sha256 hex digest.
+    """
+    request_headers = {'Accept-Encoding': 'identity'}
+    request_headers.update(headers or {})
+    offset = os.path.getsize(filename) if resume and os.path.exists(filename) else 0
+    if offset:
+        request_headers['Range'] = f'bytes={offset}-'
+    digest = hashlib.sha256()
+    try:
+        response = _default_session.open('GET', url, headers=request_headers)
+    except NetworkError as e:
+        if not offset or getattr(e, 'status', None) != 416:
+            raise
+        # Range not satisfiable: the partial file is already complete
+        response = None
+    resumed = response is not None and offset > 0 and response.status == 206
+    if offset and (response is None or resumed):
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                digest.update(block)
+    else:
+        offset = 0
+    downloaded = 0
+    if response is not None:
+        total = _content_total(response, offset)
+        try:
+            with open(filename, 'ab' if resumed else 'wb') as f:
+                while True:
+                    chunk = response.read(chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    digest.update(chunk)
+                    downloaded += len(chunk)
+                    if progress is not None:
+                        _invoke(interpreter, progress, [offset + downloaded, total])
+        finally:
+            response.release()
+    sha256_hex = digest.hexdigest()
+    if checksum is not None and checksum.lower() != sha256_hex:
+        raise ValidationError(f"Checksum mismatch for {filename}: expected {checksum}, got {sha256_hex}")
+    return {
+        'status': 'success', 'filename': filename, 'url': url, 'bytes': offset + downloaded,
+        'downloaded': downloaded, 'resumed': resumed, 'sha256': sha256_hex,
+    }
+
+def _content_total(response, offset):
+    content_range = response.getheader('Content-Range')
+    if content_range and '/' in content_range:
+        total = content_range.rsplit('/', 1)[1].strip()
+        return int(total) if total.isdigit() else None
+    length = response.getheader('Content-Length')
+    return offset + int(length) if length and length.isdigit() else None
+
+def http_stream(url, lines=False, chunk_size=65536, headers=None, session=None):
+    """GET url and return an iterator over the body without buffering it.
+    
+    Yields byte chunks, or decoded text lines (without line endings) when
+    lines is true. The connection returns to the pool once the iterator is
+    exhausted.
+    """
+    response = (session or _default_session).open('GET', url, headers=headers)
+    return _iter_body(response, lines, chunk_size)
+
+def _iter_body(response, lines, chunk_size):
+    decompressor = None
+    if (response.getheader('Content-Encoding') or '').lower() in ('gzip', 'deflate'):
+        # wbits of 32 + MAX_WBITS detects gzip and zlib headers alike
+        decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+    charset = _charset(response.getheader('Content-Type')) or 'utf-8'
+    pending = b''
+    try:
+        while True:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                break
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            if not lines:
+                if chunk:
+                    yield chunk
+                continue
+            pending += chunk
+            *complete, pending = pending.split(b'\n')
+            for line in complete:
+                yield line.rstrip(b'\r').decode(charset)
+        tail = decompressor.flush() if decompressor is not None else b''
+        if not lines:
+            if tail:
+                yield tail
+        elif pending + tail:
+            for line in (pending + tail).split(b'\n'):
+                yield line.rstrip(b'\r').decode(charset)
+    finally:
+        response.release()
+
+def _invoke(interpreter, func, args):
+    """Call a callback handed to a builtin, which may be a script function"""
+    if interpreter is not None:
+        return interpreter.call_function(func, list(args))
+    return func(*args)
+
+def get_content_type(url):
+    response = _default_session.head(url)
+    return response['headers'].get('Content-Type', 'unknown')
+
+# Awaitable HTTP on asyncio streams. Requests overlap on the event loop
+# thread instead of each holding a worker thread, so a script can keep
+# thousands of them in flight.
+async def http_request_async(method, url, data=None, headers=None, params=None, timeout=None):
     if params:
         url += '?' + urllib.parse.urlencode(params)
-    
+    request_headers = {}
     if data and isinstance(data, dict):
         data = urllib.parse.urlencode(data).encode('utf-8')
+        request_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    elif isinstance(data, str):
+        data = data.encode('utf-8')
+    request_headers.update(headers or {})
+    try:
+        return await asyncio.wait_for(_http_exchange(method.upper(), url, data, request_headers), timeout)
+    except asyncio.TimeoutError:
+        raise NetworkError(f"Request timed out after {timeout} seconds", url)
+    except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+        raise NetworkError(str(e), url)
+
+async def _http_exchange(method, url, data, headers):
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError(f"Unsupported URL scheme: {parts.scheme}")
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+    target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+    request_headers = {'Host': parts.netloc, 'User-Agent': 'ShiboScript', 'Accept-Encoding': 'identity', 'Connection': 'close'}
+    request_headers.update(headers)
+    if data is not None:
+        request_headers['Content-Length'] = str(len(data))
+    reader, writer = await asyncio.open_connection(parts.hostname, port, ssl=True if secure else None)
+    try:
+        head = f"{method} {target} HTTP/1.1\r\n" + ''.join(f"{name}: {value}\r\n" for name, value in request_headers.items())
+        writer.write(head.encode('latin-1') + b'\r\n' + (data or b''))
+        await writer.drain()
+        status_line = (await reader.readline()).decode('latin-1').split(None, 2)
+        if len(status_line) < 2 or not status_line[0].startswith('HTTP/'):
+            raise ValueError("Malformed HTTP response")
+        status = int(status_line[1])
+        reason = status_line[2].strip() if len(status_line) > 2 else ''
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip()] = value.strip()
+        lowered = {name.lower(): value for name, value in response_headers.items()}
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif lowered.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    # Skip trailers up to the blank line
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in lowered:
+            body = await reader.readexactly(int(lowered['content-length']))
+        else:
+            body = await reader.read()
+    finally:
+        writer.close()
+    if status >= 400:
+        raise HTTPError(url, status, reason, response_headers, body)
+    return {'status': status, 'text': body.decode('utf-8'), 'headers': response_headers, 'url': url}
+
+def http_get_async(url, headers=None, params=None, timeout=None):
+    return http_request_async('GET', url, headers=headers, params=params, timeout=timeout)
+
+def http_post_async(url, data, headers=None, timeout=None):
+    return http_request_async('POST', url, data, headers, timeout=timeout)
+
+def http_put_async(url, data, headers=None, timeout=None):
+    return http_request_async('PUT', url, data, headers, timeout=timeout)
+
+def http_delete_async(url, headers=None, timeout=None):
+    return http_request_async('DELETE', url, headers=headers, timeout=timeout)
+
+# The one-shot html_* helpers use single-purpose patterns, each one linear
+# pass in the regex engine; HTMLScanner is for streaming and selectors
+_HTML_TAG = re.compile(r'<([^>]+)>')
+_HTML_SPACE = re.compile(r'\s+')
+_HTML_HREF = re.compile(r'href=["\']([^"\']*)["\']')
+_HTML_SRC = re.compile(r'src=["\']([^"\']*)["\']')
+# Form and input tags plus form ends; a form without </form> ends at the
+# next form instead of making a DOTALL match rescan the rest of the page
+_HTML_FORM_TAG = re.compile(r'<(/?)(form|input)\b([^>]*)>')
+_HTML_ATTRIBUTE = re.compile(r'([^\s/>"\'=]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]*))?')
+
+def _html_attributes(attributes):
+    attrs = {}
+    for name, value in _HTML_ATTRIBUTE.findall(attributes):
+        if value[:1] in ('"', "'"):
+            value = value[1:-1]
+        attrs.setdefault(name.lower(), html.unescape(value) if '&' in value else value)
+    return attrs
+
+class HTMLScanner:
+    """Single-pass, incremental HTML extraction.
+    
+    Feed the document in chunks (str, or bytes decoded incrementally) and
+    call close() for the result: tags, text, links, images, forms and, for
+    each selector given, the matching elements. Only open elements, an
+    unfinished trailing tag and elements matched by a selector are
+    buffered; pass tags=False and text=False to skip collecting the whole
+    document's tags and text.
+    
+    Selectors support tag, #id, .class, [attr] and [attr=value] parts,
+    combined with descendant (space) and child (>) combinators.
+    """
+    
+    # One token per match: a comment, a start/end tag or a declaration.
+    # The attribute part has a single alternative per character, so a tag
+    # with no closing '>' fails in linear time instead of backtracking.
+    TOKEN = re.compile(r'<(?:!--(.*?)--|(/?)([A-Za-z][^\s/>]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)|(!(?!--)[^>]*|\?[^>]*))>', re.S)
+    RAW_TEXT = {'script': re.compile(r'</script\s*>', re.I), 'style': re.compile(r'</style\s*>', re.I),
+                'textarea': re.compile(r'</textarea\s*>', re.I), 'title': re.compile(r'</title\s*>', re.I)}
+    SPECIAL = frozenset(['form', 'input', 'script', 'style', 'textarea', 'title'])
+    VOID = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                      'link', 'meta', 'param', 'source', 'track', 'wbr'])
+    # Opening one of these while the same tag is open closes the first
+    SELF_CLOSING = frozenset(['p', 'li', 'option', 'tr', 'td', 'th', 'dt', 'dd'])
+    # Block elements that implicitly close an open <p>
+    CLOSES_P = frozenset(['address', 'article', 'aside', 'blockquote', 'div', 'dl', 'fieldset',
+                          'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr',
+                          'main', 'nav', 'ol', 'pre', 'section', 'table', 'ul'])
+    SELECTOR = re.compile(r'\s*(>)?\s*([A-Za-z][\w-]*|\*)?((?:[#.][\w-]+|\[[\w-]+(?:=["\']?[^\]"\']*["\']?)?\])*)')
+    PART = re.compile(r'([#.])([\w-]+)|\[([\w-]+)(?:(=)["\']?([^\]"\']*)["\']?)?\]')
+    
+    def __init__(self, selectors=None, tags=True, text=True, encoding='utf-8'):
+        if isinstance(selectors, str):
+            selectors = [selectors]
+        self.selectors = [(selector, self.compile_selector(selector)) for selector in selectors or ()]
+        self.keep_tags = tags
+        self.keep_text = text
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.pending = ''
+        self.separate = False  # text ended the last chunk; the next tag separates words
+        self.raw_text = None   # closing-tag pattern while inside <script> etc.
+        self.tags = []
+        self.text = []
+        self.links = []
+        self.images = []
+        self.forms = []
+        self.matches = {selector: [] for selector, _ in self.selectors}
+        self.stack = []        # open elements: (tag, attrs, matched elements)
+        self.capturing = []    # text buffers of the open matched elements
+        self.form = None
+    
+    @classmethod
+    def compile_selector(cls, selector):
+        steps = []
+        position = 0
+        end = len(selector.rstrip())
+        while position < end:
+            match = cls.SELECTOR.match(selector, position)
+            if match.end() == position or not (match.group(2) or match.group(3)):
+                raise ValidationError(f"Invalid selector: {selector!r}", 'selector')
+            position = match.end()
+            tag = match.group(2) if match.group(2) != '*' else None
+            conditions = []
+            for symbol, name, attribute, equals, value in cls.PART.findall(match.group(3)):
+                if symbol == '#':
+                    conditions.append(('id', name, False))
+                elif symbol == '.':
+                    conditions.append(('class', name, True))
+                else:
+                    conditions.append((attribute.lower(), value if equals else None, False))
+            steps.append((bool(match.group(1)), tag and tag.lower(), tuple(conditions)))
+        if not steps or steps[0][0]:
+            raise ValidationError(f"Invalid selector: {selector!r}", 'selector')
+        return tuple(steps)
+    
+    @staticmethod
+    def matches_step(step, tag, attrs):
+        _, want_tag, conditions = step
+        if want_tag is not None and want_tag != tag:
+            return False
+        for name, value, is_class in conditions:
+            if name not in attrs:
+                return False
+            if is_class:
+                if value not in attrs[name].split():
+                    return False
+            elif value is not None and attrs[name] != value:
+                return False
+        return True
     
-    req = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
-    with urllib.request.urlopen(req) as response:
+    def matches_path(self, steps, index, depth):
+        # steps[index] has matched the element at stack[depth]; check the
+        # remaining steps against its ancestors
+        if index == 0:
+            return True
+        child, step = steps[index][0], steps[index - 1]
+        for ancestor in range(depth - 1, -1, -1):
+            tag, attrs, _ = self.stack[ancestor]
+            if self.matches_step(step, tag, attrs) and self.matches_path(steps, index - 1, ancestor):
+                return True
+            if child:
+                return False
+        return False
+    
+    def feed(self, data):
+        if isinstance(data, (bytes, bytearray)):
+            data = self.decoder.decode(data)
+        self.scan(self.pending + data if self.pending else data, final=False)
+        return self
+    
+    def close(self):
+        self.scan(self.pending + self.decoder.decode(b'', final=True), final=True)
+        while self.stack:
+            self.end_element()
+        if self.form is not None:
+            self.forms.append(self.form)
+            self.form = None
         return {
-            'status': response.status,
-            'text': response.read().decode('utf-8'),
-            'headers': dict(response.headers),
-            'url': url
+            'tags': self.tags,
+            'text': ' '.join(''.join(self.text).split()),
+            'links': self.links,
+            'images': self.images,
+            'forms': self.forms,
+            'matches': self.matches,
         }
-
-def download_file(url, filename, headers=None):
-    req = urllib.request.Request(url, headers=headers or {})
-    with urllib.request.urlopen(req) as response:
-        with open(filename, 'wb') as f:
-            f.write(response.read())
-    return {'status': 'success', 'filename': filename, 'url': url}
-
-def get_content_type(url):
-    req = urllib.request.Request(url, method='HEAD')
-    with urllib.request.urlopen(req) as response:
-        return response.headers.get('Content-Type', 'unknown')
+    
+    def scan(self, data, final):
+        position = 0
+        keep_tags, tags = self.keep_tags, self.tags
+        handle_data, handle_starttag, handle_endtag = self.handle_data, self.handle_starttag, self.handle_endtag
+        # Without selectors no open elements are tracked, so only tags that
+        # carry attributes or start a form or raw text need handling
+        track = bool(self.selectors)
+        special = self.SPECIAL
+        separate = self.separate
+        while True:
+            if self.raw_text is not None:
+                match = self.raw_text.search(data, position)
+                if match is None:
+                    break
+                handle_data(data[position:match.start()])
+                self.raw_text = None
+                position = match.start()
+                separate = True
+            for match in self.TOKEN.finditer(data, position):
+                start = match.start()
+                if start > position:
+                    text = data[position:start]
+                    if not final and '<!--' in text:
+                        # An unterminated comment may hide tags; wait for its end
+                        break
+                    # Tags separate words, so "a<br>b" reads as "a b"
+                    handle_data(text + ' ')
+                elif separate:
+                    handle_data(' ')
+                separate = False
+                position = match.end()
+                if keep_tags:
+                    tags.append(data[start + 1:position - 1])
+                comment, closing, tag, attributes, declaration = match.groups()
+                if tag is None:
+                    continue
+                if closing:
+                    if track or tag.lower() == 'form':
+                        handle_endtag(tag.lower())
+                elif track or attributes or tag.lower() in special:
+                    handle_starttag(tag.lower(), attributes)
+                    if self.raw_text is not None:
+                        break
+            else:
+                break
+            if self.raw_text is None:
+                break
+        # Keep an unfinished tag, raw text or entity for the next chunk; the
+        # rest is text
+        rest = data[position:]
+        cut = len(rest) if final else (0 if self.raw_text is not None else rest.find('<'))
+        if cut < 0:
+            cut = len(rest)
+        if not final:
+            entity = rest.rfind('&', 0, cut)
+            if entity >= 0 and ';' not in rest[entity:cut] and cut - entity < 32:
+                cut = entity
+        if cut:
+            handle_data(rest[:cut])
+            separate = True
+        self.pending = rest[cut:]
+        self.separate = separate
+    
+    def handle_starttag(self, tag, attributes):
+        attrs = _html_attributes(attributes) if attributes else {}
+        if attrs:
+            if 'href' in attrs:
+                self.links.append(attrs['href'])
+            if 'src' in attrs:
+                self.images.append(attrs['src'])
+        if tag == 'form':
+            if self.form is not None:
+                self.forms.append(self.form)
+            self.form = {'id': attrs.get('id'), 'action': attrs.get('action', ''),
+                         'method': attrs.get('method', 'GET').upper(), 'inputs': []}
+        elif tag == 'input' and self.form is not None and 'name' in attrs:
+            self.form['inputs'].append({'name': attrs['name'], 'type': attrs.get('type') or 'text',
+                                        'value': attrs.get('value', '')})
+        void = tag in self.VOID or attributes.endswith('/')
+        if not void:
+            self.raw_text = self.RAW_TEXT.get(tag)
+        if not self.selectors:
+            # Without selectors there is nothing to track open elements for
+            return
+        stack = self.stack
+        if stack and (stack[-1][0] == tag in self.SELF_CLOSING
+                      or stack[-1][0] == 'p' and tag in self.CLOSES_P):
+            self.end_element()
+        matched = []
+        stack.append((tag, attrs, matched))
+        for selector, steps in self.selectors:
+            if self.matches_step(steps[-1], tag, attrs) and self.matches_path(steps, len(steps) - 1, len(stack) - 1):
+                element = {'tag': tag, 'attrs': attrs, 'text': []}
+                self.matches[selector].append(element)
+                matched.append(element)
+                self.capturing.append(element['text'])
+        if void:
+            self.end_element()
+    
+    def handle_endtag(self, tag):
+        if tag == 'form' and self.form is not None:
+            self.forms.append(self.form)
+            self.form = None
+        stack = self.stack
+        for depth in range(len(stack) - 1, -1, -1):
+            if stack[depth][0] == tag:
+                while len(stack) > depth:
+                    self.end_element()
+                break
+    
+    def end_element(self):
+        matched = self.stack.pop()[2]
+        if matched:
+            for element in matched:
+                element['text'] = ' '.join(''.join(element['text']).split())
+            del self.capturing[-len(matched):]
+    
+    def handle_data(self, data):
+        if '&' in data:
+            data = html.unescape(data)
+        if self.keep_text:
+            self.text.append(data)
+        for text in self.capturing:
+            text.append(data)
+
+def html_scanner(selectors=None, tags=True, text=True):
+    """Create an HTMLScanner to feed a document in chunks"""
+    return HTMLScanner(selectors, tags, text)
+
+def html_select(html_string, selectors):
+    """Return the elements matching a selector (or a dict for a list of them)"""
+    matches = HTMLScanner(selectors, tags=False, text=False).feed(html_string).close()['matches']
+    return matches[selectors] if isinstance(selectors, str) else matches
 
 def html_parse(html_string):
     """Simple HTML tag extraction"""
-    import re
-    # Extract all tags
-    tags = re.findall(r'<([^>]+)>', html_string)
-    # Extract text content
-    text_content = re.sub(r'<[^>]+>', ' ', html_string)
-    text_content = re.sub(r'\s+', ' ', text_content).strip()
+    tags = _HTML_TAG.findall(html_string)
+    text_content = _HTML_SPACE.sub(' ', _HTML_TAG.sub(' ', html_string)).strip()
     return {'tags': tags, 'text': text_content}
 
 def html_extract_links(html_string):
     """Extract all href links from HTML"""
-    import re
-    links = re.findall(r'href=["\']([^"\']*)["\']', html_string)
-    return links
+    return _HTML_HREF.findall(html_string)
 
 def html_extract_images(html_string):
     """Extract all image sources from HTML"""
-    import re
-    images = re.findall(r'src=["\']([^"\']*)["\']', html_string)
-    return images
+    return _HTML_SRC.findall(html_string)
 
 def css_parse(css_string):
     """Simple CSS rule parsing"""
@@ -1077,39 +3028,25 @@ def css_parse(css_string):
     return rules
 
 def html_form_data(html_string, form_id=None):
-    """Extract form data structure from HTML"""
-    import re
+    """Extract form data structure from HTML: the first form, or the one with id form_id"""
     forms = []
-    # Find all forms
-    form_matches = re.findall(r'<form[^>]*>(.*?)</form>', html_string, re.DOTALL)
-    for form_html in form_matches:
-        form_data = {}
-        # Extract action and method
-        action_match = re.search(r'action=["\']([^"\']*)["\']', form_html)
-        method_match = re.search(r'method=["\']([^"\']*)["\']', form_html)
-        
-        form_data['action'] = action_match.group(1) if action_match else ''
-        form_data['method'] = method_match.group(1).upper() if method_match else 'GET'
-        
-        # Extract input fields
-        inputs = []
-        input_matches = re.findall(r'<input[^>]*>', form_html)
-        for input_tag in input_matches:
-            input_data = {}
-            name_match = re.search(r'name=["\']([^"\']*)["\']', input_tag)
-            type_match = re.search(r'type=["\']([^"\']*)["\']', input_tag)
-            value_match = re.search(r'value=["\']([^"\']*)["\']', input_tag)
-            
-            if name_match:
-                input_data['name'] = name_match.group(1)
-                input_data['type'] = type_match.group(1) if type_match else 'text'
-                input_data['value'] = value_match.group(1) if value_match else ''
-                inputs.append(input_data)
-        
-        form_data['inputs'] = inputs
-        forms.append(form_data)
-    
-    return forms[0] if form_id is None and forms else forms
+    form = None
+    for closing, tag, attributes in _HTML_FORM_TAG.findall(html_string):
+        if tag == 'input':
+            attrs = _html_attributes(attributes)
+            if form is not None and 'name' in attrs:
+                form['inputs'].append({'name': attrs['name'], 'type': attrs.get('type') or 'text',
+                                       'value': attrs.get('value', '')})
+        elif closing:
+            form = None
+        else:
+            attrs = _html_attributes(attributes)
+            form = {'action': attrs.get('action', ''), 'method': attrs.get('method', 'GET').upper(),
+                    'inputs': []}
+            forms.append((attrs.get('id'), form))
+    if form_id is not None:
+        return next((form for id_, form in forms if id_ == form_id), None)
+    return forms[0][1] if forms else []
 
 def create_web_server(port=8000):
     """Create a simple web server configuration"""
@@ -1137,13 +3074,20 @@ def serve_static_file(server, url_path, file_path):
     server['static_files'][url_path] = file_path
     return server
 
-def render_template(template_string, context):
-    """Simple template rendering with variable substitution"""
-    result = template_string
-    for key, value in context.items():
-        placeholder = '{{' + key + '}}'
-        result = result.replace(placeholder, str(value))
-    return result
+def serve(interpreter, server, model='threaded', host='127.0.0.1', workers=None):
+    """Serve a create_web_server config until interrupted"""
+    from .webserver import WebServer
+    web_server = WebServer(server, interpreter, host, None, model, workers)
+    print(f"{Colors.OKCYAN}Serving on http://{host}:{web_server.port} ({model}){Colors.ENDC}")
+    try:
+        web_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return None
+
+def render_template(interpreter, template_string, context=None):
+    """Render a template with {{ expr }}, {% for %} and {% if %} (see Template)"""
+    return compile_template(template_string).render(context, interpreter)
 
 def validate_json_schema(data, schema):
     """Simple JSON schema validation"""
@@ -1178,62 +3122,259 @@ def create_api_response(status, data, message=None):
         response['message'] = message
     return response
 
-def jwt_encode(payload, secret, algorithm='HS256'):
-    """Simple JWT encoding (basic implementation)"""
-    import hmac
-    import hashlib
-    import json
-    import base64
-    
-    # Create header
-    header = {'typ': 'JWT', 'alg': algorithm}
-    header_json = json.dumps(header)
-    header_b64 = base64.b64encode(header_json.encode()).decode()
-    
-    # Create payload
-    payload_json = json.dumps(payload)
-    payload_b64 = base64.b64encode(payload_json.encode()).decode()
-    
-    # Create signature
-    signing_input = header_b64 + '.' + payload_b64
-    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
-    signature_b64 = base64.b64encode(signature).decode()
-    
-    return header_b64 + '.' + payload_b64 + '.' + signature_b64
-
-def jwt_decode(token, secret):
-    """Simple JWT decoding (basic implementation)"""
-    import hmac
-    import hashlib
-    import json
-    import base64
-    
-    try:
-        parts = token.split('.')
-        if len(parts) != 3:
+_TO_URLSAFE = bytes.maketrans(b'+/', b'-_')
+_FROM_URLSAFE = bytes.maketrans(b'-_', b'+/')
+
+def _b64url_encode(data):
+    return binascii.b2a_base64(data, newline=False).rstrip(b'=').translate(_TO_URLSAFE)
+
+def _b64url_decode(segment):
+    segment = segment.encode('ascii')
+    return binascii.a2b_base64(segment.translate(_FROM_URLSAFE) + b'=' * (-len(segment) % 4))
+
+class JWTSigner:
+    """Sign and verify HMAC JWTs with one secret.
+    
+    The header segment and the keyed HMAC state are built once; every
+    token copies the HMAC state instead of re-keying it. verify returns
+    the payload, or None when the token is malformed, its signature does
+    not match or its exp/nbf claims (allowing leeway seconds) reject it.
+    
+    The payload JSON of the last cache_size tokens with valid signatures
+    is kept, so a client presenting the same token again skips the
+    signature check. The JSON is parsed again on every call, so callers
+    never share (or can tamper with) a cached payload.
+    """
+    
+    ALGORITHMS = {'HS256': hashlib.sha256, 'HS384': hashlib.sha384, 'HS512': hashlib.sha512}
+    
+    def __init__(self, secret, algorithm='HS256', leeway=0, cache_size=1024):
+        if algorithm not in self.ALGORITHMS:
+            raise ValidationError(f"Unsupported JWT algorithm: {algorithm}", 'algorithm')
+        key = secret.encode('utf-8') if isinstance(secret, str) else secret
+        self.algorithm = algorithm
+        self.leeway = leeway
+        self.mac = hmac.new(key, digestmod=self.ALGORITHMS[algorithm])
+        header = json.dumps({'alg': algorithm, 'typ': 'JWT'}, separators=(',', ':'))
+        self.header = _b64url_encode(header.encode('utf-8')).decode('ascii')
+        # Header segments from other issuers are decoded once and remembered
+        self.headers = {self.header: True}
+        self.verified = ResultCache(cache_size, metric_prefix=None) if cache_size else None
+    
+    def signature(self, signing_input):
+        mac = self.mac.copy()
+        mac.update(signing_input)
+        return _b64url_encode(mac.digest())
+    
+    def sign(self, payload):
+        """Return a compact JWT for payload"""
+        payload_b64 = _b64url_encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        signing_input = self.header + '.' + payload_b64.decode('ascii')
+        return signing_input + '.' + self.signature(signing_input.encode('ascii')).decode('ascii')
+    
+    def verify(self, token, now=None):
+        """Return the payload of a valid token, otherwise None"""
+        return self.check(token, time.time() if now is None else now)
+    
+    def verify_many(self, tokens, now=None):
+        """Verify a batch of tokens against one clock reading"""
+        now = time.time() if now is None else now
+        check = self.check
+        return [check(token, now) for token in tokens]
+    
+    def check(self, token, now):
+        # Anything but a string is malformed, and may not even be hashable
+        if not isinstance(token, str):
             return None
-        
-        header_b64, payload_b64, signature_b64 = parts
-        
-        # Verify signature
-        signing_input = header_b64 + '.' + payload_b64
-        expected_signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
-        expected_signature_b64 = base64.b64encode(expected_signature).decode()
-        
-        if signature_b64 != expected_signature_b64:
+        verified = self.verified
+        text = verified.get(token) if verified is not None else None
+        if text is not None:
+            payload = json.loads(text)
+        else:
+            text = self.signed_payload(token)
+            try:
+                payload = json.loads(text) if text is not None else None
+            except ValueError:
+                return None
+            if payload is None:
+                return None
+            if verified is not None:
+                verified.put(token, text)
+        if isinstance(payload, dict):
+            exp = payload.get('exp')
+            nbf = payload.get('nbf')
+            try:
+                if exp is not None and now >= exp + self.leeway:
+                    return None
+                if nbf is not None and now + self.leeway < nbf:
+                    return None
+            except TypeError:
+                return None
+        return payload
+    
+    def decode(self, token):
+        """Return the payload of a correctly signed token, ignoring exp/nbf"""
+        text = self.signed_payload(token)
+        try:
+            return json.loads(text) if text is not None else None
+        except ValueError:
             return None
-        
-        # Decode payload
-        payload_json = base64.b64decode(payload_b64).decode()
-        return json.loads(payload_json)
-    except:
-        return None
+    
+    def signed_payload(self, token):
+        try:
+            signing_input, _, signature = token.rpartition('.')
+            header, _, payload_b64 = signing_input.partition('.')
+            if not payload_b64 or '.' in payload_b64 or not self.accepts(header):
+                return None
+            if not hmac.compare_digest(self.signature(signing_input.encode('ascii')), signature.encode('utf-8')):
+                return None
+            return _b64url_decode(payload_b64).decode('utf-8')
+        except (AttributeError, TypeError, UnicodeError, ValueError, binascii.Error):
+            return None
+    
+    def accepts(self, header):
+        accepted = self.headers.get(header)
+        if accepted is None:
+            try:
+                fields = json.loads(_b64url_decode(header).decode('utf-8'))
+                accepted = isinstance(fields, dict) and fields.get('alg') == self.algorithm
+            except (UnicodeError, ValueError, binascii.Error):
+                accepted = False
+            if len(self.headers) < 64:
+                self.headers[header] = accepted
+        return accepted
+
+_jwt_signers = ResultCache(max_size=64, metric_prefix=None)
+
+def jwt_signer(secret, algorithm='HS256', leeway=0, cache_size=1024):
+    """Create a reusable JWTSigner for secret"""
+    return JWTSigner(secret, algorithm, leeway, cache_size)
+
+def _cached_signer(secret, algorithm='HS256'):
+    signer = _jwt_signers.get((secret, algorithm))
+    if signer is None:
+        signer = JWTSigner(secret, algorithm)
+        _jwt_signers.put((secret, algorithm), signer)
+    return signer
+
+def jwt_encode(payload, secret, algorithm='HS256'):
+    """Encode payload as an HMAC-signed JWT"""
+    return _cached_signer(secret, algorithm).sign(payload)
+
+def jwt_decode(token, secret, algorithm='HS256'):
+    """Return the payload of a valid, unexpired JWT, otherwise None"""
+    return _cached_signer(secret, algorithm).verify(token)
+
+def _to_bytes(data):
+    # Text is hashed and encoded as UTF-8; bytes-like values pass through
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+def base64_encode(s): return base64.b64encode(_to_bytes(s)).decode('ascii')
+def base64_decode(s, binary=False):
+    data = base64.b64decode(s)
+    return data if binary else data.decode('utf-8')
+def md5(s): return hashlib.md5(_to_bytes(s)).hexdigest()
+def sha1(s): return hashlib.sha1(_to_bytes(s)).hexdigest()
+def sha256(s): return hashlib.sha256(_to_bytes(s)).hexdigest()
+
+class Hasher:
+    """Incremental hash; update() takes str (as UTF-8) or bytes and chains"""
+    
+    def __init__(self, algorithm='sha256', data=None):
+        try:
+            self.hash = hashlib.new(algorithm)
+        except (ValueError, TypeError):
+            raise ValidationError(f"Unsupported hash algorithm: {algorithm}", 'algorithm')
+        self.name = self.hash.name
+        if data is not None:
+            self.update(data)
+    
+    def update(self, data):
+        self.hash.update(_to_bytes(data))
+        return self
+    
+    def digest(self):
+        return self.hash.digest()
+    
+    def hexdigest(self):
+        return self.hash.hexdigest()
+    
+    def copy(self):
+        clone = Hasher.__new__(Hasher)
+        clone.hash = self.hash.copy()
+        clone.name = self.name
+        return clone
+
+def hasher(algorithm='sha256', data=None):
+    """Create a Hasher for any hashlib algorithm"""
+    return Hasher(algorithm, data)
+
+def _read_blocks(f, chunk_size):
+    # One reusable buffer: memory stays at chunk_size however large the file
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        size = f.readinto(buffer)
+        if not size:
+            return
+        yield view[:size]
+
+def hash_file(path, algorithm='sha256', chunk_size=1048576):
+    """Return the hex digest of a file, read in chunk_size blocks"""
+    digest = Hasher(algorithm)
+    with open(path, 'rb', buffering=0) as f:
+        for block in _read_blocks(f, chunk_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+def base64_encode_file(source, destination, chunk_size=786432):
+    """Base64-encode source into destination in constant memory; returns bytes written"""
+    # Whole 3-byte groups per block keep padding to the final block only
+    chunk_size = max(3, chunk_size - chunk_size % 3)
+    written = 0
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        while True:
+            block = src.read(chunk_size)
+            if not block:
+                break
+            written += dst.write(binascii.b2a_base64(block, newline=False))
+    return written
 
-def base64_encode(s): return base64.b64encode(s.encode('utf-8')).decode('utf-8')
-def base64_decode(s): return base64.b64decode(s).decode('utf-8')
-def md5(s): return hashlib.md5(s.encode('utf-8')).hexdigest()
-def sha1(s): return hashlib.sha1(s.encode('utf-8')).hexdigest()
-def sha256(s): return hashlib.sha256(s.encode('utf-8')).hexdigest()
+_BASE64_ALPHABET = string.ascii_letters.encode('ascii') + string.digits.encode('ascii') + b'+/='
+
+def base64_decode_file(source, destination, chunk_size=1048576):
+    """Decode a base64 file (line breaks allowed) into destination; returns bytes written"""
+    written = 0
+    pending = b''
+    padded = False
+    try:
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            while True:
+                block = src.read(chunk_size)
+                if not block:
+                    break
+                data = pending + b''.join(block.split())
+                # a2b_base64 skips stray characters, so check the alphabet and
+                # that '=' only pads the final group
+                if data.translate(None, _BASE64_ALPHABET):
+                    raise binascii.Error("Non-base64 character")
+                equals = data.find(b'=')
+                if padded and data or equals >= 0 and (
+                        equals % 4 < 2 or len(data) - equals > 2 or data.count(b'=', equals) != len(data) - equals):
+                    raise binascii.Error("Data after padding")
+                # Decode whole 4-character groups; carry the rest over
+                cut = len(data) - len(data) % 4
+                written += dst.write(binascii.a2b_base64(data[:cut]))
+                pending = data[cut:]
+                padded = padded or 0 <= equals < cut
+            if pending:
+                written += dst.write(binascii.a2b_base64(pending))
+    except binascii.Error as e:
+        # Leave no partial output behind
+        with contextlib.suppress(OSError):
+            os.remove(destination)
+        raise ValidationError(f"Invalid base64 in {source}: {e}", 'source')
+    return written
 def run_command(cmd):
     result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
     return {'stdout': result.stdout, 'stderr': result.stderr, 'returncode': result.returncode}
@@ -1260,6 +3401,7 @@ operator_pattern = r'>>>=|>>>|<<=|<<|>>=|>>|\+=|-=|\*=|/=|%=|&=|\|=|\^=|\+\+|--|
 TOKENS = [
     ('IMPORT', r'\bimport\b'), ('FROM', r'\bfrom\b'), ('CLASS', r'\bclass\b'), ('INTERFACE', r'\binterface\b'),
     ('IMPLEMENTS', r'\bimplements\b'), ('VAR', r'\bvar\b'), ('FUNC', r'\bfunc\b'), ('IF', r'\bif\b'), ('ELSE', r'\belse\b'),
+    ('ASYNC', r'\basync\b'), ('AWAIT', r'\bawait\b'),
     ('WHILE', r'\bwhile\b'), ('DO', r'\bdo\b'), ('FOR', r'\bfor\b'), ('IN', r'\bin\b'),
     ('BREAK', r'\bbreak\b'), ('CONTINUE', r'\bcontinue\b'), ('PRINT', r'\bprint\b'),
     ('RETURN', r'\breturn\b'), ('TRY', r'\btry\b'), ('CATCH', r'\bcatch\b'),
@@ -1281,6 +3423,11 @@ ClassDef = namedtuple('ClassDef', ['name', 'base', 'interfaces', 'body'])
 InterfaceDef = namedtuple('InterfaceDef', ['name', 'methods'])
 VarDecl = namedtuple('VarDecl', ['name', 'value'])
 FuncDef = namedtuple('FuncDef', ['name', 'params', 'body'])
+
+class AsyncFuncDef(FuncDef):
+    """An `async func`: calling it returns a coroutine instead of running the body"""
+    __slots__ = ()
+
 TryStmt = namedtuple('TryStmt', ['try_block', 'catch_var', 'catch_block'])
 IfStmt = namedtuple('IfStmt', ['condition', 'then_branch', 'else_branch'])
 WhileStmt = namedtuple('WhileStmt', ['condition', 'body'])
@@ -1310,6 +3457,7 @@ Null = namedtuple('Null', [])
 IndexExpr = namedtuple('IndexExpr', ['object', 'index'])
 Slice = namedtuple('Slice', ['start', 'end'])
 AttributeExpr = namedtuple('AttributeExpr', ['object', 'attribute'])
+Await = namedtuple('Await', ['expression'])
 
 # Exceptions
 class ReturnException(Exception):
@@ -1362,6 +3510,8 @@ class Parser:
     def __init__(self, tokens):
         self.tokens = tokens
         self.pos = 0
+        # Source line of each parsed statement, keyed by node id
+        self.line_map = {}
         
     def current_token(self):
         return self.tokens[self.pos] if self.pos < len(self.tokens) else None
@@ -1369,6 +3519,9 @@ class Parser:
     def advance(self):
         self.pos += 1
     
+    def peek_type(self):
+        return self.tokens[self.pos + 1][0] if self.pos + 1 < len(self.tokens) else None
+    
     def expect(self, token_type, value=None, optional=False):
         token = self.current_token()
         if token and token[0] == token_type and (value is None or token[1] == value):
@@ -1398,6 +3551,11 @@ class Parser:
         token = self.current_token()
         if not token:
             return None
+        stmt = self.parse_statement_kind(token)
+        self.line_map[id(stmt)] = token[2]
+        return stmt
+    
+    def parse_statement_kind(self, token):
         if token[0] == 'IMPORT':
             return self.parse_import_stmt()
         elif token[0] == 'FROM':
@@ -1410,6 +3568,9 @@ class Parser:
             return self.parse_var_decl()
         elif token[0] == 'FUNC':
             return self.parse_func_def()
+        elif token[0] == 'ASYNC' and self.peek_type() == 'FUNC':
+            self.advance()
+            return AsyncFuncDef(*self.parse_func_def())
         elif token[0] == 'TRY':
             return self.parse_try_stmt()
         elif token[0] == 'IF':
@@ -1816,13 +3977,17 @@ class Parser:
                 return PrefixOp(op, operand)
             else:
                 return UnaryOp(op, operand)
+        elif self.current_token() and self.current_token()[0] == 'AWAIT':
+            self.advance()
+            return Await(self.parse_unary())
         return self.parse_primary()
     
     def parse_primary(self):
         token = self.current_token()
         if not token:
             raise SyntaxError("Unexpected end of input")
-        if token[0] == 'IDENTIFIER':
+        if token[0] in ('IDENTIFIER', 'ASYNC'):
+            # `async(func)` is still the builtin that wraps a function
             self.advance()
             expr = Identifier(token[1])
         elif token[0] == 'NUMBER':
@@ -1982,30 +4147,43 @@ class Interpreter:
             'split': lambda s, sep=None: s.split(sep),
             'math': {'sqrt': math.sqrt, 'sin': math.sin, 'cos': math.cos, 'pi': math.pi, 'pow': math.pow, 'exp': math.exp},
             'image': {'load': lambda path: Image.open(path), 'show': lambda img: img.show() or None},
-            'file': {'read': lambda path: open(path, 'r').read(), 'write': lambda path, content: open(path, 'w').write(content) or None},
+            'file': {'read': lambda path: open(path, 'r').read(), 'write': lambda path, content: open(path, 'w').write(content) or None,
+                     'read_async': read_file_async, 'write_async': write_file_async},
             'net': {
                 'http_get': http_get, 
                 'http_post': http_post,
                 'http_put': http_put,
                 'http_delete': http_delete,
                 'http_request': http_request,
-                'download_file': download_file,
-                'get_content_type': get_content_type
+                'download_file': InterpreterBuiltin(download_file),
+                'stream': http_stream,
+                'get_content_type': get_content_type,
+                'session': http_session,
+                'fetch_all': InterpreterBuiltin(fetch_all),
+                'http_get_async': http_get_async,
+                'http_post_async': http_post_async,
+                'http_put_async': http_put_async,
+                'http_delete_async': http_delete_async,
+                'http_request_async': http_request_async
             },
-            'crypto': {'md5': md5, 'sha1': sha1, 'sha256': sha256},
+            'crypto': {'md5': md5, 'sha1': sha1, 'sha256': sha256, 'hasher': hasher, 'hash_file': hash_file},
             'os': {'get_env': get_env, 'set_env': set_env, 'get_cwd': get_cwd, 'change_dir': change_dir, 'list_dir': list_dir, 'exists': exists, 'run_command': run_command},
             'random': {'int': random_int, 'string': random_string},
             'url': {'parse': parse_url, 'encode': url_encode, 'decode': url_decode},
-            'base64': {'encode': base64_encode, 'decode': base64_decode},
+            'base64': {'encode': base64_encode, 'decode': base64_decode,
+                       'encode_file': base64_encode_file, 'decode_file': base64_decode_file},
             # Advanced data structures
             'Set': Set,
             'Queue': Queue,
             'Stack': Stack,
             'PriorityQueue': PriorityQueue,
+            'BoundedQueue': BoundedQueue,
+            'BoundedPriorityQueue': BoundedPriorityQueue,
             # Functional programming utilities
             'map': map_func,
             'filter': filter_func,
             'reduce': reduce_func,
+            'parallel_map': InterpreterBuiltin(parallel_map),
             'compose': compose,
             'partial': partial,
             # Advanced algorithms
@@ -2020,13 +4198,16 @@ class Interpreter:
             'unique_list': lambda lst: list(dict.fromkeys(lst)),
             'group_by': lambda lst, key_func: _group_by(lst, key_func),
             'debounce': lambda func, delay: _debounce(func, delay),
-            'memoize': lambda func: _memoize(func),
+            'memoize': InterpreterBuiltin(memoize),
             # Async/Await support
             'async': async_func,
             'await': await_func,
             'create_task': lambda coro: _event_loop.create_task(coro),
-            'run_async': lambda: _event_loop.run_until_complete(),
-            'sleep_async': lambda seconds: _event_loop.run_in_thread(time.sleep, seconds),
+            'run_async': lambda awaitable=None: _event_loop.run_until_complete(awaitable),
+            'sleep_async': sleep_async,
+            'gather': gather,
+            'with_timeout': with_timeout,
+            'as_completed': as_completed,
             # Enhanced error handling
             'ShiboException': ShiboException,
             'ValidationError': ValidationError,
@@ -2045,6 +4226,9 @@ class Interpreter:
             'create_database': create_database,
             'create_model': create_model,
             'query_builder': query_builder,
+            'begin': lambda db: db.begin(),
+            'commit': lambda db: db.commit(),
+            'rollback': lambda db: db.rollback(),
             # Module System
             'Module': Module,
             'ModuleLoader': ModuleLoader,
@@ -2073,6 +4257,9 @@ class Interpreter:
             'run_health_check': run_health_check,
             'run_all_health_checks': run_all_health_checks,
             'get_health_status': get_health_status,
+            # Tiered execution
+            'jit_stats': jit_stats,
+            'set_jit_threshold': set_jit_threshold,
             're': {'search': lambda pattern, string: re.search(pattern, string).groups() if re.search(pattern, string) else None,
                    'match': lambda pattern, string: re.match(pattern, string).groups() if re.match(pattern, string) else None,
                    'findall': lambda pattern, string: re.findall(pattern, string)},
@@ -2103,19 +4290,44 @@ class Interpreter:
                 'html_extract_images': html_extract_images,
                 'css_parse': css_parse,
                 'html_form_data': html_form_data,
+                'html_scanner': html_scanner,
+                'html_select': html_select,
                 'create_web_server': create_web_server,
                 'add_route': add_route,
                 'add_middleware': add_middleware,
                 'serve_static_file': serve_static_file,
-                'render_template': render_template,
+                'serve': InterpreterBuiltin(serve),
+                'render_template': InterpreterBuiltin(render_template),
+                'compile_template': compile_template,
                 'validate_json_schema': validate_json_schema,
                 'create_api_response': create_api_response,
                 'jwt_encode': jwt_encode,
-                'jwt_decode': jwt_decode
+                'jwt_decode': jwt_decode,
+                'jwt_signer': jwt_signer,
             },
         }
         self.loop_depth = 0
         self.modules = {}
+        self.current_function = None
+        # Tiering profiles by FuncDef identity, shared with the frames this
+        # interpreter runs calls in and dropped along with them
+        self.profiles = {}
+    
+    @classmethod
+    def frame(cls, env, function=None, profiles=None):
+        """Return an interpreter for a function call running in ``env``.
+        
+        Unlike ``Interpreter()`` this does not rebuild the builtins; ``env``
+        must already contain them. ``profiles`` is the caller's tiering
+        profile table; without one the frame starts its own.
+        """
+        interpreter = cls.__new__(cls)
+        interpreter.env = env
+        interpreter.loop_depth = 0
+        interpreter.modules = {}
+        interpreter.current_function = function
+        interpreter.profiles = {} if profiles is None else profiles
+        return interpreter
     
     def eval(self, node, env=None):
         env = env if env is not None else self.env
@@ -2189,6 +4401,8 @@ class Interpreter:
             return self.eval_index_expr(node, env)
         elif isinstance(node, AttributeExpr):
             return self.eval_attribute_expr(node, env)
+        elif isinstance(node, Await):
+            return _event_loop.wait(self.eval(node.expression, env))
     
     def get_lvalue(self, node, env):
         if isinstance(node, Identifier):
@@ -2352,6 +4566,8 @@ class Interpreter:
     def eval_while_stmt(self, node, env):
         self.loop_depth += 1
         while self.eval(node.condition, env):
+            if self.current_function is not None:
+                _tiers.record_back_edge(self.current_function, self.profiles)
             try:
                 self.eval_program(Program(node.body), env)
             except ContinueException:
@@ -2364,6 +4580,8 @@ class Interpreter:
     def eval_do_while_stmt(self, node, env):
         self.loop_depth += 1
         while True:
+            if self.current_function is not None:
+                _tiers.record_back_edge(self.current_function, self.profiles)
             try:
                 self.eval_program(Program(node.body), env)
             except ContinueException:
@@ -2380,6 +4598,8 @@ class Interpreter:
         if node.init:
             self.eval(node.init, env)
         while node.condition is None or self.eval(node.condition, env):
+            if self.current_function is not None:
+                _tiers.record_back_edge(self.current_function, self.profiles)
             try:
                 self.eval_program(Program(node.body), env)
             except ContinueException:
@@ -2395,6 +4615,8 @@ class Interpreter:
         self.loop_depth += 1
         iterable = self.eval(node.iterable, env)
         for item in iterable:
+            if self.current_function is not None:
+                _tiers.record_back_edge(self.current_function, self.profiles)
             try:
                 env[node.var] = item
                 self.eval_program(Program(node.body), env)
@@ -2543,15 +4765,26 @@ class Interpreter:
     def eval_func_call(self, node, env, instance_env=None):
         func = self.eval(node.func_expr, env)
         args = [self.eval(arg, env) for arg in node.args]
+        return self.call_function(func, args, instance_env)
+    
+    def call_function(self, func, args, instance_env=None, as_coroutine=True):
+        if as_coroutine and (isinstance(func, AsyncFuncDef) or (
+                isinstance(func, tuple) and len(func) == 2 and isinstance(func[0], AsyncFuncDef))):
+            return ScriptCoroutine(self, func, args, instance_env)
         if isinstance(func, tuple) and len(func) == 2 and isinstance(func[0], FuncDef) and isinstance(func[1], ShiboInstance):
             method, instance = func
             if len(args) != len(method.params) - 1:  # -1 for 'self'
                 raise TypeError(f"Expected {len(method.params) - 1} arguments, got {len(args)}")
             local_env = {'self': instance}
             local_env.update({param: arg for param, arg in zip(method.params[1:], args)})
+            compiled = _tiers.record_call(method, self.profiles)
+            if compiled is not None:
+                return compiled.call(self.env, local_env)
             interpreter = Interpreter()
+            interpreter.profiles = self.profiles
             interpreter.env.update(self.env)
             interpreter.env.update(local_env)
+            interpreter.current_function = method
             try:
                 interpreter.eval(Program(method.body))
             except ReturnException as e:
@@ -2561,11 +4794,16 @@ class Interpreter:
             if len(args) != len(func.params):
                 raise TypeError(f"Expected {len(func.params)} arguments, got {len(args)}")
             local_env = {param: arg for param, arg in zip(func.params, args)}
-            interpreter = Interpreter()
-            interpreter.env.update(self.env)
             if instance_env:
                 local_env.update(instance_env)
+            compiled = _tiers.record_call(func, self.profiles)
+            if compiled is not None:
+                return compiled.call(self.env, local_env)
+            interpreter = Interpreter()
+            interpreter.profiles = self.profiles
+            interpreter.env.update(self.env)
             interpreter.env.update(local_env)
+            interpreter.current_function = func
             try:
                 interpreter.eval(Program(func.body))
             except ReturnException as e:
@@ -2573,6 +4811,8 @@ class Interpreter:
             return None
         elif isinstance(func, ShiboClass):
             return func.instantiate(self, args)
+        elif isinstance(func, InterpreterBuiltin):
+            return func.function(self, *args)
         elif callable(func):
             return func(*args)
         raise TypeError(f"'{type(func).__name__}' is not callable")
@@ -2627,6 +4867,627 @@ class Interpreter:
         except AttributeError:
             raise AttributeError(f"'{type(obj).__name__}' has no attribute '{node.attribute}'")
 
+# Tiered execution
+#
+# Functions start out in the tree-walking interpreter. Every call and every
+# loop back-edge taken while a function runs counts towards its hotness; once
+# that reaches the threshold the function is compiled to a tree of Python
+# closures, which skips the per-node dispatch in Interpreter.eval and the
+# builtins rebuild in Interpreter(). Top-level code is never compiled.
+
+DEFAULT_JIT_THRESHOLD = 1000
+
+# Control-flow signals returned by compiled statements
+_BREAK = object()
+_CONTINUE = object()
+
+
+class _Return:
+    __slots__ = ('value',)
+    
+    def __init__(self, value):
+        self.value = value
+
+
+class CompiledFunction:
+    """A ShiboScript function compiled to closures"""
+    
+    def __init__(self, func, body):
+        self.func = func
+        self.body = body
+        self.calls = 0
+        # The profile table of the interpreter that compiled it
+        self.profiles = {}
+    
+    def call(self, caller_env, local_env):
+        self.calls += 1
+        env = dict(caller_env)
+        env.update(local_env)
+        frame = Interpreter.frame(env, self.func, self.profiles)
+        try:
+            signal = self.body(frame, env)
+        except ReturnException as e:
+            return e.value
+        if signal.__class__ is _Return:
+            return signal.value
+        return None
+
+
+class ClosureCompiler:
+    """Compile function bodies to closures taking (frame, env).
+    
+    Statement closures return None or a control-flow signal; expression
+    closures return their value. Nodes without a compiled form fall back to
+    ``frame.eval``, so compiled functions behave exactly like interpreted ones.
+    """
+    
+    ARITHMETIC = {
+        '-': operator.sub, '*': operator.mul, '/': operator.truediv, '//': operator.floordiv,
+        '%': operator.mod, '==': operator.eq, '!=': operator.ne, '<': operator.lt,
+        '>': operator.gt, '<=': operator.le, '>=': operator.ge,
+    }
+    BITWISE = {
+        '&': operator.and_, '|': operator.or_, '^': operator.xor, '<<': operator.lshift,
+        '>>': operator.rshift, '>>>': lambda left, right: (left & 0xFFFFFFFF) >> right,
+    }
+    
+    def compile(self, func):
+        self.loop_depth = 0
+        return CompiledFunction(func, self.block(func.body))
+    
+    def block(self, statements):
+        closures = tuple(self.statement(stmt) for stmt in statements)
+        if len(closures) == 1:
+            return closures[0]
+        
+        def run(frame, env):
+            for stmt in closures:
+                signal = stmt(frame, env)
+                if signal is not None:
+                    return signal
+            return None
+        return run
+    
+    def loop_body(self, statements):
+        self.loop_depth += 1
+        body = self.block(statements)
+        self.loop_depth -= 1
+        return body
+    
+    def statement(self, node):
+        if isinstance(node, VarDecl):
+            return self.assign_name(node.name, self.expr(node.value))
+        elif isinstance(node, AssignStmt) and isinstance(node.target, Identifier):
+            return self.assign_name(node.target.name, self.expr(node.value))
+        elif isinstance(node, AssignStmt) and isinstance(node.target, IndexExpr):
+            return self.assign_index(node)
+        elif isinstance(node, ExprStmt):
+            return self.expr_stmt(self.expr(node.expression))
+        elif isinstance(node, ReturnStmt):
+            return self.return_stmt(node)
+        elif isinstance(node, PrintStmt):
+            value = self.expr(node.expression)
+            
+            def run(frame, env):
+                print(value(frame, env))
+            return run
+        elif isinstance(node, IfStmt):
+            return self.if_stmt(node)
+        elif isinstance(node, WhileStmt):
+            return self.while_stmt(node)
+        elif isinstance(node, ForStmt):
+            return self.for_stmt(node)
+        elif isinstance(node, ForInStmt):
+            return self.for_in_stmt(node)
+        elif isinstance(node, (BreakStmt, ContinueStmt)) and self.loop_depth:
+            signal = _BREAK if isinstance(node, BreakStmt) else _CONTINUE
+            return lambda frame, env: signal
+        
+        def fallback(frame, env):
+            frame.eval(node, env)
+        return fallback
+    
+    def assign_name(self, name, value):
+        def run(frame, env):
+            env[name] = value(frame, env)
+        return run
+    
+    def assign_index(self, node):
+        value = self.expr(node.value)
+        obj = self.expr(node.target.object)
+        index = self.expr(node.target.index)
+        
+        def run(frame, env):
+            new_value = value(frame, env)
+            target = obj(frame, env)
+            key = index(frame, env)
+            if isinstance(target, list) or isinstance(target, dict):
+                target[key] = new_value
+            else:
+                raise TypeError("Cannot assign to non-list or non-dict")
+        return run
+    
+    def expr_stmt(self, expression):
+        def run(frame, env):
+            expression(frame, env)
+        return run
+    
+    def return_stmt(self, node):
+        if not node.expression:
+            return lambda frame, env: _Return(None)
+        value = self.expr(node.expression)
+        return lambda frame, env: _Return(value(frame, env))
+    
+    def if_stmt(self, node):
+        condition = self.expr(node.condition)
+        then_branch = self.block(node.then_branch)
+        else_branch = self.block(node.else_branch) if node.else_branch else None
+        
+        def run(frame, env):
+            if condition(frame, env):
+                return then_branch(frame, env)
+            elif else_branch is not None:
+                return else_branch(frame, env)
+            return None
+        return run
+    
+    def while_stmt(self, node):
+        condition = self.expr(node.condition)
+        body = self.loop_body(node.body)
+        
+        def run(frame, env):
+            frame.loop_depth += 1
+            while condition(frame, env):
+                try:
+                    signal = body(frame, env)
+                except ContinueException:
+                    continue
+                except BreakException:
+                    break
+                if signal is not None:
+                    if signal is _BREAK:
+                        break
+                    if signal is not _CONTINUE:
+                        frame.loop_depth -= 1
+                        return signal
+            frame.loop_depth -= 1
+            return None
+        return run
+    
+    def for_stmt(self, node):
+        init = self.statement(node.init) if node.init else None
+        condition = self.expr(node.condition) if node.condition is not None else None
+        increment = self.expr(node.increment) if node.increment else None
+        body = self.loop_body(node.body)
+        
+        def run(frame, env):
+            frame.loop_depth += 1
+            if init is not None:
+                init(frame, env)
+            while condition is None or condition(frame, env):
+                try:
+                    signal = body(frame, env)
+                except ContinueException:
+                    signal = None
+                except BreakException:
+                    break
+                if signal is not None:
+                    if signal is _BREAK:
+                        break
+                    if signal is not _CONTINUE:
+                        frame.loop_depth -= 1
+                        return signal
+                if increment is not None:
+                    increment(frame, env)
+            frame.loop_depth -= 1
+            return None
+        return run
+    
+    def for_in_stmt(self, node):
+        iterable = self.expr(node.iterable)
+        var = node.var
+        body = self.loop_body(node.body)
+        
+        def run(frame, env):
+            frame.loop_depth += 1
+            for item in iterable(frame, env):
+                try:
+                    env[var] = item
+                    signal = body(frame, env)
+                except ContinueException:
+                    continue
+                except BreakException:
+                    break
+                if signal is not None:
+                    if signal is _BREAK:
+                        break
+                    if signal is not _CONTINUE:
+                        frame.loop_depth -= 1
+                        return signal
+            frame.loop_depth -= 1
+            return None
+        return run
+    
+    def expr(self, node):
+        if isinstance(node, (Number, String, Boolean)):
+            value = node.value
+            return lambda frame, env: value
+        elif isinstance(node, Null):
+            return lambda frame, env: None
+        elif isinstance(node, Identifier):
+            name = node.name
+            return lambda frame, env: env.get(name)
+        elif isinstance(node, BinaryOp):
+            return self.binary_op(node)
+        elif isinstance(node, UnaryOp) and node.op in ('-', '!'):
+            operand = self.expr(node.operand)
+            if node.op == '-':
+                return lambda frame, env: -operand(frame, env)
+            return lambda frame, env: not operand(frame, env)
+        elif isinstance(node, TernaryOp):
+            condition = self.expr(node.condition)
+            true_expr = self.expr(node.true_expr)
+            false_expr = self.expr(node.false_expr)
+            return lambda frame, env: true_expr(frame, env) if condition(frame, env) else false_expr(frame, env)
+        elif isinstance(node, FuncCall):
+            func = self.expr(node.func_expr)
+            args = tuple(self.expr(arg) for arg in node.args)
+            return lambda frame, env: frame.call_function(func(frame, env), [arg(frame, env) for arg in args])
+        elif isinstance(node, IndexExpr) and not isinstance(node.index, Slice):
+            return self.index_expr(node)
+        elif isinstance(node, (PrefixOp, PostfixOp)) and isinstance(node.operand, Identifier) and node.op in ('++', '--'):
+            return self.step_op(node)
+        elif isinstance(node, ListLiteral):
+            elements = tuple(self.expr(e) for e in node.elements)
+            return lambda frame, env: [e(frame, env) for e in elements]
+        elif isinstance(node, DictLiteral):
+            pairs = tuple((self.expr(k), self.expr(v)) for k, v in node.pairs)
+            return lambda frame, env: {k(frame, env): v(frame, env) for k, v in pairs}
+        return self.fallback(node)
+    
+    def fallback(self, node):
+        return lambda frame, env: frame.eval(node, env)
+    
+    def binary_op(self, node):
+        left = self.expr(node.left)
+        right = self.expr(node.right)
+        op = node.op
+        if op == '&&':
+            return lambda frame, env: left(frame, env) and right(frame, env)
+        elif op == '||':
+            return lambda frame, env: left(frame, env) or right(frame, env)
+        elif op == '+':
+            def add(frame, env):
+                left_value = left(frame, env)
+                right_value = right(frame, env)
+                if isinstance(left_value, str) or isinstance(right_value, str):
+                    return str(left_value) + str(right_value)
+                return left_value + right_value
+            return add
+        elif op in self.ARITHMETIC:
+            function = self.ARITHMETIC[op]
+            return lambda frame, env: function(left(frame, env), right(frame, env))
+        elif op in self.BITWISE:
+            function = self.BITWISE[op]
+            
+            def bitwise(frame, env):
+                left_value = left(frame, env)
+                right_value = right(frame, env)
+                if not isinstance(left_value, int) or not isinstance(right_value, int):
+                    raise TypeError("Bitwise operations require integers")
+                return function(left_value, right_value)
+            return bitwise
+        return lambda frame, env: frame.eval_binary_op(node, env)
+    
+    def index_expr(self, node):
+        obj = self.expr(node.object)
+        index = self.expr(node.index)
+        
+        def run(frame, env):
+            target = obj(frame, env)
+            key = index(frame, env)
+            if isinstance(target, list):
+                return target[key]
+            elif isinstance(target, dict):
+                return target.get(key, None)
+            raise TypeError("Cannot index non-list or non-dict")
+        return run
+    
+    def step_op(self, node):
+        name = node.operand.name
+        delta = 1 if node.op == '++' else -1
+        postfix = isinstance(node, PostfixOp)
+        
+        def run(frame, env):
+            old_value = env[name]
+            if not isinstance(old_value, (int, float)):
+                raise TypeError("Can only increment/decrement numbers")
+            env[name] = old_value + delta
+            return old_value if postfix else old_value + delta
+        return run
+
+
+class FunctionProfile:
+    __slots__ = ('func', 'calls', 'back_edges', 'compiled', 'failed', 'compile_time', '__weakref__')
+    
+    def __init__(self, func):
+        self.func = func
+        self.calls = 0
+        self.back_edges = 0
+        self.compiled = None
+        self.failed = False
+        self.compile_time = 0.0
+
+
+class TierManager:
+    """Profile interpreted functions and swap in compiled versions once hot.
+    
+    Profiles live in the profile table of the interpreter running the
+    function (Interpreter.profiles), so they go away with it; the manager
+    only keeps weak references to them for stats().
+    """
+    
+    def __init__(self, threshold=DEFAULT_JIT_THRESHOLD):
+        self.threshold = threshold
+        self.live = weakref.WeakSet()
+        self.lock = threading.Lock()
+        self.compiler = ClosureCompiler()
+    
+    def profile(self, func, profiles):
+        # FuncDef nodes hold lists and are unhashable, so key by identity;
+        # the profile keeps the node alive so the id cannot be reused.
+        profile = profiles.get(id(func))
+        if profile is None or profile.func is not func:
+            profile = profiles[id(func)] = FunctionProfile(func)
+            with self.lock:
+                self.live.add(profile)
+        return profile
+    
+    def record_call(self, func, profiles):
+        """Count a call to func and return its compiled form once it is hot"""
+        profile = self.profile(func, profiles)
+        if profile.compiled is not None:
+            return profile.compiled
+        profile.calls += 1
+        if self.threshold and not profile.failed and profile.calls + profile.back_edges >= self.threshold:
+            return self.tier_up(profile, profiles)
+        return None
+    
+    def record_back_edge(self, func, profiles):
+        self.profile(func, profiles).back_edges += 1
+    
+    def tier_up(self, profile, profiles):
+        start = time.perf_counter()
+        try:
+            compiled = self.compiler.compile(profile.func)
+        except Exception as e:
+            profile.failed = True
+            _default_logger.debug(f"Could not compile {profile.func.name}: {e}")
+            return None
+        compiled.profiles = profiles
+        profile.compiled = compiled
+        profile.compile_time = time.perf_counter() - start
+        _metrics_collector.increment('jit_functions_compiled')
+        return profile.compiled
+    
+    def stats(self):
+        """Report on the profiles of interpreters that are still alive"""
+        with self.lock:
+            profiles = list(self.live)
+        compiled = [
+            {
+                'name': profile.func.name,
+                'calls': profile.calls + profile.compiled.calls,
+                'compiled_calls': profile.compiled.calls,
+                'back_edges': profile.back_edges,
+                'compile_time': profile.compile_time,
+            }
+            for profile in profiles if profile.compiled is not None
+        ]
+        return {
+            'threshold': self.threshold,
+            'profiled': len(profiles),
+            'compiled': compiled,
+        }
+
+
+_tiers = TierManager()
+
+
+def jit_stats():
+    return _tiers.stats()
+
+
+def set_jit_threshold(threshold):
+    """Set the hotness at which functions are compiled; 0 disables tiering"""
+    _tiers.threshold = threshold
+    return threshold
+
+
+# Template engine. A template is parsed once into literal chunks and
+# ShiboScript expressions compiled to closures, then cached by content;
+# rendering appends to a list that is joined once at the end.
+#
+#   {{ expr }}            escaped output; {{ expr|safe }} skips escaping
+#   {% for x in expr %}   ... {% endfor %}
+#   {% if expr %}         ... {% elif expr %} ... {% else %} ... {% endif %}
+class TemplateCompiler(ClosureCompiler):
+    """Compile template source into a render(frame, env, out) closure"""
+    
+    TAG = re.compile(r'{{(.*?)}}|{%(.*?)%}', re.S)
+    SAFE = re.compile(r'\|\s*safe\s*$')
+    FOR = re.compile(r'for\s+([A-Za-z_]\w*)\s+in\s+(.+)$', re.S)
+    
+    def compile_template(self, source):
+        self.source = source
+        self.loop_depth = 0
+        # Stack of open blocks: (tag, branches, line), each branch a
+        # (condition, body) pair; the outermost block is the template itself.
+        stack = [('template', [(None, [])], 1)]
+        position = 0
+        for match in self.TAG.finditer(source):
+            if match.start() > position:
+                self.literal(stack, source[position:match.start()])
+            position = match.end()
+            line = source.count('\n', 0, match.start()) + 1
+            if match.group(1) is not None:
+                stack[-1][1][-1][1].append(self.output(match.group(1).strip(), line))
+            else:
+                self.tag(stack, match.group(2).strip(), line)
+        if position < len(source):
+            self.literal(stack, source[position:])
+        if len(stack) > 1:
+            raise SyntaxError(f"Template line {stack[-1][2]}: '{stack[-1][0]}' is never closed")
+        return self.sequence(stack[0][1][0][1])
+    
+    def literal(self, stack, text):
+        body = stack[-1][1][-1][1]
+        if body and isinstance(body[-1], str):
+            body[-1] += text
+        else:
+            body.append(text)
+    
+    def tag(self, stack, text, line):
+        keyword = text.split(None, 1)[0] if text else ''
+        if keyword == 'for':
+            match = self.FOR.match(text)
+            if not match:
+                raise SyntaxError(f"Template line {line}: expected 'for name in expr'")
+            stack.append(('for', [((match.group(1), self.expression(match.group(2), line)), [])], line))
+        elif keyword == 'if':
+            stack.append(('if', [(self.expression(text[2:], line), [])], line))
+        elif keyword in ('elif', 'else'):
+            if stack[-1][0] != 'if':
+                raise SyntaxError(f"Template line {line}: '{keyword}' outside of an if block")
+            condition = self.expression(text[4:], line) if keyword == 'elif' else None
+            stack[-1][1].append((condition, []))
+        elif keyword in ('endfor', 'endif'):
+            if stack[-1][0] != keyword[3:]:
+                raise SyntaxError(f"Template line {line}: unexpected '{keyword}'")
+            block, branches, _ = stack.pop()
+            node = self.for_block(*branches[0]) if block == 'for' else self.if_block(branches)
+            stack[-1][1][-1][1].append(node)
+        else:
+            raise SyntaxError(f"Template line {line}: unknown tag '{text}'")
+    
+    def expression(self, text, line):
+        try:
+            parser = Parser(Lexer(text.strip()).tokenize())
+            node = parser.parse_expression()
+            if parser.current_token() is not None:
+                raise SyntaxError(f"unexpected {parser.current_token()[1]!r}")
+        except SyntaxError as e:
+            raise SyntaxError(f"Template line {line}: {e}")
+        return self.expr(node)
+    
+    def expr(self, node):
+        if isinstance(node, Identifier):
+            # Context names shadow the builtins in frame.env
+            name = node.name
+            return lambda frame, env: env[name] if name in env else frame.env.get(name)
+        elif isinstance(node, AttributeExpr):
+            # {{ user.name }} on a dict is the common case; anything else
+            # goes through the interpreter's attribute rules
+            obj = self.expr(node.object)
+            attribute = node.attribute
+            fallback = AttributeExpr(Identifier('object'), attribute)
+            
+            def attribute_expr(frame, env):
+                value = obj(frame, env)
+                if type(value) is dict and attribute in value:
+                    return value[attribute]
+                return frame.eval_attribute_expr(fallback, {'object': value})
+            return attribute_expr
+        elif isinstance(node, (PrefixOp, PostfixOp)):
+            # ++/-- may target a global, which the compiled step only finds
+            # in env
+            return self.fallback(node)
+        return super().expr(node)
+    
+    def fallback(self, node):
+        # The interpreter sees the context layered over the globals, like
+        # compiled expressions do; assignments land in the context
+        return lambda frame, env: frame.eval(node, ChainMap(env, frame.env))
+    
+    def output(self, text, line):
+        safe = self.SAFE.search(text)
+        value = self.expression(text[:safe.start()] if safe else text, line)
+        if safe:
+            def run(frame, env, out):
+                result = value(frame, env)
+                out.append('' if result is None else str(result))
+        else:
+            def run(frame, env, out):
+                result = value(frame, env)
+                if result is not None:
+                    out.append(html.escape(str(result)))
+        return run
+    
+    def sequence(self, body):
+        steps = tuple(self.literal_step(item) if isinstance(item, str) else item for item in body)
+        
+        def run(frame, env, out):
+            for step in steps:
+                step(frame, env, out)
+        return run
+    
+    def literal_step(self, text):
+        return lambda frame, env, out: out.append(text)
+    
+    def for_block(self, header, body):
+        name, iterable = header
+        run_body = self.sequence(body)
+        
+        def run(frame, env, out):
+            for item in iterable(frame, env) or ():
+                env[name] = item
+                run_body(frame, env, out)
+        return run
+    
+    def if_block(self, branches):
+        compiled = tuple((condition, self.sequence(body)) for condition, body in branches)
+        
+        def run(frame, env, out):
+            for condition, run_body in compiled:
+                if condition is None or condition(frame, env):
+                    run_body(frame, env, out)
+                    return
+        return run
+
+class Template:
+    """A compiled template; render(context) returns the output string"""
+    
+    def __init__(self, source):
+        self.source = source
+        self.run = TemplateCompiler().compile_template(source)
+    
+    def render(self, context=None, interpreter=None):
+        if interpreter is not None:
+            frame = Interpreter.frame(interpreter.env, profiles=interpreter.profiles)
+        else:
+            frame = Interpreter.frame(_template_builtins())
+        out = []
+        self.run(frame, dict(context or {}), out)
+        return ''.join(out)
+
+_template_cache = ResultCache(max_size=256, metric_prefix=None)
+_template_env = None
+
+def _template_builtins():
+    global _template_env
+    if _template_env is None:
+        _template_env = Interpreter().env
+    return _template_env
+
+def compile_template(source):
+    """Return the compiled Template for source, compiling it at most once"""
+    template = _template_cache.get(source)
+    if template is None:
+        template = Template(source)
+        _template_cache.put(source, template)
+    return template
+
+
 # Enhanced REPL
 def repl():
     interpreter = Interpreter()
@@ -2684,8 +5545,13 @@ def repl():
             print(f"{Colors.FAIL}Error: {e}{Colors.ENDC}")
 
 # Run Script from File
-def run_file(filename):
+def run_file(filename, engine='interp', jit_threshold=None):
+    if jit_threshold is not None:
+        set_jit_threshold(jit_threshold)
     try:
+        if engine == 'pycode':
+            run_code(compile_file_to_code(filename))
+            return
         with open(filename, 'r') as file:
             code = file.read()
         lexer = Lexer(code)
@@ -2874,8 +5740,13 @@ class ShiboVM:
 class Optimizer:
     """Optimize ShiboScript AST for better performance"""
     
-    def __init__(self):
-        pass
+    TERMINATORS = (ReturnStmt, BreakStmt, ContinueStmt)
+    LITERALS = (Number, String, Boolean, Null)
+    
+    def __init__(self, line_map=None):
+        self._evaluator = None
+        # Parser.line_map to keep up to date as statements are rebuilt
+        self.line_map = line_map
     
     def optimize_ast(self, ast_node):
         """Apply optimizations to the AST"""
@@ -2889,14 +5760,529 @@ class Optimizer:
     
     def constant_folding(self, ast_node):
         """Fold constant expressions"""
-        # This is a simplified implementation
-        # In a real compiler, this would recursively traverse the AST
+        if isinstance(ast_node, list):
+            return [self.constant_folding(item) for item in ast_node]
+        if not isinstance(ast_node, tuple):
+            return ast_node
+        if not hasattr(ast_node, '_fields'):
+            # Plain tuples: dict literal pairs, interface method signatures
+            return tuple(self.constant_folding(item) for item in ast_node)
+        if ast_node._fields:
+            folded = [self.constant_folding(getattr(ast_node, field)) for field in ast_node._fields]
+            if any(new is not getattr(ast_node, field) for field, new in zip(ast_node._fields, folded)):
+                ast_node = self.carry_line(ast_node, ast_node._make(folded))
+        if isinstance(ast_node, BinaryOp):
+            return self.fold_binary_op(ast_node)
+        elif isinstance(ast_node, UnaryOp) and isinstance(ast_node.operand, self.LITERALS):
+            return self.fold_literal(ast_node)
+        elif isinstance(ast_node, TernaryOp) and isinstance(ast_node.condition, self.LITERALS):
+            return ast_node.true_expr if self.literal_value(ast_node.condition) else ast_node.false_expr
         return ast_node
     
+    def fold_binary_op(self, node):
+        if node.op in ('&&', '||') and isinstance(node.left, self.LITERALS):
+            truthy = bool(self.literal_value(node.left))
+            if node.op == '&&':
+                return node.right if truthy else node.left
+            return node.left if truthy else node.right
+        if node.op != 'instanceof' and isinstance(node.left, self.LITERALS) and isinstance(node.right, self.LITERALS):
+            return self.fold_literal(node)
+        return node
+    
+    def fold_literal(self, node):
+        """Evaluate an operator whose operands are all literals"""
+        if self._evaluator is None:
+            self._evaluator = Interpreter()
+        try:
+            value = self._evaluator.eval(node)
+        except Exception:
+            # Leave the error to be raised at run time
+            return node
+        return self.make_literal(value, node)
+    
+    def make_literal(self, value, default):
+        if isinstance(value, bool):
+            return Boolean(value)
+        elif isinstance(value, float) and not math.isfinite(value):
+            return default
+        elif isinstance(value, (int, float)):
+            return Number(value)
+        elif isinstance(value, str):
+            return String(value)
+        elif value is None:
+            return Null()
+        return default
+    
+    def literal_value(self, node):
+        return None if isinstance(node, Null) else node.value
+    
     def dead_code_elimination(self, ast_node):
         """Remove unreachable code"""
-        # This is a simplified implementation
-        return ast_node
+        if isinstance(ast_node, Program):
+            return Program(self.eliminate_block(ast_node.statements))
+        return self.eliminate_statement(ast_node)
+    
+    def eliminate_block(self, statements):
+        result = []
+        for stmt in statements:
+            if isinstance(stmt, IfStmt) and isinstance(stmt.condition, self.LITERALS):
+                # Blocks do not introduce scopes, so the taken branch can be inlined
+                branch = stmt.then_branch if self.literal_value(stmt.condition) else stmt.else_branch
+                result.extend(self.eliminate_block(branch))
+            elif isinstance(stmt, WhileStmt) and isinstance(stmt.condition, self.LITERALS) and not self.literal_value(stmt.condition):
+                continue
+            else:
+                result.append(self.eliminate_statement(stmt))
+            if result and isinstance(result[-1], self.TERMINATORS):
+                break
+        return result
+    
+    def eliminate_statement(self, stmt):
+        if isinstance(stmt, (FuncDef, WhileStmt, DoWhileStmt, ForStmt, ForInStmt, ClassDef)):
+            return self.carry_line(stmt, stmt._replace(body=self.eliminate_block(stmt.body)))
+        elif isinstance(stmt, IfStmt):
+            return self.carry_line(stmt, stmt._replace(then_branch=self.eliminate_block(stmt.then_branch),
+                                                       else_branch=self.eliminate_block(stmt.else_branch)))
+        elif isinstance(stmt, TryStmt):
+            return self.carry_line(stmt, stmt._replace(try_block=self.eliminate_block(stmt.try_block),
+                                                       catch_block=self.eliminate_block(stmt.catch_block)))
+        return stmt
+    
+    def carry_line(self, old, new):
+        if self.line_map is not None and id(old) in self.line_map:
+            self.line_map[id(new)] = self.line_map[id(old)]
+        return new
+
+
+def _assigned_names(statements):
+    """Collect the names a block binds, without descending into nested scopes"""
+    names = []
+    
+    def visit(node):
+        if isinstance(node, list):
+            for item in node:
+                visit(item)
+            return
+        if not isinstance(node, tuple) or not hasattr(node, '_fields'):
+            if isinstance(node, tuple):
+                for item in node:
+                    visit(item)
+            return
+        if isinstance(node, (VarDecl, FuncDef, ClassDef, InterfaceDef)):
+            names.append(node.name)
+            if isinstance(node, VarDecl):
+                visit(node.value)
+            return
+        if isinstance(node, AssignStmt) and isinstance(node.target, Identifier):
+            names.append(node.target.name)
+        elif isinstance(node, (PrefixOp, PostfixOp)) and isinstance(node.operand, Identifier):
+            names.append(node.operand.name)
+        elif isinstance(node, ForInStmt):
+            names.append(node.var)
+        elif isinstance(node, TryStmt):
+            names.append(node.catch_var)
+        for field in node._fields:
+            visit(getattr(node, field))
+    
+    visit(statements)
+    return list(dict.fromkeys(names))
+
+
+class PythonTranspiler:
+    """Translate a ShiboScript AST into a standalone Python module.
+    
+    The module is PyCodeGenerator's tree rendered with ``ast.unparse``
+    (Python 3.9+), so ``shiboc`` output and compiled code objects are the
+    same program. It imports its builtins and helpers from
+    ``shiboscript.runtime`` instead of relying on ``runtime.pycode_globals()``.
+    """
+    
+    def __init__(self, optimize=True):
+        self.optimize = optimize
+    
+    def transpile(self, ast_node):
+        """Return Python source code for a parsed ShiboScript program"""
+        from .runtime import HELPERS
+        module = PyCodeGenerator(optimize=self.optimize, source=True).generate(ast_node)
+        imports = ', '.join(f"{name} as {alias}" for name, alias in HELPERS)
+        lines = [
+            "from shiboscript.runtime import builtins as _sb_builtins",
+            f"from shiboscript.runtime import {imports}",
+            "",
+            "globals().update(_sb_builtins())",
+            "",
+            ast.unparse(module),
+        ]
+        return '\n'.join(lines) + '\n'
+    
+    def module_names(self, program):
+        """Names a program defines at module level (its exports)"""
+        return _assigned_names(program.statements)
+
+
+class PyCodeGenerator:
+    """Build CPython code objects straight from a ShiboScript AST.
+    
+    The ``ast`` nodes go directly to ``compile()``: there is no source text
+    to generate and re-parse, and statements carry their ShiboScript line
+    numbers so tracebacks point into the ``.shibo`` file. Run the result in
+    a namespace from ``runtime.pycode_globals()``. With ``source=True`` the
+    tree is meant for ``ast.unparse`` (see PythonTranspiler), so identifiers
+    that are Python keywords get a trailing underscore like
+    ``runtime.mangle``.
+    
+    Functions run in their caller's environment, as in
+    ``Interpreter.call_function``: a nested function does not close over
+    the enclosing function's variables but looks them up at call time, and
+    names read before they are bound are null rather than NameError.
+    """
+    
+    OPERATORS = {
+        '+': ast.Add, '-': ast.Sub, '*': ast.Mult, '/': ast.Div, '//': ast.FloorDiv,
+        '%': ast.Mod, '&': ast.BitAnd, '|': ast.BitOr, '^': ast.BitXor,
+        '<<': ast.LShift, '>>': ast.RShift,
+    }
+    COMPARISONS = {
+        '==': ast.Eq, '!=': ast.NotEq, '<': ast.Lt, '>': ast.Gt, '<=': ast.LtE, '>=': ast.GtE,
+    }
+    RESERVED = ('None', 'True', 'False')
+    _builtin_names = None
+    
+    def __init__(self, line_map=None, optimize=True, source=False):
+        self.line_map = line_map if line_map is not None else {}
+        self.optimizer = Optimizer(self.line_map) if optimize else None
+        self.source = source
+    
+    @classmethod
+    def builtin_names(cls):
+        """Return the names of the interpreter builtins"""
+        if cls._builtin_names is None:
+            PyCodeGenerator._builtin_names = frozenset(Interpreter().env)
+        return cls._builtin_names
+    
+    def compile(self, ast_node, filename='<shiboscript>'):
+        """Return a code object for a parsed ShiboScript program"""
+        return compile(self.generate(ast_node), filename, 'exec')
+    
+    def generate(self, ast_node):
+        """Return an ``ast.Module`` for a parsed ShiboScript program"""
+        if not isinstance(ast_node, Program):
+            ast_node = Program([ast_node])
+        if self.optimizer:
+            ast_node = self.optimizer.optimize_ast(ast_node)
+        builtin_names = PyCodeGenerator.builtin_names()
+        module_names = _assigned_names(ast_node.statements)
+        self.global_names = builtin_names | set(module_names)
+        self.continue_prologues = []
+        self.scopes = []
+        self.in_method = False
+        # A global read before any assignment ran (say, one made inside a
+        # failed try) is null, not NameError
+        body = [self.located(ast.Assign(targets=[self.store(name)], value=self.const(None)), 1)
+                for name in module_names if name not in builtin_names and not hasattr(python_builtins, name)]
+        body.extend(self.block(ast_node.statements, 1, allow_empty=True))
+        module = ast.Module(body=body, type_ignores=[])
+        return ast.fix_missing_locations(module)
+    
+    def name(self, name):
+        if name in self.RESERVED or (self.source and keyword.iskeyword(name)):
+            return name + '_'
+        return name
+    
+    def load(self, name):
+        return ast.Name(id=name, ctx=ast.Load())
+    
+    def store(self, name):
+        return ast.Name(id=self.name(name), ctx=ast.Store())
+    
+    def call(self, func, *args):
+        if isinstance(func, str):
+            func = self.load(func)
+        return ast.Call(func=func, args=list(args), keywords=[])
+    
+    def const(self, value):
+        return ast.Constant(value=value)
+    
+    def located(self, node, line):
+        node.lineno = node.end_lineno = line
+        node.col_offset = node.end_col_offset = 0
+        return node
+    
+    def block(self, statements, line, allow_empty=False):
+        body = []
+        for stmt in statements:
+            stmt_line = self.line_map.get(id(stmt), line)
+            body.extend(self.located(node, stmt_line) for node in self.statement(stmt, stmt_line))
+        if not body and not allow_empty:
+            body.append(self.located(ast.Pass(), line))
+        return body
+    
+    def loop_body(self, statements, line, continue_prologue):
+        self.continue_prologues.append(continue_prologue)
+        body = self.block(statements, line)
+        self.continue_prologues.pop()
+        return body
+    
+    def statement(self, stmt, line):
+        """Return the list of Python statements for one ShiboScript statement"""
+        if isinstance(stmt, VarDecl):
+            return [ast.Assign(targets=[self.store(stmt.name)], value=self.expr(stmt.value)[0])]
+        elif isinstance(stmt, AssignStmt):
+            return [self.assignment(stmt.target, self.expr(stmt.value)[0])]
+        elif isinstance(stmt, FuncDef):
+            return [self.func_def(stmt, line)]
+        elif isinstance(stmt, ClassDef):
+            return [self.class_def(stmt, line)]
+        elif isinstance(stmt, InterfaceDef):
+            methods = tuple((name, tuple(params)) for name, params in stmt.methods)
+            return [ast.Assign(targets=[self.store(stmt.name)],
+                               value=self.call('_sb_interface', self.const(methods)))]
+        elif isinstance(stmt, (ImportStmt, FromImportStmt)):
+            names = self.const(tuple(stmt.names)) if isinstance(stmt, FromImportStmt) else self.const(None)
+            return [ast.Expr(value=ast.Call(
+                func=self.load('_sb_import_module'),
+                args=[self.const(stmt.module), self.call('globals'), names],
+                keywords=[ast.keyword(arg='pycode', value=self.const(not self.source))]))]
+        elif isinstance(stmt, TryStmt):
+            handler_body = [self.located(ast.Assign(
+                targets=[self.store(stmt.catch_var)],
+                value=self.call('_sb_error_message', self.load('_sb_exc'))), line)]
+            handler_body.extend(self.block(stmt.catch_block, line, allow_empty=True))
+            handler = ast.ExceptHandler(type=self.load('Exception'), name='_sb_exc', body=handler_body)
+            return [ast.Try(body=self.block(stmt.try_block, line), handlers=[self.located(handler, line)],
+                            orelse=[], finalbody=[])]
+        elif isinstance(stmt, IfStmt):
+            return [ast.If(test=self.expr(stmt.condition)[0], body=self.block(stmt.then_branch, line),
+                           orelse=self.block(stmt.else_branch, line, allow_empty=True))]
+        elif isinstance(stmt, WhileStmt):
+            return [ast.While(test=self.expr(stmt.condition)[0], body=self.loop_body(stmt.body, line, None),
+                              orelse=[])]
+        elif isinstance(stmt, DoWhileStmt):
+            body = self.loop_body(stmt.body, line, None)
+            exit_check = ast.If(test=ast.UnaryOp(op=ast.Not(), operand=self.expr(stmt.condition)[0]),
+                                body=[self.located(ast.Break(), line)], orelse=[])
+            body.append(self.located(exit_check, line))
+            return [ast.While(test=self.const(True), body=body, orelse=[])]
+        elif isinstance(stmt, ForStmt):
+            nodes = self.statement(stmt.init, line) if stmt.init is not None else []
+            nodes = [self.located(node, line) for node in nodes]
+            increment = ExprStmt(stmt.increment) if stmt.increment is not None else None
+            body = self.loop_body(stmt.body, line, increment)
+            if increment is not None:
+                body.extend(self.located(node, line) for node in self.statement(increment, line))
+            test = self.expr(stmt.condition)[0] if stmt.condition is not None else self.const(True)
+            nodes.append(ast.While(test=test, body=body, orelse=[]))
+            return nodes
+        elif isinstance(stmt, ForInStmt):
+            return [ast.For(target=self.store(stmt.var), iter=self.expr(stmt.iterable)[0],
+                            body=self.loop_body(stmt.body, line, None), orelse=[])]
+        elif isinstance(stmt, BreakStmt):
+            return [ast.Break()]
+        elif isinstance(stmt, ContinueStmt):
+            nodes = []
+            if self.continue_prologues and self.continue_prologues[-1]:
+                # `continue` in a C-style for loop still runs the increment
+                nodes.extend(self.statement(self.continue_prologues[-1], line))
+            nodes.append(ast.Continue())
+            return [self.located(node, line) for node in nodes]
+        elif isinstance(stmt, PrintStmt):
+            return [ast.Expr(value=self.call('print', self.expr(stmt.expression)[0]))]
+        elif isinstance(stmt, ReturnStmt):
+            value = self.expr(stmt.expression)[0] if stmt.expression is not None else self.const(None)
+            return [ast.Return(value=value)]
+        expr = stmt.expression if isinstance(stmt, ExprStmt) else stmt
+        if isinstance(expr, (PrefixOp, PostfixOp)) and isinstance(expr.operand, Identifier):
+            delta = self.const(1 if expr.op == '++' else -1)
+            value = self.call('_sb_step', self.load(self.name(expr.operand.name)), delta)
+            return [ast.Assign(targets=[self.store(expr.operand.name)], value=value)]
+        return [ast.Expr(value=self.expr(expr)[0])]
+    
+    def func_def(self, stmt, line, method=False):
+        body = []
+        # Writes inside a function are local, but reads fall back to the
+        # enclosing environment, so locals shadowing a global start from it
+        # and the rest start as null.
+        for name in _assigned_names(stmt.body):
+            if name in stmt.params:
+                continue
+            if name in self.global_names:
+                value = self.call('_sb_lookup', self.call('globals'), self.const(self.name(name)))
+            else:
+                value = self.const(None)
+            body.append(self.located(ast.Assign(targets=[self.store(name)], value=value), line))
+        saved = (self.continue_prologues, self.in_method)
+        self.continue_prologues = []
+        self.in_method = method and bool(stmt.params) and stmt.params[0] == 'self'
+        self.scopes.append(set(stmt.params) | set(_assigned_names(stmt.body)))
+        body.extend(self.block(stmt.body, line, allow_empty=bool(body)))
+        self.scopes.pop()
+        self.continue_prologues, self.in_method = saved
+        args = ast.arguments(posonlyargs=[], args=[ast.arg(arg=self.name(param)) for param in stmt.params],
+                             vararg=None, kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[])
+        decorators = [self.load('_sb_async')] if isinstance(stmt, AsyncFuncDef) else []
+        node = ast.FunctionDef(name=self.name(stmt.name), args=args, body=body, decorator_list=decorators, returns=None)
+        if 'type_params' in ast.FunctionDef._fields:
+            node.type_params = []
+        return node
+    
+    def class_def(self, stmt, line):
+        body = []
+        has_init = False
+        for member in stmt.body:
+            member_line = self.line_map.get(id(member), line)
+            if isinstance(member, FuncDef):
+                body.append(self.located(self.func_def(member, member_line, method=True), member_line))
+                if member.name == 'init':
+                    has_init = True
+                    alias = ast.Assign(targets=[self.store('__init__')], value=self.load('init'))
+                    body.append(self.located(alias, member_line))
+            elif isinstance(member, VarDecl):
+                assign = ast.Assign(targets=[self.store(member.name)], value=self.expr(member.value)[0])
+                body.append(self.located(assign, member_line))
+        if not has_init:
+            # ShiboClass.instantiate only runs a class's own init
+            default_init = ast.Attribute(value=self.load('_sb_Object'), attr='__init__', ctx=ast.Load())
+            body.append(self.located(ast.Assign(targets=[self.store('__init__')], value=default_init), line))
+        base = self.load(self.name(stmt.base)) if stmt.base else self.load('_sb_Object')
+        node = ast.ClassDef(name=self.name(stmt.name), bases=[base], keywords=[], body=body, decorator_list=[])
+        if 'type_params' in ast.ClassDef._fields:
+            node.type_params = []
+        return node
+    
+    def assignment(self, target, value):
+        if isinstance(target, Identifier):
+            return ast.Assign(targets=[self.store(target.name)], value=value)
+        elif isinstance(target, IndexExpr):
+            obj = self.expr(target.object)[0]
+            return ast.Expr(value=self.call('_sb_setindex', obj, self.expr(target.index)[0], value))
+        elif isinstance(target, AttributeExpr):
+            if self.is_self(target.object):
+                attr = ast.Attribute(value=self.load('self'), attr=target.attribute, ctx=ast.Store())
+                return ast.Assign(targets=[attr], value=value)
+            obj = self.expr(target.object)[0]
+            return ast.Expr(value=self.call('_sb_setattr', obj, self.const(target.attribute), value))
+        raise TypeError("Invalid lvalue")
+    
+    def is_self(self, node):
+        return self.in_method and isinstance(node, Identifier) and node.name == 'self'
+    
+    def name_ref(self, name):
+        if self.scopes and name in self.scopes[-1]:
+            return self.load(self.name(name))
+        if self.scopes and (name not in self.global_names or any(name in scope for scope in self.scopes)):
+            # Neither local nor a plain global: resolve it in the calling
+            # frames, which is where the interpreter would find it
+            return self.call('_sb_dynamic', self.call('globals'), self.const(self.name(name)))
+        if name in self.global_names:
+            return self.load(self.name(name))
+        # Undefined names evaluate to null instead of raising NameError
+        return self.call('_sb_lookup', self.call('globals'), self.const(self.name(name)))
+    
+    def expr(self, node):
+        """Return (ast_expr, kind) where kind is 'num', 'str' or None"""
+        if isinstance(node, Boolean):
+            return self.const(node.value), 'num'
+        elif isinstance(node, Number):
+            if node.value < 0:
+                return ast.UnaryOp(op=ast.USub(), operand=self.const(-node.value)), 'num'
+            return self.const(node.value), 'num'
+        elif isinstance(node, String):
+            return self.const(node.value), 'str'
+        elif isinstance(node, Null):
+            return self.const(None), None
+        elif isinstance(node, Identifier):
+            return self.name_ref(node.name), None
+        elif isinstance(node, ListLiteral):
+            return ast.List(elts=[self.expr(e)[0] for e in node.elements], ctx=ast.Load()), None
+        elif isinstance(node, DictLiteral):
+            return ast.Dict(keys=[self.expr(k)[0] for k, _ in node.pairs],
+                            values=[self.expr(v)[0] for _, v in node.pairs]), None
+        elif isinstance(node, SetLiteral):
+            if not node.elements:
+                return self.call('set'), None
+            return ast.Set(elts=[self.expr(e)[0] for e in node.elements]), None
+        elif isinstance(node, BinaryOp):
+            return self.binary_op(node)
+        elif isinstance(node, UnaryOp):
+            operand, kind = self.expr(node.operand)
+            if node.op == '!':
+                return ast.UnaryOp(op=ast.Not(), operand=operand), 'num'
+            elif node.op == '+':
+                return operand, kind
+            op = ast.USub() if node.op == '-' else ast.Invert()
+            return ast.UnaryOp(op=op, operand=operand), kind
+        elif isinstance(node, (PrefixOp, PostfixOp)):
+            return self.step_op(node), None
+        elif isinstance(node, TernaryOp):
+            true_expr, true_kind = self.expr(node.true_expr)
+            false_expr, false_kind = self.expr(node.false_expr)
+            kind = true_kind if true_kind == false_kind else None
+            return ast.IfExp(test=self.expr(node.condition)[0], body=true_expr, orelse=false_expr), kind
+        elif isinstance(node, FuncCall):
+            return self.call(self.expr(node.func_expr)[0], *[self.expr(arg)[0] for arg in node.args]), None
+        elif isinstance(node, IndexExpr):
+            obj = self.expr(node.object)[0]
+            if isinstance(node.index, Slice):
+                start = self.expr(node.index.start)[0] if node.index.start is not None else self.const(None)
+                end = self.expr(node.index.end)[0] if node.index.end is not None else self.const(None)
+                return self.call('_sb_slice', obj, start, end), None
+            return self.call('_sb_index', obj, self.expr(node.index)[0]), None
+        elif isinstance(node, AttributeExpr):
+            if self.is_self(node.object):
+                return ast.Attribute(value=self.load('self'), attr=node.attribute, ctx=ast.Load()), None
+            return self.call('_sb_getattr', self.expr(node.object)[0], self.const(node.attribute)), None
+        elif isinstance(node, Await):
+            return self.call('_sb_await', self.expr(node.expression)[0]), None
+        raise TypeError(f"Cannot compile {type(node).__name__} to Python")
+    
+    def binary_op(self, node):
+        left, left_kind = self.expr(node.left)
+        right, right_kind = self.expr(node.right)
+        op = node.op
+        if op == '+':
+            if left_kind == right_kind and left_kind in ('num', 'str'):
+                return ast.BinOp(left=left, op=ast.Add(), right=right), left_kind
+            elif left_kind == 'str':
+                return ast.BinOp(left=left, op=ast.Add(), right=self.call('_sb_str', right)), 'str'
+            elif right_kind == 'str':
+                return ast.BinOp(left=self.call('_sb_str', left), op=ast.Add(), right=right), 'str'
+            return self.call('_sb_add', left, right), None
+        elif op in ('-', '*', '/', '//', '%'):
+            kind = 'num' if left_kind == right_kind == 'num' else None
+            return ast.BinOp(left=left, op=self.OPERATORS[op](), right=right), kind
+        elif op in self.COMPARISONS:
+            return ast.Compare(left=left, ops=[self.COMPARISONS[op]()], comparators=[right]), 'num'
+        elif op in ('&&', '||'):
+            bool_op = ast.And() if op == '&&' else ast.Or()
+            return ast.BoolOp(op=bool_op, values=[left, right]), None
+        elif op in self.OPERATORS:
+            return ast.BinOp(left=left, op=self.OPERATORS[op](), right=right), 'num'
+        elif op == '>>>':
+            return self.call('_sb_ushr', left, right), 'num'
+        elif op == 'instanceof':
+            return self.call('_sb_instanceof', left, right), 'num'
+        raise TypeError(f"Unknown operator '{op}'")
+    
+    def step_op(self, node):
+        delta = self.const(1 if node.op == '++' else -1)
+        postfix = isinstance(node, PostfixOp)
+        operand = node.operand
+        if isinstance(operand, Identifier):
+            name = self.name(operand.name)
+            assign = ast.NamedExpr(target=ast.Name(id=name, ctx=ast.Store()),
+                                   value=self.call('_sb_step', self.load(name), delta))
+            if postfix:
+                pair = ast.Tuple(elts=[self.load(name), assign], ctx=ast.Load())
+                return ast.Subscript(value=pair, slice=self.const(0), ctx=ast.Load())
+            return assign
+        elif isinstance(operand, IndexExpr) and not isinstance(operand.index, Slice):
+            return self.call('_sb_step_index', self.expr(operand.object)[0], self.expr(operand.index)[0],
+                             delta, self.const(postfix))
+        elif isinstance(operand, AttributeExpr):
+            return self.call('_sb_step_attr', self.expr(operand.object)[0], self.const(operand.attribute),
+                             delta, self.const(postfix))
+        kind = 'postfix' if postfix else 'prefix'
+        raise TypeError(f"Invalid operand for {kind} operator")
 
 
 class ShiboModule:
@@ -2986,131 +6372,61 @@ class ShiboCompilerBackend:
     
     def ast_to_python(self, ast_node):
         """Convert AST to Python code"""
-        if hasattr(ast_node, 'statements'):
-            # Program node
-            code_lines = []
-            for stmt in ast_node.statements:
-                code_lines.append(self.convert_statement_to_python(stmt))
-            return '\n'.join(code_lines)
-        else:
-            return self.convert_statement_to_python(ast_node)
-    
-    def convert_statement_to_python(self, stmt):
-        """Convert individual statement to Python code"""
-        from collections import namedtuple
-        
-        # Handle different statement types
-        if hasattr(stmt, '_fields') and 'name' in stmt._fields and 'value' in stmt._fields:
-            # Variable declaration
-            value_code = self.convert_expression_to_python(stmt.value)
-            return f"{stmt.name} = {value_code}"
-        elif hasattr(stmt, 'name') and hasattr(stmt, 'params') and hasattr(stmt, 'body'):
-            # Function definition
-            params = ', '.join(stmt.params) if stmt.params else ''
-            body_lines = []
-            for sub_stmt in stmt.body:
-                body_lines.append('    ' + self.convert_statement_to_python(sub_stmt))
-            
-            return f"def {stmt.name}({params}):\n" + '\n'.join(body_lines)
-        elif type(stmt).__name__ == 'PrintStmt':
-            # Actual PrintStmt from the parser - check this early to avoid matching general expression condition
-            expr_code = self.convert_expression_to_python(stmt.expression)
-            return f"print({expr_code})"
-        elif hasattr(stmt, 'expression'):
-            # Expression statement
-            expr_code = self.convert_expression_to_python(stmt.expression)
-            return f"{expr_code}"
-        elif hasattr(stmt, 'condition'):
-            # If statement
-            condition_code = self.convert_expression_to_python(stmt.condition)
-            then_lines = []
-            for sub_stmt in stmt.then_branch:
-                then_lines.append('    ' + self.convert_statement_to_python(sub_stmt))
-            
-            code = f"if {condition_code}:\n" + '\n'.join(then_lines)
-            
-            if stmt.else_branch:
-                else_lines = []
-                for sub_stmt in stmt.else_branch:
-                    else_lines.append('    ' + self.convert_statement_to_python(sub_stmt))
-                code += f"\nelse:\n" + '\n'.join(else_lines)
-            
-            return code
-        elif hasattr(stmt, 'condition') and hasattr(stmt, 'body'):
-            # While statement
-            condition_code = self.convert_expression_to_python(stmt.condition)
-            body_lines = []
-            for sub_stmt in stmt.body:
-                body_lines.append('    ' + self.convert_statement_to_python(sub_stmt))
-            
-            return f"while {condition_code}:\n" + '\n'.join(body_lines)
-        elif hasattr(stmt, 'expression') and hasattr(stmt, 'func_expr'):
-            # This is not a print statement - it's a general function call
-            func_code = self.convert_expression_to_python(stmt.func_expr)
-            args_code = ', '.join([self.convert_expression_to_python(arg) for arg in stmt.args])
-            return f"{func_code}({args_code})"
-        elif hasattr(stmt, 'expression') and hasattr(stmt, 'name') and stmt.name == 'print':
-            # Print statement - but this doesn't match PrintStmt
-            expr_code = self.convert_expression_to_python(stmt.expression)
-            return f"print({expr_code})"
-        elif type(stmt).__name__ == 'PrintStmt':
-            # Actual PrintStmt from the parser
-            expr_code = self.convert_expression_to_python(stmt.expression)
-            return f"print({expr_code})"
-        else:
-            return f"# Unhandled statement type: {type(stmt).__name__}"
+        return PythonTranspiler().transpile(ast_node)
     
-    def convert_expression_to_python(self, expr):
-        """Convert expression to Python code"""
-        if hasattr(expr, 'value'):
-            if hasattr(expr, '_fields') and 'value' in expr._fields:
-                if isinstance(expr.value, (int, float)):
-                    return str(expr.value)
-                elif isinstance(expr.value, str):
-                    return f'"{expr.value}"'
-                elif isinstance(expr.value, bool):
-                    return str(expr.value)
-                elif expr.value is None:
-                    return 'None'
-            elif hasattr(expr, 'name'):
-                return expr.name
-        elif hasattr(expr, 'left') and hasattr(expr, 'right'):
-            # Binary operation
-            left_code = self.convert_expression_to_python(expr.left)
-            right_code = self.convert_expression_to_python(expr.right)
-            if expr.op == '==':
-                return f"({left_code} == {right_code})"
-            elif expr.op == '!=':
-                return f"({left_code} != {right_code})"
-            elif expr.op == '&&':
-                return f"({left_code} and {right_code})"
-            elif expr.op == '||':
-                return f"({left_code} or {right_code})"
-            else:
-                return f"({left_code} {expr.op} {right_code})"
-        elif hasattr(expr, 'operand'):
-            # Unary operation
-            operand_code = self.convert_expression_to_python(expr.operand)
-            return f"{expr.op}{operand_code}"
-        elif hasattr(expr, 'func_expr') and hasattr(expr, 'args'):
-            # Function call
-            func_code = self.convert_expression_to_python(expr.func_expr)
-            args_code = ', '.join([self.convert_expression_to_python(arg) for arg in expr.args])
-            return f"{func_code}({args_code})"
-        elif hasattr(expr, 'elements'):
-            # List literal
-            elements_code = ', '.join([self.convert_expression_to_python(e) for e in expr.elements])
-            return f"[{elements_code}]"
-        elif hasattr(expr, 'pairs'):
-            # Dictionary literal - this is trickier, need to handle key-value pairs
-            pairs_code = []
-            for key, value in expr.pairs:
-                key_code = self.convert_expression_to_python(key)
-                value_code = self.convert_expression_to_python(value)
-                pairs_code.append(f'{key_code}: {value_code}')
-            return f"{{{', '.join(pairs_code)}}}"
-        
-        return "None"
+    def compile_to_code(self, code, filename='<shiboscript>'):
+        """Compile ShiboScript code straight to a CPython code object"""
+        parser = Parser(Lexer(code).tokenize())
+        ast_tree = parser.parse()
+        return PyCodeGenerator(parser.line_map).compile(ast_tree, filename)
+
+
+# Header of cached code objects: interpreter magic, format tag, then the
+# mtime and size of the source file they were compiled from.
+CODE_CACHE_TAG = b'SHB\x01'
+CODE_CACHE_HEADER = struct.Struct('<qq')
+
+
+def code_cache_path(filename):
+    """Return where the cached code object for a .shibo file lives"""
+    directory, base = os.path.split(os.path.abspath(filename))
+    base = os.path.splitext(base)[0]
+    return os.path.join(directory, '__pycache__', f"{base}.{sys.implementation.cache_tag}.shibo.pyc")
+
+
+def compile_file_to_code(filename, use_cache=True):
+    """Compile a ShiboScript file to a code object, reusing the marshalled cache"""
+    stat = os.stat(filename)
+    header = importlib.util.MAGIC_NUMBER + CODE_CACHE_TAG + CODE_CACHE_HEADER.pack(stat.st_mtime_ns, stat.st_size)
+    cache_path = code_cache_path(filename)
+    if use_cache:
+        try:
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+            if data.startswith(header):
+                return marshal.loads(data[len(header):])
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+    with open(filename, 'r') as f:
+        code = f.read()
+    code_obj = ShiboCompilerBackend().compile_to_code(code, filename)
+    if use_cache:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                f.write(header + marshal.dumps(code_obj))
+        except OSError:
+            # An unwritable cache only costs a recompile next time
+            pass
+    return code_obj
+
+
+def run_code(code_obj, name='__main__'):
+    """Execute a code object from PyCodeGenerator and return its globals"""
+    from .runtime import pycode_globals
+    namespace = pycode_globals(name)
+    exec(code_obj, namespace)
+    return namespace
 
 
 def compile_file(filename):
@@ -3151,6 +6467,9 @@ def get_ast(code):
 
 def disassemble_bytecode(bytecode):
     """Disassemble bytecode for inspection"""
+    if isinstance(bytecode, types.CodeType):
+        dis.dis(bytecode)
+        return
     print("Disassembled bytecode:")
     for i, (op, arg) in enumerate(bytecode['instructions']):
         print(f"  {i}: {op} {arg}")
@@ -3158,8 +6477,63 @@ def disassemble_bytecode(bytecode):
     print(f"Names: {bytecode['names']}" )
     print(f"Variables: {bytecode['varnames']}" )
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        run_file(sys.argv[1])
+RUN_ENGINES = ('interp', 'pycode')
+
+def parse_run_options(args):
+    """Take --engine and --jit-threshold out of a command line.
+    
+    Either option may appear anywhere, as ``--engine=pycode`` or
+    ``--engine pycode``. Returns the run_file keyword arguments and the
+    remaining arguments in order; exits with a message on a bad value.
+    """
+    options = {'engine': 'interp', 'jit_threshold': None}
+    rest = []
+    args = iter(args)
+    for arg in args:
+        name, equals, value = arg.partition('=')
+        if name not in ('--engine', '--jit-threshold'):
+            rest.append(arg)
+            continue
+        if not equals:
+            value = next(args, '')
+        if name == '--engine':
+            if value not in RUN_ENGINES:
+                sys.exit(f"Unknown engine '{value}' (choose from {', '.join(RUN_ENGINES)})")
+            options['engine'] = value
+        else:
+            try:
+                options['jit_threshold'] = int(value)
+            except ValueError:
+                sys.exit(f"--jit-threshold needs a whole number, got '{value}'")
+    return options, rest
+
+def serve_workers_main(args):
+    """Handle `shiboscript serve-workers [--workers=N] [--socket=PATH] [--preload=a,b] [--timeout=S]`"""
+    from .workers import serve_workers, DEFAULT_SOCKET
+    options = {'socket': DEFAULT_SOCKET, 'workers': None, 'preload': '', 'timeout': None}
+    for arg in args:
+        name, _, value = arg.lstrip('-').partition('=')
+        if name not in options:
+            print(f"{Colors.FAIL}Unknown option: {arg}{Colors.ENDC}")
+            return
+        options[name] = value
+    serve_workers(
+        socket_path=options['socket'],
+        workers=int(options['workers']) if options['workers'] else None,
+        preload=[name for name in options['preload'].split(',') if name],
+        timeout=float(options['timeout']) if options['timeout'] else None,
+    )
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == 'serve-workers':
+        serve_workers_main(args[1:])
+        return
+    options, args = parse_run_options(args)
+    if args:
+        run_file(args[0], **options)
     else:
-        repl()
\ No newline at end of file
+        repl()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Runtime support for ShiboScript code compiled to Python"""
+
+import builtins as python_builtins
+import functools
+import keyword
+import sys
+
+from .core import Interpreter, ScriptCoroutine, ShiboInstance, await_func
+
+
+# Helper functions referenced by generated code, with the names they are
+# bound to in the generated module.
+HELPERS = [
+    ('ShiboObject', '_sb_Object'), ('add', '_sb_add'), ('to_str', '_sb_str'),
+    ('ushr', '_sb_ushr'), ('instanceof', '_sb_instanceof'), ('index', '_sb_index'),
+    ('slice_', '_sb_slice'), ('setindex', '_sb_setindex'), ('getattr_', '_sb_getattr'),
+    ('setattr_', '_sb_setattr'), ('step', '_sb_step'), ('step_index', '_sb_step_index'),
+    ('step_attr', '_sb_step_attr'), ('interface', '_sb_interface'), ('lookup', '_sb_lookup'),
+    ('dynamic', '_sb_dynamic'),
+    ('error_message', '_sb_error_message'), ('import_module', '_sb_import_module'),
+    ('async_', '_sb_async'), ('await_', '_sb_await'),
+]
+
+
+# Python keywords that are ordinary identifiers in ShiboScript (e.g. the
+# `assert` builtin) get a trailing underscore in generated source code.
+def mangle(name):
+    if keyword.iskeyword(name) or name in ('None', 'True', 'False'):
+        return name + '_'
+    return name
+
+
+def builtins(mangled=True):
+    """Return the ShiboScript builtins as a globals dict for compiled code"""
+    env = Interpreter().env
+    if not mangled:
+        return dict(env)
+    return {mangle(name): value for name, value in env.items()}
+
+
+def pycode_globals(name='__main__'):
+    """Return a globals dict for code objects built by PyCodeGenerator.
+
+    ShiboScript builtins and the runtime helpers live in the ``__builtins__``
+    mapping, so user globals stay separate and name lookups fall through to
+    them exactly like CPython builtins.
+    """
+    scope = dict(vars(python_builtins))
+    scope.update(builtins(mangled=False))
+    helpers = globals()
+    scope.update({alias: helpers[helper] for helper, alias in HELPERS})
+    return {'__name__': name, '__builtins__': scope}
+
+
+class ShiboObject:
+    """Base class for compiled ShiboScript classes"""
+
+    def __init__(self, *args):
+        # Classes without an init method ignore constructor arguments,
+        # exactly like ShiboClass.instantiate does.
+        pass
+
+    def __repr__(self):
+        # Print instances the way the interpreter's ShiboInstance prints
+        return f"<{ShiboInstance.__module__}.{ShiboInstance.__qualname__} object at {id(self):#x}>"
+
+
+def add(left, right):
+    if isinstance(left, str) or isinstance(right, str):
+        return str(left) + str(right)
+    return left + right
+
+
+def ushr(left, right):
+    if not isinstance(left, int) or not isinstance(right, int):
+        raise TypeError("Bitwise operations require integers")
+    return (left & 0xFFFFFFFF) >> right
+
+
+def instanceof(obj, cls):
+    return isinstance(cls, type) and issubclass(cls, ShiboObject) and isinstance(obj, cls)
+
+
+def index(obj, key):
+    if isinstance(obj, list):
+        return obj[key]
+    elif isinstance(obj, dict):
+        return obj.get(key, None)
+    raise TypeError("Cannot index non-list or non-dict")
+
+
+def slice_(obj, start, end):
+    if not isinstance(obj, list):
+        raise TypeError("Slicing only supported on lists")
+    return obj[start if start is not None else 0:end if end is not None else len(obj)]
+
+
+def setindex(obj, key, value):
+    if isinstance(obj, list) or isinstance(obj, dict):
+        obj[key] = value
+    else:
+        raise TypeError("Cannot assign to non-list or non-dict")
+
+
+def getattr_(obj, name):
+    if isinstance(obj, dict):
+        if name in obj:
+            return obj[name]
+        try:
+            return getattr(obj, name)
+        except AttributeError:
+            raise AttributeError(f"Dictionary has no key or attribute '{name}'")
+    try:
+        return getattr(obj, name)
+    except AttributeError:
+        raise AttributeError(f"'{type(obj).__name__}' has no attribute '{name}'")
+
+
+def setattr_(obj, name, value):
+    if isinstance(obj, dict):
+        obj[name] = value
+    else:
+        try:
+            setattr(obj, name, value)
+        except AttributeError:
+            raise TypeError(f"Cannot set attribute '{name}' on {type(obj).__name__}")
+
+
+def step(value, delta):
+    if not isinstance(value, (int, float)):
+        raise TypeError("Can only increment/decrement numbers")
+    return value + delta
+
+
+def step_index(obj, key, delta, postfix):
+    old_value = index(obj, key)
+    new_value = step(old_value, delta)
+    setindex(obj, key, new_value)
+    return old_value if postfix else new_value
+
+
+def step_attr(obj, name, delta, postfix):
+    old_value = getattr_(obj, name)
+    new_value = step(old_value, delta)
+    setattr_(obj, name, new_value)
+    return old_value if postfix else new_value
+
+
+def interface(methods):
+    return {'type': 'interface', 'methods': {name: list(params) for name, params in methods}}
+
+
+def lookup(namespace, name):
+    """Resolve a global the way Interpreter.eval does, with null for unknown names"""
+    if name in namespace:
+        return namespace[name]
+    scope = namespace.get('__builtins__')
+    if isinstance(scope, dict):
+        return scope.get(name)
+    return getattr(scope, name, None)
+
+
+def dynamic(namespace, name):
+    """Resolve a function's free name in its callers' variables.
+
+    Interpreter.call_function runs a function body in a copy of the
+    caller's environment, so a name that is not the function's own is
+    found in the nearest calling frame of the same module that binds it,
+    then in the globals, and is null otherwise.
+    """
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals is namespace:
+        variables = frame.f_locals
+        if variables is namespace:
+            break
+        if name in variables:
+            return variables[name]
+        frame = frame.f_back
+    return lookup(namespace, name)
+
+
+def to_str(value):
+    return str(value)
+
+
+def error_message(exc):
+    return str(exc)
+
+
+def async_(func):
+    """Decorator for compiled `async func`: calls return coroutines"""
+    @functools.wraps(func)
+    def start(*args):
+        return ScriptCoroutine(None, func, args)
+    return start
+
+
+def await_(value):
+    return await_func(value)
+
+
+_compiled_modules = {}
+
+
+def import_module(module_name, namespace, names=None, pycode=False):
+    """Compile `<module_name>.shibo` to Python and merge its globals"""
+    from .core import Lexer, Parser, PythonTranspiler, PyCodeGenerator
+
+    key = (module_name, pycode)
+    if key not in _compiled_modules:
+        try:
+            with open(f"{module_name}.shibo", 'r') as f:
+                code = f.read()
+        except OSError:
+            raise ImportError(f"Module '{module_name}' not found")
+        filename = f"{module_name}.shibo"
+        parser = Parser(Lexer(code).tokenize())
+        program = parser.parse()
+        transpiler = PythonTranspiler()
+        if pycode:
+            code_obj = PyCodeGenerator(parser.line_map).compile(program, filename)
+            module_globals = pycode_globals(module_name)
+            rename = str
+        else:
+            code_obj = compile(transpiler.transpile(program), filename, 'exec')
+            module_globals = {'__name__': module_name}
+            rename = mangle
+        exec(code_obj, module_globals)
+        _compiled_modules[key] = {
+            rename(name): module_globals[rename(name)]
+            for name in transpiler.module_names(program) if rename(name) in module_globals
+        }
+    exports = _compiled_modules[key]
+    rename = str if pycode else mangle
+    if names is None or list(names) == ['*']:
+        namespace.update(exports)
+    else:
+        for name in names:
+            if rename(name) not in exports:
+                raise ImportError(f"'{name}' not found in module '{module_name}'")
+            namespace[rename(name)] = exports[rename(name)]
@@ -0,0 +1,531 @@
+"""HTTP/1.1 server runtime for the configs built by ``web.create_web_server``.
+
+Routes are compiled into a trie keyed by path segment, so dispatch costs one
+dictionary lookup per segment however many routes there are. ``:name``
+captures a segment and ``*name`` captures the rest of the path::
+
+    web.add_route(server, "/users/:id", "GET", show_user)
+    web.add_route(server, "/files/*path", "GET", show_file)
+
+Handlers receive a request dict (method, path, query, params, headers, body,
+json; header names match in any case) and return a string, a JSON-able value, or a response dict with
+``status``, ``headers`` and ``body``. Middleware is called as
+``middleware(request, next)`` and must return ``next(request)`` or a
+response of its own. Static files go out with ``sendfile`` and carry ETags,
+so revalidations get a 304 without touching the file.
+
+Two worker models share that logic: ``threaded`` gives each connection a
+thread, ``asyncio`` multiplexes connections on one event loop and runs
+handlers on a bounded thread pool. Either way handlers run concurrently, so
+one blocked in a slow call does not hold up the others; async handlers take
+turns with other script coroutines at each await.
+"""
+
+import asyncio
+import email.utils
+import http.server
+import inspect
+import json
+import mimetypes
+import os
+import sys
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .core import Colors, _event_loop, _invoke
+
+KEEP_ALIVE_TIMEOUT = 15
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+
+class _RouteNode:
+    __slots__ = ('children', 'param', 'param_node', 'wildcard', 'wildcard_handlers', 'handlers')
+
+    def __init__(self):
+        self.children = {}
+        self.param = None
+        self.param_node = None
+        self.wildcard = None
+        self.wildcard_handlers = {}
+        self.handlers = {}
+
+
+class RouteTrie:
+    """Route table keyed by path segment"""
+
+    def __init__(self):
+        self.root = _RouteNode()
+
+    def add(self, method, path, handler):
+        node = self.root
+        for segment in _segments(path):
+            if segment.startswith('*'):
+                node.wildcard = segment[1:] or 'path'
+                node.wildcard_handlers[method] = handler
+                return self
+            if segment.startswith(':'):
+                if node.param_node is None:
+                    node.param, node.param_node = segment[1:], _RouteNode()
+                elif node.param != segment[1:]:
+                    raise ValueError(f"Conflicting parameter names ':{node.param}' and '{segment}' in {path}")
+                node = node.param_node
+            else:
+                node = node.children.setdefault(segment, _RouteNode())
+        node.handlers[method] = handler
+        return self
+
+    def match(self, method, path):
+        """Return (handler, params, allowed_methods); handler is None if unmatched"""
+        found = self._match(self.root, _segments(path), 0, {})
+        if found is None:
+            return None, {}, ()
+        handlers, params = found
+        handler = handlers.get(method)
+        if handler is None and method == 'HEAD':
+            handler = handlers.get('GET')
+        return handler, params, tuple(handlers)
+
+    def _match(self, node, segments, index, params):
+        if index == len(segments):
+            if node.handlers:
+                return node.handlers, params
+        else:
+            segment = segments[index]
+            child = node.children.get(segment)
+            if child is not None:
+                found = self._match(child, segments, index + 1, params)
+                if found is not None:
+                    return found
+            if node.param_node is not None:
+                found = self._match(node.param_node, segments, index + 1, dict(params, **{node.param: segment}))
+                if found is not None:
+                    return found
+        if node.wildcard_handlers:
+            return node.wildcard_handlers, dict(params, **{node.wildcard: '/'.join(segments[index:])})
+        return None
+
+
+def _segments(path):
+    return [urllib.parse.unquote(segment) for segment in path.split('/') if segment]
+
+
+class StaticFile:
+    """A file response body, written with sendfile by the connection layer"""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+
+class Application:
+    """Routes, middleware and static files compiled from a server config"""
+
+    def __init__(self, config, interpreter=None):
+        self.interpreter = interpreter
+        self.routes = RouteTrie()
+        for key, handler in config.get('routes', {}).items():
+            method, _, path = key.partition(' ')
+            self.routes.add(method.upper(), path, handler)
+        # Longest prefix first, so /static/img wins over /static
+        self.static = sorted(
+            ((prefix.rstrip('/') or '/', os.path.realpath(path)) for prefix, path in config.get('static_files', {}).items()),
+            key=lambda item: len(item[0]), reverse=True)
+        chain = self.dispatch
+        for middleware in reversed(config.get('middleware', [])):
+            chain = self.wrap(middleware, chain)
+        self.chain = chain
+
+    def wrap(self, middleware, next_handler):
+        def run(request):
+            return to_response(self.call(middleware, request, next_handler))
+        return run
+
+    def call(self, func, *args):
+        result = _invoke(self.interpreter, func, args)
+        if inspect.isawaitable(result):
+            result = _event_loop.wait(result)
+        return result
+
+    def handle(self, request):
+        try:
+            return self.chain(request)
+        except Exception as e:
+            print(f"{Colors.FAIL}Error handling {request['method']} {request['path']}: {e}{Colors.ENDC}", file=sys.stderr)
+            return to_response({'status': 500, 'body': 'Internal Server Error'})
+
+    def dispatch(self, request):
+        handler, params, allowed = self.routes.match(request['method'], request['path'])
+        if handler is not None:
+            request['params'] = params
+            return to_response(self.call(handler, request))
+        if request['method'] in ('GET', 'HEAD'):
+            static = self.static_file(request)
+            if static is not None:
+                return static
+        if allowed:
+            return to_response({'status': 405, 'headers': {'Allow': ', '.join(allowed)}, 'body': 'Method Not Allowed'})
+        return to_response({'status': 404, 'body': 'Not Found'})
+
+    def static_file(self, request):
+        path = request['path']
+        for prefix, root in self.static:
+            if prefix != '/' and path != prefix and not path.startswith(prefix + '/'):
+                continue
+            target = root
+            rest = path[len(prefix):].lstrip('/') if prefix != '/' else path.lstrip('/')
+            if os.path.isdir(root):
+                target = os.path.realpath(os.path.join(root, urllib.parse.unquote(rest)))
+                # Refuse ../ escapes out of the static directory
+                if target != root and not target.startswith(root + os.sep):
+                    return to_response({'status': 403, 'body': 'Forbidden'})
+                if os.path.isdir(target):
+                    target = os.path.join(target, 'index.html')
+            elif rest:
+                continue
+            try:
+                stat = os.stat(target)
+            except OSError:
+                return None
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            headers = {
+                'ETag': etag,
+                'Last-Modified': email.utils.formatdate(stat.st_mtime, usegmt=True),
+                'Content-Type': mimetypes.guess_type(target)[0] or 'application/octet-stream',
+            }
+            if etag in [tag.strip() for tag in request['headers'].get('If-None-Match', '').split(',')]:
+                return {'status': 304, 'headers': headers, 'body': b''}
+            return {'status': 200, 'headers': headers, 'body': StaticFile(target, stat.st_size)}
+        return None
+
+
+class Headers(dict):
+    """Request headers keyed by the names as sent, looked up case-insensitively"""
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        self.names = {name.lower(): name for name in self}
+
+    def _name(self, name):
+        return self.names.get(name.lower(), name) if isinstance(name, str) else name
+
+    def __getitem__(self, name):
+        return super().__getitem__(self._name(name))
+
+    def __contains__(self, name):
+        return super().__contains__(self._name(name))
+
+    def get(self, name, default=None):
+        return super().get(self._name(name), default)
+
+
+def make_request(method, target, headers, body):
+    path, _, query = target.partition('?')
+    headers = Headers(headers)
+    content_type = headers.get('Content-Type', '')
+    text = body.decode('utf-8', errors='replace')
+    payload = None
+    if content_type.lower().startswith('application/json') and text:
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            payload = None
+    return {
+        'method': method,
+        'path': path,
+        'query': {key: values[-1] for key, values in urllib.parse.parse_qs(query).items()},
+        'params': {},
+        'headers': headers,
+        'body': text,
+        'json': payload,
+    }
+
+
+def to_response(result):
+    """Normalize a handler's return value to {'status', 'headers', 'body'}"""
+    if isinstance(result, dict) and 'body' in result:
+        status = result.get('status', 200)
+        headers = dict(result.get('headers') or {})
+        body = result['body']
+        if not isinstance(status, int):
+            status = 200
+    else:
+        status, headers, body = (204 if result is None else 200), {}, result
+    if body is None:
+        body = b''
+    elif isinstance(body, StaticFile):
+        return {'status': status, 'headers': headers, 'body': body}
+    elif isinstance(body, str):
+        headers.setdefault('Content-Type', 'text/html; charset=utf-8')
+        body = body.encode('utf-8')
+    elif not isinstance(body, (bytes, bytearray)):
+        headers.setdefault('Content-Type', 'application/json')
+        body = json.dumps(body, default=str).encode('utf-8')
+    return {'status': status, 'headers': headers, 'body': bytes(body)}
+
+
+def _request_length(value):
+    """Parse a request's Content-Length; ValueError unless a non-negative integer"""
+    value = (value or '0').strip()
+    if not value.isdigit():
+        raise ValueError(f"Invalid Content-Length: {value!r}")
+    return int(value)
+
+
+def _content_length(response):
+    body = response['body']
+    return body.size if isinstance(body, StaticFile) else len(body)
+
+
+class _ThreadedHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'ShiboScript'
+    disable_nagle_algorithm = True
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        except ConnectionError:
+            self.close_connection = True
+
+    def respond(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            try:
+                body = _read_chunked_file(self.rfile)
+            except ValueError:
+                self.send_error(400)
+                return
+            except OverflowError:
+                self.send_error(413)
+                return
+        else:
+            try:
+                length = _request_length(self.headers.get('Content-Length'))
+            except ValueError:
+                self.send_error(400)
+                return
+            if length > MAX_BODY_SIZE:
+                self.send_error(413)
+                return
+            body = self.rfile.read(length) if length else b''
+        request = make_request(self.command, self.path, dict(self.headers), body)
+        response = self.server.app.handle(request)
+        self.send_response(response['status'])
+        for name, value in response['headers'].items():
+            self.send_header(name, str(value))
+        self.send_header('Content-Length', str(_content_length(response)))
+        self.end_headers()
+        if self.command == 'HEAD' or response['status'] in (204, 304):
+            return
+        if isinstance(response['body'], StaticFile):
+            with open(response['body'].path, 'rb') as f:
+                self.connection.sendfile(f)
+        else:
+            self.wfile.write(response['body'])
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadedServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class WebServer:
+    """Serve a web.create_web_server config with the chosen worker model"""
+
+    MODELS = ('threaded', 'asyncio')
+
+    def __init__(self, config, interpreter=None, host='127.0.0.1', port=None, model='threaded', workers=None):
+        if model not in self.MODELS:
+            raise ValueError(f"Unknown worker model '{model}', expected one of {', '.join(self.MODELS)}")
+        self.app = Application(config, interpreter)
+        self.host = host
+        self.port = config.get('port', 8000) if port is None else port
+        self.model = model
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.httpd = None
+        self.loop = None
+        self.aio_server = None
+        self.connections = set()
+        self.executor = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    def serve_forever(self):
+        """Serve on the calling thread until stop() or KeyboardInterrupt"""
+        # A script coroutine calling web.serve gives up the baton while
+        # serving, so async handlers can take it
+        with _event_loop.released():
+            self.run()
+
+    def run(self):
+        if self.model == 'threaded':
+            self.httpd = _ThreadedServer((self.host, self.port), _ThreadedHandler)
+            self.httpd.app = self.app
+            self.port = self.httpd.server_address[1]
+            self.ready.set()
+            try:
+                self.httpd.serve_forever()
+            finally:
+                self.httpd.server_close()
+        else:
+            self.loop = asyncio.new_event_loop()
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            try:
+                self.loop.run_until_complete(self._serve_async())
+            finally:
+                self.executor.shutdown(wait=False)
+                self.loop.close()
+
+    def start(self):
+        """Serve on a background thread; returns once the port is bound"""
+        self.thread = threading.Thread(target=self.serve_forever, name='shiboscript-web', daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self.port
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+        elif self.loop is not None and self.aio_server is not None:
+            self.loop.call_soon_threadsafe(self.aio_server.close)
+        if self.thread is not None:
+            self.thread.join()
+
+    async def _serve_async(self):
+        self.aio_server = await asyncio.start_server(self._connection, self.host, self.port, backlog=128)
+        self.port = self.aio_server.sockets[0].getsockname()[1]
+        self.ready.set()
+        try:
+            await self.aio_server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        # Keep-alive connections outlive the listening socket; close them
+        # while the loop can still run their transports' shutdown
+        for task in list(self.connections):
+            task.cancel()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+
+    async def _connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                parts = lines[0].split()
+                if len(parts) != 3:
+                    await self._write_simple(writer, 400, 'Bad Request')
+                    break
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    if line:
+                        name, _, value = line.partition(':')
+                        headers[name.strip()] = value.strip()
+                lowered = {name.lower(): value.lower() for name, value in headers.items()}
+                if lowered.get('transfer-encoding', '') == 'chunked':
+                    try:
+                        body = await _read_chunked(reader)
+                    except ValueError:
+                        await self._write_simple(writer, 400, 'Bad Request')
+                        break
+                    except OverflowError:
+                        await self._write_simple(writer, 413, 'Payload Too Large')
+                        break
+                else:
+                    try:
+                        length = _request_length(lowered.get('content-length'))
+                    except ValueError:
+                        await self._write_simple(writer, 400, 'Bad Request')
+                        break
+                    if length > MAX_BODY_SIZE:
+                        await self._write_simple(writer, 413, 'Payload Too Large')
+                        break
+                    body = await reader.readexactly(length) if length else b''
+                connection = lowered.get('connection', '')
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                request = make_request(method.upper(), target, headers, body)
+                response = await loop.run_in_executor(self.executor, self.app.handle, request)
+                await self._write(writer, response, method.upper() == 'HEAD', keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # stop() cancels idle keep-alive connections. Ending normally
+            # keeps StreamReaderProtocol from logging the cancellation.
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+    async def _write(self, writer, response, head_only, keep_alive):
+        status = response['status']
+        reason = http.server.BaseHTTPRequestHandler.responses.get(status, ('',))[0]
+        lines = [f'HTTP/1.1 {status} {reason}', 'Server: ShiboScript',
+                 f'Date: {email.utils.formatdate(usegmt=True)}',
+                 f'Content-Length: {_content_length(response)}',
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f'{name}: {value}' for name, value in response['headers'].items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        body = response['body']
+        if not head_only and status not in (204, 304):
+            if isinstance(body, StaticFile):
+                await writer.drain()
+                with open(body.path, 'rb') as f:
+                    await asyncio.get_running_loop().sendfile(writer.transport, f)
+            else:
+                writer.write(body)
+        await writer.drain()
+
+    async def _write_simple(self, writer, status, text):
+        await self._write(writer, to_response({'status': status, 'body': text}), False, False)
+
+
+async def _read_chunked(reader):
+    chunks = []
+    size_total = 0
+    while True:
+        size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+        if size == 0:
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            return b''.join(chunks)
+        size_total += size
+        if size_total > MAX_BODY_SIZE:
+            raise OverflowError("Request body too large")
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+def _read_chunked_file(rfile):
+    chunks = []
+    size_total = 0
+    while True:
+        size = int(rfile.readline(1024).split(b';')[0].strip() or b'0', 16)
+        if size == 0:
+            while rfile.readline(1024) not in (b'\r\n', b'\n', b''):
+                pass
+            return b''.join(chunks)
+        size_total += size
+        if size_total > MAX_BODY_SIZE:
+            raise OverflowError("Request body too large")
+        chunk = rfile.read(size)
+        if len(chunk) < size:
+            raise ConnectionError("Connection closed inside a chunk")
+        chunks.append(chunk)
+        rfile.read(2)
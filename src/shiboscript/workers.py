@@ -0,0 +1,266 @@
+"""Pre-forked pool of warm ShiboScript interpreters serving jobs.
+
+The supervisor builds one Interpreter, preloads the requested ``.shibo``
+modules and then forks the workers, so every job starts from ready-made
+builtins instead of paying interpreter startup. Jobs arrive over a Unix
+socket as one JSON object per line::
+
+    {"id": 1, "code": "print(1 + 2)"}
+    {"id": 2, "file": "job.shibo", "timeout": 5}
+
+and each gets one JSON line back with the captured output, the value of the
+last statement, any error, and timings in milliseconds.
+
+Each job runs in a process forked from its worker, which itself never runs
+script code. Forking copies the warm state in about a millisecond, and
+nothing a job changes (globals, module caches, metrics, open connections,
+the working directory or environment variables) survives into the next one.
+"""
+
+import contextlib
+import io
+import json
+import os
+import select
+import signal
+import socket
+import time
+
+from .core import Interpreter, ImportStmt, Lexer, Parser, Colors
+
+DEFAULT_SOCKET = '/tmp/shiboscript-workers.sock'
+
+
+# Jobs get this long past their timeout to report it before being killed
+KILL_GRACE = 1
+
+
+class JobTimeout(BaseException):
+    """Raised in a job at its time limit; not an Exception, so script catch blocks let it through"""
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout("Job exceeded its time limit")
+
+
+class WorkerPool:
+    """Supervisor for pre-forked interpreter processes sharing one socket"""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, workers=None, preload=(), timeout=None):
+        self.socket_path = socket_path
+        self.workers = workers or os.cpu_count() or 1
+        self.preload = list(preload)
+        self.timeout = timeout
+        self.children = set()
+        self.interpreter = None
+        self.sock = None
+        self.running = False
+
+    def warm_up(self):
+        """Build the interpreter and module cache that workers inherit"""
+        self.interpreter = Interpreter()
+        for module in self.preload:
+            # Compiled modules land in interpreter.modules, so a job's
+            # `import` only has to merge them into its environment.
+            self.interpreter.eval_import_stmt(ImportStmt(module), {})
+
+    def serve(self):
+        """Fork the workers and supervise them until SIGTERM or SIGINT"""
+        if not hasattr(os, 'fork') or not hasattr(socket, 'AF_UNIX'):
+            raise OSError("serve-workers needs os.fork and Unix sockets")
+        self.warm_up()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.socket_path)
+        self.sock.listen(128)
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        try:
+            for _ in range(self.workers):
+                self.spawn()
+            while self.running:
+                try:
+                    pid, _ = os.wait()
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+                self.children.discard(pid)
+                if self.running:
+                    # Replace workers that crashed or were killed
+                    self.spawn()
+        finally:
+            self.shutdown()
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            try:
+                self.worker_loop()
+            finally:
+                os._exit(0)
+        self.children.add(pid)
+        return pid
+
+    def stop(self, signum=None, frame=None):
+        self.running = False
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def shutdown(self):
+        self.stop()
+        for pid in list(self.children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.children.clear()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def worker_loop(self):
+        while True:
+            conn, _ = self.sock.accept()
+            with conn:
+                self.handle_connection(conn)
+
+    def handle_connection(self, conn):
+        stream = conn.makefile('rwb')
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                response = {'ok': False, 'error': f"Invalid job: {e}", 'error_type': 'ValueError'}
+            else:
+                response = self.run_job(job)
+            stream.write(json.dumps(response).encode('utf-8') + b'\n')
+            stream.flush()
+
+    def run_job(self, job):
+        """Run job in a fork of this worker and return its response"""
+        started = time.perf_counter()
+        timeout = job.get('timeout', self.timeout)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                with os.fdopen(write_fd, 'wb') as f:
+                    f.write(json.dumps(self.execute(job, timeout)).encode('utf-8'))
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        try:
+            data = _read_all(read_fd, timeout + KILL_GRACE if timeout else None)
+        finally:
+            os.close(read_fd)
+        if data is None:
+            # The job did not return to Python in time, e.g. stuck in C code
+            os.kill(pid, signal.SIGKILL)
+        _, status = os.waitpid(pid, 0)
+        if data:
+            response = json.loads(data)
+        else:
+            response = {'id': job.get('id'), 'ok': False, 'output': '', 'timing': {}}
+            if data is None:
+                response['error'] = "Job exceeded its time limit"
+                response['error_type'] = 'JobTimeout'
+            else:
+                response['error'] = f"Job process died with wait status {status}"
+                response['error_type'] = 'WorkerError'
+        response['worker'] = os.getpid()
+        response['timing']['total_ms'] = (time.perf_counter() - started) * 1000
+        return response
+
+    def execute(self, job, timeout):
+        """Run job in the current (forked) process with the warm interpreter"""
+        started = time.perf_counter()
+        response = {'id': job.get('id')}
+        output = io.StringIO()
+        timings = {}
+        try:
+            if 'file' in job:
+                with open(job['file'], 'r') as f:
+                    code = f.read()
+            else:
+                code = job.get('code', '')
+            program = Parser(Lexer(code).tokenize()).parse()
+            parsed = time.perf_counter()
+            timings['parse_ms'] = (parsed - started) * 1000
+            if timeout:
+                signal.signal(signal.SIGALRM, _raise_timeout)
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                with contextlib.redirect_stdout(output):
+                    result = self.interpreter.eval(program)
+            finally:
+                if timeout:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            timings['run_ms'] = (time.perf_counter() - parsed) * 1000
+            response['ok'] = True
+            response['result'] = _jsonable(result)
+        except (Exception, JobTimeout) as e:
+            response['ok'] = False
+            response['error'] = str(e)
+            response['error_type'] = type(e).__name__
+        response['output'] = output.getvalue()
+        response['timing'] = timings
+        return response
+
+
+def _jsonable(value):
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _read_all(fd, timeout):
+    """Read fd to EOF; None if that takes longer than timeout seconds"""
+    deadline = time.monotonic() + timeout if timeout else None
+    chunks = []
+    while True:
+        if deadline is not None:
+            ready, _, _ = select.select([fd], [], [], max(0, deadline - time.monotonic()))
+            if not ready:
+                return None
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def submit_job(code=None, file=None, socket_path=DEFAULT_SOCKET, timeout=None, job_id=None):
+    """Send one job to a running worker pool and return its response"""
+    job = {'id': job_id}
+    if file is not None:
+        job['file'] = os.path.abspath(file)
+    else:
+        job['code'] = code
+    if timeout is not None:
+        job['timeout'] = timeout
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        stream = sock.makefile('rwb')
+        stream.write(json.dumps(job).encode('utf-8') + b'\n')
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+def serve_workers(socket_path=DEFAULT_SOCKET, workers=None, preload=(), timeout=None):
+    pool = WorkerPool(socket_path, workers, preload, timeout)
+    print(f"{Colors.OKCYAN}Serving {pool.workers} ShiboScript workers on {socket_path}{Colors.ENDC}")
+    pool.serve()
@@ -0,0 +1,235 @@
+"""Test the asyncio-backed async builtins"""
+import sys
+import os
+import gc
+import threading
+import warnings
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import (
+    Interpreter, Lexer, Parser, PyCodeGenerator, get_ast, AsyncFuncDef, Await,
+    NetworkError, http_get_async, sleep_async, _event_loop, _coroutine_threads
+)
+from shiboscript.runtime import pycode_globals
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(0.2)
+        if self.path == '/missing':
+            self.send_error(404)
+            return
+        body = self.path.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def run_script(lines):
+    interpreter = Interpreter()
+    interpreter.eval(get_ast('\n'.join(lines)))
+    return interpreter.env
+
+def test_script_coroutines_interleave():
+    """Test that script coroutines suspend at await and run concurrently"""
+    env = run_script([
+        'var order = []',
+        'func worker(name, delay) {',
+        '    append(order, name + " start")',
+        '    var value = await(sleep_async(delay, name))',
+        '    append(order, name + " end")',
+        '    return value + "!"',
+        '}',
+        'var job = async(worker)',
+        'var started = time.now()',
+        'var slow = create_task(job("a", 0.2))',
+        'var fast = create_task(job("b", 0.1))',
+        'var results = run_async()',
+        'var elapsed = time.now() - started',
+        'var direct = await(job("c", 0))',
+    ])
+    assert env['results'] == ['a!', 'b!']
+    assert env['order'][:4] == ['a start', 'b start', 'b end', 'a end']
+    assert env['elapsed'] < 0.35
+    assert env['direct'] == 'c!'
+
+ASYNC_SYNTAX = [
+    'var order = []',
+    'async func fetch(name, delay) {',
+    '    append(order, name)',
+    '    var value = await sleep_async(delay, name)',
+    '    return value + "!"',
+    '}',
+    'class Client {',
+    '    func init(self, base) { self.base = base }',
+    '    async func get(self, path) {',
+    '        await sleep_async(0.05)',
+    '        return self.base + path',
+    '    }',
+    '}',
+    'var started = time.now()',
+    'var results = await gather(fetch("a", 0.2), fetch("b", 0.1), fetch("c", 0.15))',
+    'var elapsed = time.now() - started',
+    'var page = await Client("http://x").get("/y")',
+    'var finished = []',
+    'for (slot in as_completed([fetch("slow", 0.2), fetch("quick", 0.05)])) {',
+    '    append(finished, await slot)',
+    '}',
+    'var timed_out = null',
+    'try {',
+    '    await with_timeout(fetch("late", 1), 0.05)',
+    '} catch (e) {',
+    '    timed_out = e',
+    '}',
+    'var plain = await 5 + 1',
+]
+
+def test_async_syntax():
+    """Test async func / await expressions and the structured helpers"""
+    program = Parser(Lexer('\n'.join(ASYNC_SYNTAX)).tokenize()).parse()
+    assert isinstance(program.statements[1], AsyncFuncDef)
+    assert isinstance(program.statements[1].body[1].value, Await)
+    env = run_script(ASYNC_SYNTAX)
+    assert env['results'] == ['a!', 'b!', 'c!']
+    assert env['order'][:3] == ['a', 'b', 'c']
+    assert env['elapsed'] < 0.35
+    assert env['page'] == 'http://x/y'
+    assert env['finished'] == ['quick!', 'slow!']
+    assert env['timed_out'] == 'Timed out after 0.05 seconds'
+    assert env['plain'] == 6
+
+def test_async_syntax_compiled():
+    """Test that the pycode backend runs async functions the same way"""
+    parser = Parser(Lexer('\n'.join(ASYNC_SYNTAX)).tokenize())
+    namespace = pycode_globals()
+    exec(PyCodeGenerator(parser.line_map).compile(parser.parse()), namespace)
+    assert namespace['results'] == ['a!', 'b!', 'c!']
+    assert namespace['page'] == 'http://x/y'
+    assert namespace['finished'] == ['quick!', 'slow!']
+    assert namespace['plain'] == 6
+
+def test_as_completed_partly_awaited():
+    """Test that as_completed slots a script never awaits leave no coroutines"""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        env = run_script([
+            'var slots = as_completed([sleep_async(0.01, "a"), sleep_async(0.1, "b"), sleep_async(0.2, "c")])',
+            'var first = await slots[0]',
+        ])
+        assert env['first'] == 'a'
+        del env
+        gc.collect()
+    assert not [w for w in caught if "never awaited" in str(w.message)]
+
+def test_thousands_in_flight():
+    """Test that thousands of awaitables overlap on the loop"""
+    env = run_script([
+        'var tasks = []',
+        'for (i in range(0, 2000)) {',
+        '    append(tasks, create_task(sleep_async(0.2, i)))',
+        '}',
+        'var started = time.now()',
+        'var results = run_async()',
+        'var elapsed = time.now() - started',
+    ])
+    assert env['results'] == list(range(2000))
+    assert env['elapsed'] < 2
+
+def test_many_script_coroutines():
+    """Test a thousand suspended script coroutines, and thread reuse after them"""
+    lines = [
+        'async func job(n) {',
+        '    await sleep_async(0.2)',
+        '    return n + 1',
+        '}',
+        'var tasks = []',
+        'for (i in range(0, 1000)) {',
+        '    append(tasks, create_task(job(i)))',
+        '}',
+        'var started = time.now()',
+        'var results = run_async()',
+        'var elapsed = time.now() - started',
+    ]
+    env = run_script(lines)
+    assert env['results'] == list(range(1, 1001))
+    assert env['elapsed'] < 5
+    # Let every finished coroutine's thread park before starting more
+    deadline = time.monotonic() + 5
+    while len(_coroutine_threads.idle) < _coroutine_threads.threads and time.monotonic() < deadline:
+        time.sleep(0.01)
+    threads = _coroutine_threads.threads
+    assert run_script(lines)['results'] == list(range(1, 1001))
+    assert _coroutine_threads.threads <= threads
+
+def test_baton_released_across_threads():
+    """Test that a thread finishing after create_task/await leaves the baton free"""
+    def run_on_thread(lines):
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(run_script(lines)))
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive(), "script thread is stuck waiting for the baton"
+        return result
+    program = [
+        'async func f(n) {',
+        '    await sleep_async(0.01)',
+        '    return n * 2',
+        '}',
+    ]
+    first = run_on_thread(program + ['var t = create_task(f(1))', 'var value = await t'])
+    assert first['value'] == 2
+    second = run_on_thread(program + ['var value = await f(2)'])
+    assert second['value'] == 4
+    # Creating a task from plain Python code must not take the baton either
+    creator = threading.Thread(target=lambda: _event_loop.create_task(sleep_async(0, 'done')))
+    creator.start()
+    creator.join()
+    assert run_on_thread(program + ['var value = await f(3)'])['value'] == 6
+    assert _event_loop.run_until_complete()[-1] == 'done'
+
+def test_interpreters_run_in_parallel():
+    """Test that programs on separate threads do not wait on each other"""
+    threads = [threading.Thread(target=run_script, args=(['time.sleep(0.3)'],)) for _ in range(4)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.perf_counter() - started < 0.9
+
+def test_http_async():
+    """Test that awaitable HTTP requests overlap against a local server"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        started = time.perf_counter()
+        tasks = [_event_loop.create_task(http_get_async(f'{base}/item/{i}')) for i in range(10)]
+        responses = _event_loop.run_until_complete()
+        assert time.perf_counter() - started < 1.5
+        assert [r['text'] for r in responses] == [f'/item/{i}' for i in range(10)]
+        assert all(task.done() for task in tasks)
+        try:
+            _event_loop.wait(http_get_async(f'{base}/missing'))
+            assert False, "expected a NetworkError"
+        except NetworkError as e:
+            assert '404' in str(e)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    test_script_coroutines_interleave()
+    test_async_syntax()
+    test_async_syntax_compiled()
+    test_as_completed_partly_awaited()
+    test_thousands_in_flight()
+    test_many_script_coroutines()
+    test_baton_released_across_threads()
+    test_interpreters_run_in_parallel()
+    test_http_async()
+    print("All async tests passed!")
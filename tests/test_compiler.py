@@ -0,0 +1,270 @@
+"""Test compiling ShiboScript to Python"""
+import sys
+import os
+import io
+import re
+import tempfile
+import traceback
+from contextlib import redirect_stdout
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import (
+    get_ast, Optimizer, PythonTranspiler, Program, ForStmt, VarDecl, BinaryOp,
+    Identifier, Number, IfStmt, ContinueStmt, AssignStmt, PostfixOp,
+    ShiboCompilerBackend, compile_file_to_code, code_cache_path, run_code,
+    Interpreter, parse_run_options
+)
+from shiboscript.compiler import ShiboCompiler
+
+def run_python(code):
+    """Compile ShiboScript to Python, run it and return its globals"""
+    return ShiboCompiler().execute_compiled(code, use_interpreter=False)
+
+def test_transpiled_semantics():
+    """Test that generated Python keeps ShiboScript operator semantics"""
+    env = run_python('\n'.join([
+        'var s = "n=" + 4',
+        'var d = {}',
+        'var missing = d["nope"]',
+        'var shifted = -8 >>> 28',
+        'var a = 5',
+        'var b = a++ + ++a',
+        'var either = 0 || "x"',
+    ]))
+    assert env['s'] == 'n=4'
+    assert env['missing'] is None
+    assert env['shifted'] == 15
+    assert env['b'] == 12 and env['a'] == 7
+    assert env['either'] == 'x'
+
+def test_transpiled_classes():
+    """Test that classes with init translate to Python classes"""
+    env = run_python('\n'.join([
+        'class Animal {',
+        '    func init(self, name) {',
+        '        self.name = name',
+        '    }',
+        '    func speak(self) {',
+        '        return self.name + " speaks"',
+        '    }',
+        '}',
+        'class Dog(Animal) {',
+        '    func init(self, name) {',
+        '        Animal.init(self, name)',
+        '    }',
+        '}',
+        'var dog = Dog("Rex")',
+        'var said = dog.speak()',
+        'var is_animal = dog instanceof Animal',
+    ]))
+    assert env['said'] == 'Rex speaks'
+    assert env['is_animal'] is True
+
+def test_for_continue_runs_increment():
+    """Test that continue inside a C-style for loop still increments"""
+    body = [IfStmt(BinaryOp(Identifier('i'), '==', Number(2)), [ContinueStmt()], []),
+            AssignStmt(Identifier('total'), BinaryOp(Identifier('total'), '+', Identifier('i')))]
+    program = Program([
+        VarDecl('total', Number(0)),
+        ForStmt(VarDecl('i', Number(0)), BinaryOp(Identifier('i'), '<', Number(5)),
+                PostfixOp(Identifier('i'), '++'), body),
+    ])
+    env = {}
+    exec(compile(PythonTranspiler().transpile(program), '<test>', 'exec'), env)
+    assert env['total'] == 0 + 1 + 3 + 4
+
+def test_optimizer_folds_constants():
+    """Test constant folding and dead branch elimination"""
+    program = Optimizer().optimize_ast(get_ast('var x = 2 * 3 + 1\nif (true) {\n    var y = "a" + 1\n}'))
+    assert program.statements[0] == VarDecl('x', Number(7))
+    assert program.statements[1].name == 'y'
+    assert program.statements[1].value.value == 'a1'
+
+def test_generated_code_compiles():
+    """Test that shiboc output is valid Python source"""
+    code = 'func fact(n) {\n    if (n <= 1) {\n        return 1\n    }\n    return n * fact(n - 1)\n}\nvar r = fact(10)'
+    source = ShiboCompiler().compile_to_python(code)
+    assert '# Unhandled' not in source
+    env = {}
+    exec(compile(source, '<test>', 'exec'), env)
+    assert env['r'] == 3628800
+
+
+def test_pycode_backend():
+    """Test that code objects built from the AST match the transpiler"""
+    code = '\n'.join([
+        'var s = "n=" + 4',
+        'var shifted = -8 >>> 28',
+        'var a = 5',
+        'var b = a++ + ++a',
+        'func boom(x) {',
+        '    return x / 0',
+        '}',
+    ])
+    env = run_code(ShiboCompilerBackend().compile_to_code(code, 'demo.shibo'))
+    assert env['s'] == 'n=4'
+    assert env['shifted'] == 15
+    assert env['b'] == 12 and env['a'] == 7
+    try:
+        env['boom'](1)
+    except ZeroDivisionError:
+        frame = traceback.extract_tb(sys.exc_info()[2])[-1]
+        assert (frame.filename, frame.lineno) == ('demo.shibo', 6)
+    else:
+        assert False, "expected ZeroDivisionError"
+
+def test_parse_run_options():
+    """Test the --engine and --jit-threshold options shared by the entry points"""
+    options, rest = parse_run_options(['run', '--engine=pycode', 'app.shibo', '--jit-threshold', '50'])
+    assert options == {'engine': 'pycode', 'jit_threshold': 50}
+    assert rest == ['run', 'app.shibo']
+    assert parse_run_options(['-r', 'app.shibo']) == ({'engine': 'interp', 'jit_threshold': None}, ['-r', 'app.shibo'])
+    for bad in (['--engine=jvm'], ['--jit-threshold=soon'], ['--engine']):
+        try:
+            parse_run_options(bad)
+        except SystemExit as e:
+            assert e.code
+        else:
+            assert False, f"expected {bad} to be rejected"
+
+def test_pycode_cache():
+    """Test that compiled code objects are cached next to the source"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cached.shibo')
+        with open(path, 'w') as f:
+            f.write('var answer = 6 * 7')
+        code = compile_file_to_code(path)
+        assert os.path.exists(code_cache_path(path))
+        cached = compile_file_to_code(path)
+        assert cached.co_filename == code.co_filename
+        assert run_code(cached)['answer'] == 42
+
+# Programs whose printed output must be the same in the interpreter and in
+# both compiled backends
+DIFFERENTIAL_PROGRAMS = {
+    'operators': [
+        'var d = {}',
+        'var a = 5',
+        'print("n=" + 4 + " " + d["nope"])',
+        'print([a++ + ++a, a, -8 >>> 28, 7 // 2, 0 || "x", !true])',
+    ],
+    'loops': [
+        'var total = 0',
+        'var i = 0',
+        'while (i < 6) {',
+        '    i++',
+        '    if (i == 2) {',
+        '        continue',
+        '    }',
+        '    total = total + i',
+        '}',
+        'var seen = []',
+        'for (x in [3, 1, 2]) {',
+        '    append(seen, x * 2)',
+        '}',
+        'print([total, seen])',
+    ],
+    'classes': [
+        'class Animal {',
+        '    func init(self, name) {',
+        '        self.name = name',
+        '    }',
+        '    func speak(self) {',
+        '        return self.name + " speaks"',
+        '    }',
+        '}',
+        'class Dog(Animal) {',
+        '    func init(self, name) {',
+        '        Animal.init(self, name)',
+        '    }',
+        '}',
+        'var dog = Dog("Rex")',
+        'print(dog.speak())',
+        'print(dog)',
+        'print([dog, dog instanceof Animal])',
+    ],
+    'nested call': [
+        'func outer() {',
+        '    var n = 5',
+        '    func inner() {',
+        '        return n',
+        '    }',
+        '    return inner()',
+        '}',
+        'print(outer())',
+    ],
+    'returned closure': [
+        'func adder(n) {',
+        '    func add(x) {',
+        '        return [x, n]',
+        '    }',
+        '    return add',
+        '}',
+        'var add3 = adder(3)',
+        'print(add3(4))',
+    ],
+    'caller variables': [
+        'var g = 1',
+        'func show() {',
+        '    return [g, v]',
+        '}',
+        'func caller() {',
+        '    var v = 3',
+        '    return show()',
+        '}',
+        'func shadow() {',
+        '    var g = 7',
+        '    func inner() {',
+        '        return g',
+        '    }',
+        '    return inner()',
+        '}',
+        'print([caller(), shadow(), g])',
+    ],
+    'try scope': [
+        'try {',
+        '    var x = 1 / 0',
+        '} catch (e) {',
+        '    print("caught " + e)',
+        '}',
+        'func f() {',
+        '    try {',
+        '        var y = 1 / 0',
+        '    } catch (e) {',
+        '        var z = 2',
+        '    }',
+        '    return [y, z]',
+        '}',
+        'print([x, f()])',
+    ],
+}
+
+def backend_outputs(code):
+    """Return what each backend prints for a program, with object ids masked"""
+    runners = {
+        'interpreter': lambda: Interpreter().eval(get_ast(code)),
+        'pycode': lambda: run_code(ShiboCompilerBackend().compile_to_code(code)),
+        'transpiled': lambda: exec(compile(PythonTranspiler().transpile(get_ast(code)), '<test>', 'exec'), {}),
+    }
+    outputs = {}
+    for name, run in runners.items():
+        out = io.StringIO()
+        with redirect_stdout(out):
+            run()
+        outputs[name] = re.sub(r'0x[0-9a-f]+', '0x', out.getvalue())
+    return outputs
+
+def test_backends_match_interpreter():
+    """Test that both compiled backends print what the interpreter prints"""
+    for name, lines in DIFFERENTIAL_PROGRAMS.items():
+        outputs = backend_outputs('\n'.join(lines))
+        assert outputs['pycode'] == outputs['interpreter'], (name, outputs)
+        assert outputs['transpiled'] == outputs['interpreter'], (name, outputs)
+
+def test_transpiler_unparses_pycode():
+    """Test that the transpiler emits the code generator's program as source"""
+    source = PythonTranspiler().transpile(get_ast('func f(n) {\n    return n + 1\n}\nassert(f(1) == 2)'))
+    assert 'def f(n):' in source
+    assert 'assert_(f(1) == 2)' in source
+    assert 'globals().update(_sb_builtins())' in source
+    compile(source, '<test>', 'exec')
@@ -0,0 +1,116 @@
+"""Test streaming hashes and base64 helpers"""
+import sys
+import os
+import base64
+import hashlib
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import (
+    Interpreter, get_ast, ValidationError, hasher, hash_file, sha256, md5,
+    base64_encode, base64_decode, base64_encode_file, base64_decode_file
+)
+
+DATA = bytes(range(256)) * 41 + b'tail'
+
+def test_bytes_support():
+    """Test that hashes and base64 accept bytes as well as text"""
+    assert sha256(b'abc') == sha256('abc') == hashlib.sha256(b'abc').hexdigest()
+    assert md5('héllo') == hashlib.md5('héllo'.encode('utf-8')).hexdigest()
+    assert base64_encode(b'\xff\x00') == '/wA='
+    assert base64_decode('/wA=', True) == b'\xff\x00'
+    assert base64_decode(base64_encode('héllo')) == 'héllo'
+
+def test_hasher():
+    """Test incremental updates, chaining and copies"""
+    digest = hasher('sha1').update('ab').update(b'c')
+    assert digest.hexdigest() == hashlib.sha1(b'abc').hexdigest()
+    branch = digest.copy().update('d')
+    assert branch.hexdigest() == hashlib.sha1(b'abcd').hexdigest()
+    assert digest.hexdigest() == hashlib.sha1(b'abc').hexdigest()
+    assert hasher('sha512', 'x').digest() == hashlib.sha512(b'x').digest()
+    try:
+        hasher('nope')
+        assert False, "expected a ValidationError"
+    except ValidationError:
+        pass
+
+def test_hash_file():
+    """Test that chunked file hashing matches hashing the whole file"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'artifact.bin')
+        with open(path, 'wb') as f:
+            f.write(DATA)
+        assert hash_file(path) == hashlib.sha256(DATA).hexdigest()
+        assert hash_file(path, 'md5', 100) == hashlib.md5(DATA).hexdigest()
+
+def test_base64_files():
+    """Test file-to-file encoding and decoding across chunk sizes"""
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'data.bin')
+        encoded = os.path.join(directory, 'data.b64')
+        decoded = os.path.join(directory, 'data.out')
+        with open(source, 'wb') as f:
+            f.write(DATA)
+        for chunk_size in (1, 4, 1000, 786432):
+            assert base64_encode_file(source, encoded, chunk_size) == len(base64.b64encode(DATA))
+            with open(encoded, 'rb') as f:
+                assert f.read() == base64.b64encode(DATA)
+            assert base64_decode_file(encoded, decoded, chunk_size) == len(DATA)
+            with open(decoded, 'rb') as f:
+                assert f.read() == DATA
+        # Line-wrapped (MIME) input decodes too
+        with open(encoded, 'wb') as f:
+            f.write(base64.encodebytes(DATA))
+        base64_decode_file(encoded, decoded, 1000)
+        with open(decoded, 'rb') as f:
+            assert f.read() == DATA
+        # Bad input fails whatever the chunk boundaries, leaving no output file
+        for bad in (b'abcde', b'QUJD!!!!', b'QU JD\n!', b'QQ==QUJD', b'QUI=\nQUJD', b'Q===', b'QQ=\n=='):
+            for chunk_size in (1, 3, 4, 1000):
+                with open(encoded, 'wb') as f:
+                    f.write(bad)
+                try:
+                    base64_decode_file(encoded, decoded, chunk_size)
+                    assert False, f"expected a ValidationError for {bad!r}"
+                except ValidationError:
+                    pass
+                assert not os.path.exists(decoded), (bad, chunk_size)
+        for good in (b'QUI=\n', b'QU\nI=', b'QUJD\r\n'):
+            for chunk_size in (1, 3, 4, 1000):
+                with open(encoded, 'wb') as f:
+                    f.write(good)
+                base64_decode_file(encoded, decoded, chunk_size)
+                with open(decoded, 'rb') as f:
+                    assert f.read() == base64.b64decode(good), (good, chunk_size)
+
+def test_crypto_script():
+    """Test the crypto and base64 namespaces from a script"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'notes.txt')
+        interpreter = Interpreter()
+        interpreter.env['path'] = path
+        interpreter.eval(get_ast('\n'.join([
+            'file.write(path, "line one\\nline two\\n")',
+            'var digest = crypto.hasher("sha256")',
+            'for (line in ["line one\\n", "line two\\n"]) {',
+            '    digest.update(line)',
+            '}',
+            'var streamed = digest.hexdigest()',
+            'var whole = crypto.hash_file(path)',
+            'base64.encode_file(path, path + ".b64")',
+            'base64.decode_file(path + ".b64", path + ".out")',
+            'var restored = crypto.hash_file(path + ".out")',
+        ])))
+        env = interpreter.env
+        assert env['streamed'] == env['whole'] == env['restored']
+        with open(path, 'rb') as f:
+            assert env['whole'] == hashlib.sha256(f.read()).hexdigest()
+
+if __name__ == "__main__":
+    test_bytes_support()
+    test_hasher()
+    test_hash_file()
+    test_base64_files()
+    test_crypto_script()
+    print("All crypto tests passed!")
@@ -0,0 +1,127 @@
+"""Test the builtin data structures"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import (
+    Queue, PriorityQueue, BoundedQueue, BoundedPriorityQueue, Set, Stack, ValidationError,
+    Interpreter, get_ast, _deep_copy, Memoized
+)
+
+def test_queue_fifo_and_capacity():
+    """Test FIFO order and bounded queues"""
+    queue = Queue()
+    for i in range(5):
+        queue.enqueue(i)
+    assert [queue.dequeue() for _ in range(6)] == [0, 1, 2, 3, 4, None]
+    bounded = BoundedQueue(2).enqueue("a").enqueue("b")
+    assert bounded.is_full()
+    try:
+        bounded.enqueue("c")
+        assert False, "expected a full queue error"
+    except ValidationError:
+        pass
+
+def test_priority_queue_order():
+    """Test priority order, stable ties, decrease_key and bulk construction"""
+    pq = PriorityQueue()
+    pq.enqueue("first", 2).enqueue("second", 2).enqueue("urgent", 1).enqueue({"job": 1}, 3)
+    pq.decrease_key("second", 0)
+    assert pq.size() == 4
+    assert [pq.dequeue() for _ in range(4)] == ["second", "urgent", "first", {"job": 1}]
+    assert pq.dequeue() is None and pq.is_empty()
+    bulk = PriorityQueue([["c", 3], ["a", 1], ["b", 2]])
+    bulk.push_many([["d", 0]])
+    assert bulk.to_list() == [["d", 0], ["a", 1], ["b", 2], ["c", 3]]
+    bounded = BoundedPriorityQueue(1, [["x", 1]])
+    try:
+        bounded.enqueue("y", 0)
+        assert False, "expected a full queue error"
+    except ValidationError:
+        pass
+
+def test_set_algebra():
+    """Test Set operations, in-place updates and language integration"""
+    evens = Set(range(0, 10, 2))
+    small = Set([0, 1, 2, 3])
+    assert evens.union(small) == Set([0, 1, 2, 3, 4, 6, 8])
+    assert evens.intersection(small) == Set([0, 2])
+    assert evens.difference([0, 2]).size() == 3
+    small.update([10]).intersect_update(evens.union([10]))
+    assert sorted(small.to_list()) == [0, 2, 10]
+    assert 10 in small and len(small) == 3
+    interpreter = Interpreter()
+    interpreter.env['items'] = small
+    interpreter.eval(get_ast('var total = 0\nfor (x in items) {\n    total = total + x\n}\nvar n = len(items)'))
+    assert interpreter.env['total'] == 12 and interpreter.env['n'] == 3
+
+def test_set_order():
+    """Test that Sets and their operations keep insertion order"""
+    words = Set(['pear', 'apple', 'fig', 'apple', 'kiwi'])
+    assert words.to_list() == ['pear', 'apple', 'fig', 'kiwi']
+    assert words.union(['banana', 'fig']).to_list() == ['pear', 'apple', 'fig', 'kiwi', 'banana']
+    assert words.intersection(['kiwi', 'pear']).to_list() == ['pear', 'kiwi']
+    assert words.difference(Set(['apple'])).to_list() == ['pear', 'fig', 'kiwi']
+    assert words.symmetric_difference(['fig', 'date']).to_list() == ['pear', 'apple', 'kiwi', 'date']
+    assert list(words.copy().add('date').remove('pear')) == ['apple', 'fig', 'kiwi', 'date']
+    assert words.is_subset(['kiwi', 'fig', 'apple', 'pear']) and not words.is_subset(words.difference(['fig']))
+    assert Set([1, 2]) == Set([2, 1]) and len(words.copy().difference_update(words)) == 0
+
+def test_deep_copy_structures():
+    """Test that deep copies keep their class, capacity and contents"""
+    assert _deep_copy(Set([1, 2])) == Set([1, 2])
+    queue = BoundedQueue(3, [[1], [2]])
+    copied = _deep_copy(queue)
+    copied.front().append(9)
+    assert queue.front() == [1] and copied.capacity == 3 and isinstance(copied, BoundedQueue)
+    stack = Stack().push("a")
+    assert _deep_copy(stack).pop() == "a" and stack.size() == 1
+    pq = PriorityQueue([["x", 2], ["y", 1]])
+    assert _deep_copy(pq).to_list() == [["y", 1], ["x", 2]]
+
+def test_memoize():
+    """Test memoized script and Python functions, keys, eviction and TTL"""
+    interpreter = Interpreter()
+    interpreter.eval(get_ast('\n'.join([
+        'var calls = 0',
+        'func fib(n) {',
+        '    if (n < 2) {',
+        '        return n',
+        '    }',
+        '    return fib(n - 1) + fib(n - 2)',
+        '}',
+        'fib = memoize(fib, 100)',
+        'var result = fib(60)',
+        'var info = fib.cache_info()',
+    ])))
+    assert interpreter.env['result'] == 1548008755920
+    assert interpreter.env['info']['misses'] == 61
+    calls = []
+    def record(value):
+        calls.append(value)
+        return value
+    memo = Memoized(record, max_size=2)
+    memo(1), memo("1"), memo([1, 2]), memo([1, 2])
+    assert calls == [1, "1", [1, 2]]
+    assert memo.cache_info()['evictions'] == 1
+    memo.cache_clear()
+    assert memo.cache_info()['size'] == 0
+    # Equal values of different types, and keyword vs positional, get their own entries
+    seen = []
+    def echo(*args, **kwargs):
+        seen.append((args, kwargs))
+        return len(seen)
+    memo = Memoized(echo)
+    assert [memo(1), memo(True), memo(1.0), memo(1)] == [1, 2, 3, 1]
+    assert [memo([1]), memo([True]), memo((1,)), memo({1: 'a'}), memo({True: 'a'})] == [4, 5, 6, 7, 8]
+    assert memo(a=1) != memo((), (('a', 1),)) != memo((('a', 1),))
+    assert memo(a=1, b=[2]) == memo(b=[2], a=1)
+
+if __name__ == "__main__":
+    test_queue_fifo_and_capacity()
+    test_priority_queue_order()
+    test_set_algebra()
+    test_set_order()
+    test_deep_copy_structures()
+    test_memoize()
+    print("All data structure tests passed!")
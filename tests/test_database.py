@@ -0,0 +1,288 @@
+"""Test the SQLite-backed Database ORM"""
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import (
+    Interpreter, get_ast, create_database, create_model, query_builder, _default_logger,
+    _metrics_collector
+)
+
+def make_users():
+    db = create_database(":memory:")
+    users = create_model(db, "users", {"id": "INTEGER PRIMARY KEY", "name": "TEXT", "age": "INTEGER"})
+    return db, users
+
+def test_create_many_and_lastrowid():
+    """Test bulk inserts and returning the new row id"""
+    db, users = make_users()
+    assert users.create({"name": "Ann", "age": 30}) == {"id": 1, "name": "Ann", "age": 30}
+    assert users.create({"name": "Bob", "age": 25}, True) == 2
+    assert users.create_many([{"name": f"user{i}", "age": i} for i in range(100)]) == 100
+    assert len(users.all()) == 102
+
+def test_transactions():
+    """Test that rollback discards writes made since begin"""
+    db, users = make_users()
+    try:
+        with db.transaction():
+            users.create({"name": "Ann", "age": 30})
+            raise ValueError("abort")
+    except ValueError:
+        pass
+    assert users.all() == []
+    interpreter = Interpreter()
+    interpreter.env['users'] = users
+    interpreter.env['db'] = db
+    interpreter.env['bob'] = {"name": "Bob", "age": 1}
+    interpreter.env['cid'] = {"name": "Cid", "age": 2}
+    interpreter.eval(get_ast('\n'.join([
+        'begin(db)',
+        'users.create(bob)',
+        'rollback(db)',
+        'begin(db)',
+        'users.create(cid)',
+        'commit(db)',
+    ])))
+    assert [row["name"] for row in users.all()] == ["Cid"]
+
+def test_nested_transactions():
+    """Test that an inner rollback keeps the outer transaction's writes"""
+    db = create_database(":memory:")
+    db.create_table("items", {"id": "INTEGER"})
+    with db.transaction():
+        db.insert("items", {"id": 1})
+        db.insert("items", {"id": 2})
+        try:
+            with db.transaction():
+                db.insert("items", {"id": 3})
+                raise ValueError("abort inner")
+        except ValueError:
+            pass
+        with db.transaction():
+            db.insert("items", {"id": 4})
+        db.insert("items", {"id": 5})
+    assert db.select("items") == [(1,), (2,), (4,), (5,)]
+    assert db.transaction_depth == 0
+    try:
+        with db.transaction():
+            with db.transaction():
+                db.insert("items", {"id": 6})
+            raise ValueError("abort outer")
+    except ValueError:
+        pass
+    assert db.select("items") == [(1,), (2,), (4,), (5,)]
+
+def test_find_iter_streams_rows():
+    """Test lazy iteration in batches and the alternative row formats"""
+    db, users = make_users()
+    users.create_many([{"name": f"user{i}", "age": i} for i in range(25)])
+    rows = users.find_iter(batch_size=4)
+    assert next(rows) == {"id": 1, "name": "user0", "age": 0}
+    assert len(list(rows)) == 24
+    assert list(users.find_iter({"age": 3}, row_format="tuple")) == [(4, "user3", 3)]
+    assert users.find({"age": 3}, row_format="row")[0]["name"] == "user3"
+    interpreter = Interpreter()
+    interpreter.env['users'] = users
+    interpreter.eval(get_ast('\n'.join([
+        'var total = 0',
+        'for (row in users.find_iter()) {',
+        '    total = total + row["age"]',
+        '}',
+    ])))
+    assert interpreter.env['total'] == sum(range(25))
+
+def test_sql_text_cache():
+    """Test that CRUD statements are built once per table and column set"""
+    db, users = make_users()
+    for i in range(10):
+        users.create({"name": f"user{i}", "age": i})
+        users.update({"age": i + 1}, {"name": f"user{i}"})
+    users.delete({"age": 1})
+    assert len(users.find({"age": 5})) == 1
+    assert ("insert", "users", ("name", "age"), ()) in db.sql_cache
+    assert db.sql_cache[("update", "users", ("age",), ("name",))] == "UPDATE users SET age = ? WHERE name = ?"
+    assert len(db.sql_cache) == 4
+    assert create_database(":memory:", cached_statements=16).cached_statements == 16
+
+def test_query_builder():
+    """Test bound parameters, IN/BETWEEN/OR groups, keyset pages and aggregates"""
+    db, users = make_users()
+    users.create_many([{"name": f"user{i}", "age": i} for i in range(20)])
+    rows = query_builder(db).from_table("users").select(["name"]).where("age", ">=", 18).execute()
+    assert rows == [("user18",), ("user19",)]
+    query = query_builder(db).from_table("users").where_in("age", [1, 2, 3]).where_any([["name", "=", "user2"], ["age", "=", 3]])
+    assert query.count() == 2
+    assert query_builder(db).from_table("users").where_between("age", 5, 7).count() == 3
+    assert query_builder(db).from_table("users").where("name", "=", "nobody").exists() is False
+    page = query_builder(db).from_table("users").select("id").order_by("id").limit(5).execute()
+    assert [row[0] for row in page] == [1, 2, 3, 4, 5]
+    next_page = query_builder(db).from_table("users").select("id").after("id", page[-1][0]).limit(5).execute()
+    assert [row[0] for row in next_page] == [6, 7, 8, 9, 10]
+    cached = len(db.sql_cache)
+    query_builder(db).from_table("users").select("id").after("id", 10).limit(5).execute()
+    assert len(db.sql_cache) == cached
+
+def test_indexes_and_explain():
+    """Test declared indexes show up in the query plan and scans are reported"""
+    db = create_database(":memory:")
+    users = create_model(db, "users", {"id": "INTEGER PRIMARY KEY", "email": "TEXT", "name": "TEXT", "age": "INTEGER"},
+                         indexes=[["name", "age"]], unique=["email"], scan_warning_rows=10)
+    users.create_many([{"email": f"u{i}@x", "name": f"user{i}", "age": i} for i in range(20)])
+    assert any("uq_users_email" in detail for detail in users.explain({"email": "u1@x"}))
+    assert any("idx_users_name_age" in detail for detail in users.explain({"name": "user1", "age": 1}))
+    assert users.explain({"age": 1})[0].startswith("SCAN")
+    try:
+        users.create({"email": "u1@x", "name": "dup", "age": 0})
+        assert False, "expected a unique constraint failure"
+    except Exception as e:
+        assert "UNIQUE" in str(e)
+    before = len(_default_logger.logs)
+    users.find({"age": 3})
+    users.find({"age": 4})
+    assert len(_default_logger.logs) == before + 1
+
+def test_connection_pool_threads():
+    """Test that threads get their own connections to the same database"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = create_database(os.path.join(tmp, "app.db"), pragmas={"synchronous": "NORMAL", "cache_size": -2000})
+        assert db.execute("PRAGMA journal_mode")[0][0] == "wal"
+        users = create_model(db, "users", {"id": "INTEGER PRIMARY KEY", "name": "TEXT", "age": "INTEGER"})
+        errors = []
+        seen = []
+        
+        def writer():
+            try:
+                users.create_many([{"name": f"user{i}", "age": i} for i in range(500)])
+            except Exception as e:
+                errors.append(e)
+        
+        def reader():
+            try:
+                for _ in range(20):
+                    seen.append(len(users.find()))
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert all(count in (0, 500) for count in seen)
+        assert len(db.pool.connections) == 5
+        db.disconnect()
+    
+    db, users = make_users()
+    users.create({"name": "Ann", "age": 30})
+    result = []
+    thread = threading.Thread(target=lambda: result.append(users.find({"name": "Ann"})))
+    thread.start()
+    thread.join()
+    assert result[0][0]["age"] == 30
+
+def test_memory_database_writers():
+    """Test that threads writing to a shared :memory: database take turns"""
+    db = create_database(":memory:")
+    users = create_model(db, "users", {"id": "INTEGER PRIMARY KEY", "name": "TEXT", "age": "INTEGER"})
+    errors = []
+    
+    def writer(n):
+        try:
+            for i in range(100):
+                users.create({"name": f"user{n}-{i}", "age": i})
+            with db.transaction():
+                db.update("users", {"age": -1}, {"name": f"user{n}-0"})
+                # Other threads' writes wait for this transaction to end
+                time.sleep(0.02)
+                users.create_many([{"name": f"batch{n}-{i}", "age": i} for i in range(50)])
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(users.find()) == 600
+    assert len(users.find({"age": -1})) == 4
+
+def test_model_result_cache():
+    """Test cached finds, LRU eviction, TTL and invalidation on writes"""
+    db = create_database(":memory:")
+    users = create_model(db, "users", {"id": "INTEGER PRIMARY KEY", "name": "TEXT", "age": "INTEGER"},
+                         cache_size=2)
+    users.create_many([{"name": f"user{i}", "age": i} for i in range(5)])
+    _metrics_collector.reset_metrics()
+    first = users.find({"age": 1})
+    first[0]["name"] = "changed"
+    assert users.find({"age": 1})[0]["name"] == "user1"
+    assert _metrics_collector.get("model_cache_hits") == 1
+    assert _metrics_collector.get("model_cache_misses") == 1
+    users.find({"age": 2})
+    users.find({"age": 3})
+    assert _metrics_collector.get("model_cache_evictions") == 1
+    users.update({"name": "renamed"}, {"age": 3})
+    assert users.find_one({"age": 3})["name"] == "renamed"
+    other = create_model(db, "users", users.schema)
+    other.delete({"age": 3})
+    assert users.find({"age": 3}) == []
+    users.enable_cache(ttl=0.01)
+    users.find({"age": 4})
+    time.sleep(0.02)
+    misses = _metrics_collector.get("model_cache_misses")
+    users.find({"age": 4})
+    assert _metrics_collector.get("model_cache_misses") == misses + 1
+
+def test_model_cache_during_transaction():
+    """Test that finds in other threads during a transaction do not cache stale rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = create_database(os.path.join(tmp, "app.db"))
+        users = create_model(db, "users", {"id": "INTEGER PRIMARY KEY", "name": "TEXT", "age": "INTEGER"},
+                             cache_size=16)
+        users.create({"name": "Ann", "age": 30})
+        
+        def find_age():
+            result = []
+            thread = threading.Thread(target=lambda: result.append(users.find_one({"name": "Ann"})["age"]))
+            thread.start()
+            thread.join()
+            return result[0]
+        
+        assert find_age() == 30
+        with db.transaction():
+            users.update({"age": 31}, {"name": "Ann"})
+            assert users.find_one({"name": "Ann"})["age"] == 31
+            # Another thread still reads the committed row
+            assert find_age() == 30
+        assert find_age() == 31
+        assert users.find_one({"name": "Ann"})["age"] == 31
+        try:
+            with db.transaction():
+                users.update({"age": 99}, {"name": "Ann"})
+                assert find_age() == 31
+                raise ValueError("abort")
+        except ValueError:
+            pass
+        assert users.find_one({"name": "Ann"})["age"] == 31
+        assert db.pending_writes == {"users": 0}
+        db.disconnect()
+
+if __name__ == "__main__":
+    test_create_many_and_lastrowid()
+    test_transactions()
+    test_nested_transactions()
+    test_find_iter_streams_rows()
+    test_sql_text_cache()
+    test_query_builder()
+    test_indexes_and_explain()
+    test_connection_pool_threads()
+    test_memory_database_writers()
+    test_model_result_cache()
+    test_model_cache_during_transaction()
+    print("All database tests passed!")
@@ -0,0 +1,107 @@
+"""Test the incremental HTML scanner behind the web.html_* helpers"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import (
+    Interpreter, get_ast, ValidationError, html_parse, html_extract_links,
+    html_extract_images, html_form_data, html_scanner, html_select
+)
+
+PAGE = '\n'.join([
+    '<!DOCTYPE html>',
+    '<html><body>',
+    '<div id="main" class="content wide"><p>Hello <a href="/a?x=1&amp;y=2">first</a>',
+    '<p>Fish &amp; chips<img src="/fish.png" alt="fish">',
+    '<ul class="nav"><li>one<li>two <b>bold</b></ul></div>',
+    '<!-- <a href="/commented"> -->',
+    '<script>var tag = "<a href=\'/script\'>";</script>',
+    '<form id="search" action="/search" method="post"><input name="q" value="shibo"><input type="submit"></form>',
+    '<form id="login"><input name="user"><input name="pass" type="password"></form>',
+    '</body></html>',
+])
+
+def test_html_parse():
+    """Test the one-shot tag, text, link and image helpers"""
+    result = html_parse(PAGE)
+    assert sorted(result) == ['tags', 'text']
+    assert result['tags'][:4] == ['!DOCTYPE html', 'html', 'body', 'div id="main" class="content wide"']
+    assert '/a' in result['tags']
+    assert result['text'].startswith('Hello first Fish &amp; chips one two bold')
+    assert html_extract_links(PAGE)[0] == '/a?x=1&amp;y=2'
+    assert html_extract_images(PAGE) == ['/fish.png']
+
+def test_html_form_data():
+    """Test the first form by default and selecting a form by id"""
+    assert html_form_data(PAGE) == {'action': '/search', 'method': 'POST',
+                                    'inputs': [{'name': 'q', 'type': 'text', 'value': 'shibo'}]}
+    login = html_form_data(PAGE, 'login')
+    assert login['method'] == 'GET'
+    assert [field['type'] for field in login['inputs']] == ['text', 'password']
+    assert html_form_data(PAGE, 'missing') is None
+    assert html_form_data('<p>no forms</p>') == []
+    # Unclosed forms used to make the DOTALL regex rescan the rest of the page
+    page = '<form id="f"><input name="a">text ' * 2000
+    assert html_form_data(page, 'f') == {'action': '', 'method': 'GET',
+                                         'inputs': [{'name': 'a', 'type': 'text', 'value': ''}]}
+
+def test_scanner_result():
+    """Test that the scanner collects tags, text, links, images and forms in one pass"""
+    result = html_scanner().feed(PAGE).close()
+    assert '!-- <a href="/commented"> --' in result['tags']
+    assert result['text'].startswith('Hello first Fish & chips one two bold')
+    assert result['links'] == ['/a?x=1&y=2']
+    assert result['images'] == ['/fish.png']
+    assert [form['id'] for form in result['forms']] == ['search', 'login']
+    assert len(html_scanner().feed('<form><input name="a">text ' * 2000).close()['forms']) == 2000
+
+def test_html_select():
+    """Test tag, id, class and attribute selectors with both combinators"""
+    assert [li['text'] for li in html_select(PAGE, 'ul.nav > li')] == ['one', 'two bold']
+    assert [p['text'] for p in html_select(PAGE, '#main p')] == ['Hello first', 'Fish & chips']
+    matches = html_select(PAGE, ['img[alt=fish]', 'div a[href]', 'body > li', 'input[type]'])
+    assert matches['img[alt=fish]'][0]['attrs']['src'] == '/fish.png'
+    assert matches['div a[href]'][0]['text'] == 'first'
+    assert matches['body > li'] == []
+    assert [field['attrs'].get('name') for field in matches['input[type]']] == [None, 'pass']
+    for selector in ('', '> a', 'a >', 'a$b'):
+        try:
+            html_select(PAGE, selector)
+            assert False, f"expected a ValidationError for {selector!r}"
+        except ValidationError:
+            pass
+
+def test_scanner_chunks():
+    """Test that feeding bytes in any chunk size matches a single feed"""
+    expected = html_scanner(['li', 'p']).feed(PAGE).close()
+    data = PAGE.encode('utf-8')
+    for size in (1, 2, 5, 64):
+        scanner = html_scanner(['li', 'p'])
+        for start in range(0, len(data), size):
+            scanner.feed(data[start:start + size])
+        assert scanner.close() == expected, size
+
+def test_scanner_script():
+    """Test feeding a scanner from a script"""
+    interpreter = Interpreter()
+    interpreter.env['chunks'] = ['<ul><li>a</l', 'i><li>b &a', 'mp; c</ul>']
+    interpreter.eval(get_ast('\n'.join([
+        'var scanner = web.html_scanner("li", false, false)',
+        'for (chunk in chunks) {',
+        '    scanner.feed(chunk)',
+        '}',
+        'var items = []',
+        'for (item in scanner.close()["matches"]["li"]) {',
+        '    append(items, item["text"])',
+        '}',
+    ])))
+    assert interpreter.env['items'] == ['a', 'b & c']
+
+if __name__ == "__main__":
+    test_html_parse()
+    test_html_form_data()
+    test_scanner_result()
+    test_html_select()
+    test_scanner_chunks()
+    test_scanner_script()
+    print("All HTML tests passed!")
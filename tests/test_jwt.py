@@ -0,0 +1,130 @@
+"""Test JWT signing and verification"""
+import sys
+import os
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import Interpreter, get_ast, ValidationError, jwt_signer, jwt_encode, jwt_decode
+
+def segment(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def test_sign_and_verify():
+    """Test compact URL-safe tokens that other HS256 implementations accept"""
+    signer = jwt_signer('secret')
+    token = signer.sign({'sub': 'ab?>', 'admin': True})
+    assert '+' not in token and '/' not in token and '=' not in token
+    header, payload, signature = token.split('.')
+    expected = hmac.new(b'secret', f'{header}.{payload}'.encode(), hashlib.sha256).digest()
+    assert signature == segment(expected)
+    assert json.loads(base64.urlsafe_b64decode(header + '==')) == {'alg': 'HS256', 'typ': 'JWT'}
+    assert signer.verify(token) == {'sub': 'ab?>', 'admin': True}
+    # A header with different key order from another issuer still verifies
+    other = segment(b'{"typ":"JWT","alg":"HS256"}') + '.' + payload
+    other += '.' + segment(hmac.new(b'secret', other.encode(), hashlib.sha256).digest())
+    assert signer.verify(other) == {'sub': 'ab?>', 'admin': True}
+    assert jwt_decode(jwt_encode({'n': 1}, 'k', 'HS512'), 'k', 'HS512') == {'n': 1}
+
+def test_rejected_tokens():
+    """Test tampered, malformed, unsigned and wrong-key tokens"""
+    signer = jwt_signer('secret')
+    token = signer.sign({'sub': 1})
+    header, payload, signature = token.split('.')
+    forged = segment(b'{"sub":2}')
+    unsigned = segment(b'{"alg":"none","typ":"JWT"}') + '.' + payload + '.'
+    for bad in (header + '.' + forged + '.' + signature, token[:-2], token + '.x', unsigned,
+                'not a token', '', None, 42, jwt_signer('other').sign({'sub': 1})):
+        assert signer.verify(bad) is None, bad
+    for bad in (['a', 'b'], {'token': token}, token.encode('ascii')):
+        assert signer.verify(bad) is None, bad
+        assert signer.decode(bad) is None, bad
+    assert signer.verify_many([token, [token]]) == [{'sub': 1}, None]
+    try:
+        jwt_signer('secret', 'RS256')
+        assert False, "expected a ValidationError"
+    except ValidationError:
+        pass
+
+def test_time_claims():
+    """Test exp and nbf checks, with leeway"""
+    signer = jwt_signer('secret', leeway=5)
+    now = time.time()
+    assert signer.verify(signer.sign({'exp': now + 60})) is not None
+    assert signer.verify(signer.sign({'exp': now - 1})) is not None
+    assert signer.verify(signer.sign({'exp': now - 10})) is None
+    assert signer.verify(signer.sign({'nbf': now + 3})) is not None
+    assert signer.verify(signer.sign({'nbf': now + 30})) is None
+    assert signer.verify(signer.sign({'exp': 'soon'})) is None
+    token = signer.sign({'exp': now + 60})
+    assert signer.verify(token, now + 120) is None
+
+def test_verify_many():
+    """Test batch verification and that cached payloads are not shared"""
+    signer = jwt_signer('secret')
+    tokens = [signer.sign({'id': i}) for i in range(5)] + ['bogus']
+    first = signer.verify_many(tokens)
+    assert first == [{'id': i} for i in range(5)] + [None]
+    first[0]['id'] = 'changed'
+    assert signer.verify_many(tokens) == [{'id': i} for i in range(5)] + [None]
+    assert len(signer.verified) == 5
+
+def test_cached_payload_isolated():
+    """Test that mutating nested claims or list payloads cannot touch the cache"""
+    signer = jwt_signer('secret')
+    token = signer.sign({'user': {'roles': ['reader']}})
+    claims = signer.verify(token)
+    claims['user']['roles'].append('admin')
+    claims['user']['id'] = 0
+    assert signer.verify(token) == {'user': {'roles': ['reader']}}
+    listed = signer.sign(['reader'])
+    signer.verify(listed).append('admin')
+    assert signer.verify(listed) == ['reader']
+
+def test_cache_threads():
+    """Test concurrent verification while the cache keeps evicting"""
+    signer = jwt_signer('secret', cache_size=4)
+    tokens = [signer.sign({'id': i}) for i in range(32)]
+    errors = []
+    def worker():
+        try:
+            for _ in range(50):
+                assert signer.verify_many(tokens) == [{'id': i} for i in range(32)]
+        except Exception as error:
+            errors.append(error)
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    assert len(signer.verified) == 4
+
+def test_jwt_script():
+    """Test web.jwt_signer from a script"""
+    interpreter = Interpreter()
+    interpreter.env['claims'] = {'user_id': 123}
+    interpreter.eval(get_ast('\n'.join([
+        'var signer = web.jwt_signer("secret_key")',
+        'var token = signer.sign(claims)',
+        'var decoded = signer.verify(token)',
+        'var batch = signer.verify_many([token, token + "x"])',
+        'var legacy = web.jwt_decode(token, "secret_key")',
+    ])))
+    assert interpreter.env['decoded'] == {'user_id': 123}
+    assert interpreter.env['batch'] == [{'user_id': 123}, None]
+    assert interpreter.env['legacy'] == {'user_id': 123}
+
+if __name__ == "__main__":
+    test_sign_and_verify()
+    test_rejected_tokens()
+    test_time_claims()
+    test_verify_many()
+    test_cached_payload_isolated()
+    test_cache_threads()
+    test_jwt_script()
+    print("All JWT tests passed!")
@@ -0,0 +1,337 @@
+"""Test the pooled HTTP client against a local server"""
+import sys
+import os
+import gzip
+import hashlib
+import tempfile
+import threading
+import time
+import urllib.error
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import (
+    HTTPSession, NetworkError, ValidationError, Interpreter, get_ast, fetch_all, download_file, http_stream
+)
+
+BLOB = bytes(range(256)) * 1200
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    connections = set()
+    flaky_hits = 0
+    drops = 0
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        if self.path == '/gzip':
+            self.reply(gzip.compress(b'squeezed'), [('Content-Encoding', 'gzip')])
+        elif self.path == '/deflate':
+            self.reply(zlib.compress(b'deflated'), [('Content-Encoding', 'deflate')])
+        elif self.path == '/flaky':
+            Handler.flaky_hits += 1
+            if Handler.flaky_hits < 3:
+                self.reply(b'busy', status=503)
+            else:
+                self.reply(b'recovered')
+        elif self.path == '/moved':
+            self.reply(b'', [('Location', '/target')], status=302)
+        elif self.path.startswith('/slow/'):
+            time.sleep(0.1)
+            self.reply(self.path.encode('utf-8'))
+        elif self.path == '/blob':
+            self.send_blob()
+        elif self.path == '/lines':
+            text = ''.join(f'line {i}\r\n' for i in range(1000)).encode('utf-8')
+            self.reply(gzip.compress(text), [('Content-Encoding', 'gzip'), ('Content-Type', 'text/plain; charset=utf-8')])
+        elif self.path == '/missing':
+            self.reply(b'nope', status=404)
+        elif self.path == '/hangup':
+            # Keep-alive response, but the server closes the socket after it
+            self.reply(b'bye')
+            self.close_connection = True
+        else:
+            self.reply(self.path.encode('utf-8'))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if self.path == '/drop':
+            # Take the request, then hang up without answering
+            Handler.drops += 1
+            self.close_connection = True
+            return
+        self.reply(body)
+
+    def send_blob(self):
+        requested = self.headers.get('Range')
+        if not requested:
+            self.reply(BLOB)
+            return
+        start = int(requested.split('=')[1].split('-')[0])
+        if start >= len(BLOB):
+            self.reply(b'', [('Content-Range', f'bytes */{len(BLOB)}')], status=416)
+            return
+        content_range = f'bytes {start}-{len(BLOB) - 1}/{len(BLOB)}'
+        self.reply(BLOB[start:], [('Content-Range', content_range)], status=206)
+
+    def reply(self, body, headers=(), status=200):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """Records what reaches the proxy instead of forwarding it"""
+    protocol_version = 'HTTP/1.1'
+    seen = []
+
+    def do_GET(self):
+        ProxyHandler.seen.append(('GET', self.path, self.headers.get('Proxy-Authorization')))
+        self.reply(b'proxied', 200)
+
+    def do_CONNECT(self):
+        ProxyHandler.seen.append(('CONNECT', self.path, self.headers.get('Proxy-Authorization')))
+        self.reply(b'', 502)
+        self.close_connection = True
+
+    def reply(self, body, status):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(handler=Handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+def test_keep_alive_reuse():
+    """Test that sequential requests share one pooled connection"""
+    server, base = start_server()
+    Handler.connections.clear()
+    try:
+        with HTTPSession(pool_size=2) as session:
+            texts = [session.get(f'{base}/item/{i}')['text'] for i in range(50)]
+            assert texts == [f'/item/{i}' for i in range(50)]
+            stats = session.stats()
+            assert stats['connections_opened'] == 1
+            assert stats['connections_reused'] == 49
+            assert len(Handler.connections) == 1
+            assert session.post(f'{base}/echo', {'a': '1'})['text'] == 'a=1'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_decoding_retries_and_redirects():
+    """Test gzip/deflate decoding, retry with backoff, redirects and errors"""
+    server, base = start_server()
+    Handler.flaky_hits = 0
+    try:
+        session = HTTPSession(retries=3, backoff=0.01)
+        assert session.get(f'{base}/gzip')['text'] == 'squeezed'
+        assert session.get(f'{base}/deflate')['text'] == 'deflated'
+        assert session.get(f'{base}/flaky')['text'] == 'recovered'
+        assert session.stats()['retries'] == 2
+        moved = session.get(f'{base}/moved')
+        assert moved['text'] == '/target' and moved['url'] == f'{base}/target'
+        try:
+            session.get(f'{base}/missing')
+            assert False, "expected a NetworkError"
+        except NetworkError as e:
+            assert '404' in str(e)
+            assert isinstance(e, urllib.error.HTTPError)
+            assert e.status == e.code == 404 and e.read() == b'nope'
+        session.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_stale_connections():
+    """Test that closed pooled connections are dropped and POST is not resent"""
+    server, base = start_server()
+    Handler.drops = 0
+    try:
+        with HTTPSession() as session:
+            assert session.get(f'{base}/hangup')['text'] == 'bye'
+            time.sleep(0.05)
+            assert session.post(f'{base}/echo', 'again')['text'] == 'again'
+            stats = session.stats()
+            assert stats['connections_opened'] == 2 and stats['connections_reused'] == 0
+            try:
+                session.post(f'{base}/drop', 'once')
+                assert False, "expected a NetworkError"
+            except NetworkError:
+                pass
+            assert Handler.drops == 1
+            assert session.stats()['connections_reused'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_proxies():
+    """Test HTTP(S)_PROXY and NO_PROXY from the environment, and explicit proxies"""
+    server, base = start_server()
+    proxy, proxy_base = start_server(ProxyHandler)
+    ProxyHandler.seen = []
+    port = server.server_address[1]
+    saved = dict(os.environ)
+    try:
+        for name in ('http_proxy', 'https_proxy', 'no_proxy', 'HTTP_PROXY', 'HTTPS_PROXY', 'NO_PROXY'):
+            os.environ.pop(name, None)
+        credentials = proxy_base.replace('http://', 'http://user:p%40ss@')
+        os.environ['http_proxy'] = credentials
+        os.environ['https_proxy'] = credentials
+        os.environ['no_proxy'] = 'localhost'
+        with HTTPSession(retries=0) as session:
+            assert session.get(f'{base}/item')['text'] == 'proxied'
+            assert session.get(f'http://localhost:{port}/item')['text'] == '/item'
+            try:
+                session.get('https://secure.invalid/item')
+                assert False, "expected a NetworkError"
+            except NetworkError:
+                pass
+        authorization = 'Basic dXNlcjpwQHNz'
+        assert ProxyHandler.seen == [
+            ('GET', f'{base}/item', authorization),
+            ('CONNECT', 'secure.invalid:443', authorization),
+        ]
+        with HTTPSession(proxies={}) as session:
+            assert session.get(f'{base}/item')['text'] == '/item'
+        with HTTPSession(proxies={'http': proxy_base.replace('http://', '')}) as session:
+            assert session.get(f'http://localhost:{port}/item')['text'] == 'proxied'
+        assert ProxyHandler.seen[-1] == ('GET', f'http://localhost:{port}/item', None)
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+        for running in (server, proxy):
+            running.shutdown()
+            running.server_close()
+
+def test_net_namespace():
+    """Test net.session and the pooled http_* builtins from a script"""
+    server, base = start_server()
+    try:
+        interpreter = Interpreter()
+        interpreter.env['base'] = base
+        interpreter.eval(get_ast('\n'.join([
+            'var session = net.session(4, 5)',
+            'var first = session.get(base + "/a")["text"]',
+            'var second = net.http_get(base + "/b")["status"]',
+            'var stats = session.stats()',
+        ])))
+        assert interpreter.env['first'] == '/a'
+        assert interpreter.env['second'] == 200
+        assert interpreter.env['stats']['requests'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_fetch_all():
+    """Test bounded concurrent fetching, input ordering and the callback"""
+    server, base = start_server()
+    try:
+        urls = [f'{base}/slow/{i}' for i in range(8)] + [f'{base}/missing']
+        seen = []
+        started = time.perf_counter()
+        results = fetch_all(None, urls, 4, 5, seen.append)
+        elapsed = time.perf_counter() - started
+        assert [r['url'] for r in results] == urls
+        assert [r['text'] for r in results[:8]] == [f'/slow/{i}' for i in range(8)]
+        assert all(r['ok'] and r['status'] == 200 and r['elapsed_ms'] >= 100 for r in results[:8])
+        assert not results[8]['ok'] and results[8]['status'] == 404
+        assert len(seen) == 9
+        # Eight 100ms requests four at a time take about two rounds
+        assert 0.2 <= elapsed < 0.6
+        with HTTPSession(retries=0) as session:
+            timed_out = fetch_all(None, urls[:2], 2, 0.02, session=session)
+            assert not any(r['ok'] for r in timed_out)
+            assert all('timed out' in r['error'] and r['elapsed_ms'] < 90 for r in timed_out)
+            # The session's own timeout still holds for its other requests
+            assert session.get(urls[0])['text'] == '/slow/0'
+        interpreter = Interpreter()
+        interpreter.env['urls'] = urls[:3]
+        interpreter.eval(get_ast('\n'.join([
+            'var done = []',
+            'func record(result) {',
+            '    append(done, result["status"])',
+            '}',
+            'var results = net.fetch_all(urls, 3, 5, record)',
+        ])))
+        assert interpreter.env['done'] == [200, 200, 200]
+        assert [r['text'] for r in interpreter.env['results']] == ['/slow/0', '/slow/1', '/slow/2']
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_streaming_download_and_resume():
+    """Test chunked downloads, progress, checksums and Range resume"""
+    server, base = start_server()
+    expected = hashlib.sha256(BLOB).hexdigest()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            target = os.path.join(tmp, 'blob.bin')
+            progress = []
+            result = download_file(None, f'{base}/blob', target, None, 50000, False,
+                                   lambda done, total: progress.append((done, total)), expected)
+            assert result['sha256'] == expected and result['bytes'] == len(BLOB)
+            assert len(progress) == 7 and progress[-1] == (len(BLOB), len(BLOB))
+            with open(target, 'r+b') as f:
+                f.truncate(100000)
+            resumed = download_file(None, f'{base}/blob', target, None, 65536, True)
+            assert resumed['resumed'] and resumed['downloaded'] == len(BLOB) - 100000
+            assert resumed['sha256'] == expected
+            with open(target, 'rb') as f:
+                assert f.read() == BLOB
+            complete = download_file(None, f'{base}/blob', target, None, 65536, True)
+            assert complete['downloaded'] == 0 and complete['sha256'] == expected
+            try:
+                download_file(None, f'{base}/blob', target, None, 65536, False, None, '0' * 64)
+                assert False, "expected a checksum mismatch"
+            except ValidationError:
+                pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_stream():
+    """Test iterating a response as chunks and as decoded lines"""
+    server, base = start_server()
+    try:
+        chunks = list(http_stream(f'{base}/blob', False, 10000))
+        assert b''.join(chunks) == BLOB and max(len(c) for c in chunks) == 10000
+        lines = list(http_stream(f'{base}/lines', True))
+        assert lines == [f'line {i}' for i in range(1000)]
+        interpreter = Interpreter()
+        interpreter.env['base'] = base
+        interpreter.eval(get_ast('\n'.join([
+            'var count = 0',
+            'for (line in net.stream(base + "/lines", true)) {',
+            '    count = count + 1',
+            '}',
+        ])))
+        assert interpreter.env['count'] == 1000
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    test_keep_alive_reuse()
+    test_decoding_retries_and_redirects()
+    test_stale_connections()
+    test_proxies()
+    test_net_namespace()
+    test_fetch_all()
+    test_streaming_download_and_resume()
+    test_stream()
+    print("All net tests passed!")
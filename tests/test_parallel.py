@@ -0,0 +1,67 @@
+"""Test parallel_map across worker processes"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import Interpreter, get_ast, parallel_map, _parallel_pools, _shutdown_parallel_pools
+
+def run(code):
+    interpreter = Interpreter()
+    interpreter.eval(get_ast(code))
+    return interpreter.env
+
+def test_parallel_map_script_function():
+    """Test that script functions and the globals they use reach the workers"""
+    env = run('\n'.join([
+        'var offset = 100',
+        'func shift(x) {',
+        '    return x + offset',
+        '}',
+        'func work(x) {',
+        '    return shift(x * x)',
+        '}',
+        'var results = parallel_map(work, range(0, 20), 2, 3)',
+    ]))
+    assert env['results'] == [x * x + 100 for x in range(20)]
+
+def test_parallel_map_builtin_function():
+    """Test that picklable builtins run in workers and lambdas run in-process"""
+    env = run('\n'.join([
+        'var strings = parallel_map(str, [1, 2, 3], 2)',
+        'var uppers = parallel_map(upper, ["a", "b"], 2)',
+    ]))
+    assert env['strings'] == ['1', '2', '3']
+    assert env['uppers'] == ['A', 'B']
+
+def test_parallel_map_without_interpreter():
+    """Test script functions from Python code, in-process and in workers"""
+    label = run('\n'.join([
+        'func label(x) {',
+        '    return str(x * x) + "!"',
+        '}',
+    ]))['label']
+    assert parallel_map(None, label, [3]) == ['9!']
+    assert parallel_map(None, label, [1, 2], workers=1) == ['1!', '4!']
+    assert parallel_map(None, label, range(5), workers=2) == ['0!', '1!', '4!', '9!', '16!']
+
+def test_parallel_pools_shut_down():
+    """Test that worker pools are shut down at exit and recreated on demand"""
+    assert parallel_map(None, str, [1, 2], workers=2) == ['1', '2']
+    pool = _parallel_pools[2]
+    _shutdown_parallel_pools()
+    assert not _parallel_pools
+    try:
+        pool.submit(str, 1)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("pool still accepts work after shutdown")
+    assert parallel_map(None, str, [3, 4], workers=2) == ['3', '4']
+    assert _parallel_pools[2] is not pool
+
+if __name__ == "__main__":
+    test_parallel_map_script_function()
+    test_parallel_map_builtin_function()
+    test_parallel_map_without_interpreter()
+    test_parallel_pools_shut_down()
+    print("All parallel tests passed!")
@@ -0,0 +1,99 @@
+"""Test the compiled template engine behind web.render_template"""
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import Interpreter, get_ast, compile_template, render_template
+
+PAGE = '\n'.join([
+    '<h1>{{ title }}</h1>',
+    '<ul>{% for user in users %}',
+    '<li>{{ user.name }}{% if user.admin %} (admin){% elif user.name == "bob" %} (bob){% else %}{% endif %}</li>',
+    '{% endfor %}</ul>',
+    '<p>{{ len(users) * 10 }} {{ note|safe }}{{ missing }}</p>',
+])
+
+def test_render_template():
+    """Test expressions, loops, conditionals and auto-escaping"""
+    users = [{'name': '<Ann>', 'admin': True}, {'name': 'bob', 'admin': False}, {'name': 'cy', 'admin': False}]
+    output = render_template(None, PAGE, {'title': 'A & B', 'users': users, 'note': '<b>hi</b>'})
+    assert output == '\n'.join([
+        '<h1>A &amp; B</h1>',
+        '<ul>',
+        '<li>&lt;Ann&gt; (admin)</li>',
+        '',
+        '<li>bob (bob)</li>',
+        '',
+        '<li>cy</li>',
+        '</ul>',
+        '<p>30 <b>hi</b></p>',
+    ])
+
+def test_templates_compile_once():
+    """Test that identical sources share one compiled template"""
+    template = compile_template('Hello {{ name }}')
+    assert compile_template('Hello {{ name }}') is template
+    assert template.render({'name': 'x'}) == 'Hello x'
+    assert template.render({'name': 'y'}) == 'Hello y'
+
+def test_template_errors():
+    """Test that malformed templates report the offending line"""
+    for source, message in (('{% for x %}', "expected 'for name in expr'"),
+                            ('a\n{% if a %}', "line 2: 'if' is never closed"),
+                            ('{% endfor %}', "unexpected 'endfor'"),
+                            ('{% include x %}', "unknown tag"),
+                            ('{{ a b }}', "unexpected 'b'")):
+        try:
+            compile_template(source)
+            assert False, f"expected a SyntaxError for {source!r}"
+        except SyntaxError as e:
+            assert message in str(e), str(e)
+
+def test_render_template_script():
+    """Test web.render_template from a script, calling script functions"""
+    interpreter = Interpreter()
+    interpreter.env['context'] = {'items': [1, 2, 3]}
+    interpreter.eval(get_ast('\n'.join([
+        'func double(n) {',
+        '    return n * 2',
+        '}',
+        'var html = web.render_template("{% for i in items %}{{ double(i) }},{% endfor %}", context)',
+    ])))
+    assert interpreter.env['html'] == '2,4,6,'
+
+def test_interpreted_expressions():
+    """Test that expressions the compiler hands back to the interpreter see globals"""
+    interpreter = Interpreter()
+    interpreter.eval(get_ast('var counter = 5'))
+    html = render_template(interpreter, '{{ ~len(items) }} {{ counter++ }}{% for i in items %} {{ ++counter }}{% endfor %}',
+                           {'items': [1, 2]})
+    assert html == '-3 5 7 8'
+    # Assignments land in the render's context, not the interpreter's globals
+    assert interpreter.env['counter'] == 5
+
+def test_template_cache_threads():
+    """Test compiling and rendering from many threads while the cache evicts"""
+    errors = []
+    def worker(offset):
+        try:
+            for i in range(400):
+                n = (i * 7 + offset) % 300
+                assert render_template(None, '{{ n }}/' + str(n), {'n': n}) == f'{n}/{n}'
+        except Exception as error:
+            errors.append(error)
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+
+if __name__ == "__main__":
+    test_render_template()
+    test_templates_compile_once()
+    test_template_errors()
+    test_render_template_script()
+    test_interpreted_expressions()
+    test_template_cache_threads()
+    print("All template tests passed!")
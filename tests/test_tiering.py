@@ -0,0 +1,78 @@
+"""Test tiered execution of hot ShiboScript functions"""
+import sys
+import os
+import gc
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import Interpreter, get_ast, jit_stats, set_jit_threshold, DEFAULT_JIT_THRESHOLD
+
+FIB = '\n'.join([
+    'func fib(n) {',
+    '    if (n < 2) {',
+    '        return n',
+    '    }',
+    '    return fib(n - 1) + fib(n - 2)',
+    '}',
+    'var result = fib(15)',
+])
+
+def run(code, threshold):
+    """Run code with the given JIT threshold and return the interpreter"""
+    set_jit_threshold(threshold)
+    try:
+        interpreter = Interpreter()
+        interpreter.eval(get_ast(code))
+        return interpreter
+    finally:
+        set_jit_threshold(DEFAULT_JIT_THRESHOLD)
+
+def compiled_names():
+    return [entry['name'] for entry in jit_stats()['compiled']]
+
+def test_hot_function_is_compiled():
+    """Test that a hot function tiers up and still computes the same result"""
+    cold = run(FIB, 0)
+    assert cold.env['result'] == 610
+    assert 'fib' not in compiled_names()
+    hot = run(FIB, 10)
+    assert hot.env['result'] == 610
+    assert 'fib' in compiled_names()
+
+def test_loop_back_edges_count():
+    """Test that loop iterations make a function hot and loops still behave"""
+    code = '\n'.join([
+        'func count_to(limit) {',
+        '    var total = 0',
+        '    for (var i = 0;; i < limit; i++) {',
+        '        total = total + i',
+        '    }',
+        '    var parts = ""',
+        '    for (word in ["a", "b"]) {',
+        '        parts = parts + word',
+        '    }',
+        '    return parts + total',
+        '}',
+        'var first = count_to(50)',
+        'var second = count_to(50)',
+    ])
+    interpreter = run(code, 20)
+    assert interpreter.env['first'] == interpreter.env['second'] == 'ab1225'
+    assert 'count_to' in compiled_names()
+
+def test_profiles_belong_to_interpreter():
+    """Test that each interpreter profiles its own functions and drops them with it"""
+    gc.collect()
+    baseline = jit_stats()['profiled']
+    interpreters = [run(FIB, 10) for _ in range(3)]
+    assert all(len(interpreter.profiles) == 1 for interpreter in interpreters)
+    assert jit_stats()['profiled'] == baseline + 3
+    assert compiled_names().count('fib') >= 3
+    del interpreters
+    gc.collect()
+    assert jit_stats()['profiled'] == baseline
+
+if __name__ == "__main__":
+    test_hot_function_is_compiled()
+    test_loop_back_edges_count()
+    test_profiles_belong_to_interpreter()
+    print("All tiering tests passed!")
@@ -0,0 +1,230 @@
+"""Test the web.serve HTTP runtime"""
+import sys
+import os
+import gc
+import logging
+import socket
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.core import Interpreter, get_ast, HTTPSession, NetworkError, set_jit_threshold, DEFAULT_JIT_THRESHOLD
+from shiboscript.webserver import RouteTrie, WebServer
+
+APP = '\n'.join([
+    'var server = web.create_web_server(0)',
+    'func show_user(request) {',
+    '    return "user " + request["params"]["id"] + " " + str(request["query"]["tab"])',
+    '}',
+    'func create_user(request) {',
+    '    var response = web.create_api_response("success", request["json"])',
+    '    return response',
+    '}',
+    'func show_file(request) {',
+    '    return request["params"]["path"]',
+    '}',
+    'async func slow(request) {',
+    '    await sleep_async(0.01)',
+    '    return "slept"',
+    '}',
+    'func stamp(request, next) {',
+    '    var response = next(request)',
+    '    response["headers"]["X-Served-By"] = "shibo"',
+    '    return response',
+    '}',
+    'web.add_route(server, "/users/:id", "GET", show_user)',
+    'web.add_route(server, "/users", "POST", create_user)',
+    'web.add_route(server, "/files/*path", "GET", show_file)',
+    'web.add_route(server, "/slow", "GET", slow)',
+    'web.add_middleware(server, stamp)',
+])
+
+def test_route_trie():
+    """Test static segments, parameters, wildcards and allowed methods"""
+    routes = RouteTrie()
+    routes.add('GET', '/users/:id', 'show').add('GET', '/users/me', 'me')
+    routes.add('DELETE', '/users/:id', 'delete').add('GET', '/assets/*rest', 'asset')
+    assert routes.match('GET', '/users/me') == ('me', {}, ('GET',))
+    assert routes.match('GET', '/users/7') == ('show', {'id': '7'}, ('GET', 'DELETE'))
+    assert routes.match('HEAD', '/users/7')[0] == 'show'
+    assert routes.match('POST', '/users/7')[0] is None
+    assert routes.match('GET', '/assets/css/site.css') == ('asset', {'rest': 'css/site.css'}, ('GET',))
+    assert routes.match('GET', '/nowhere') == (None, {}, ())
+
+def check_server(model):
+    interpreter = Interpreter()
+    with tempfile.TemporaryDirectory() as static:
+        with open(os.path.join(static, 'site.css'), 'w') as f:
+            f.write('body { color: red }')
+        interpreter.eval(get_ast(APP))
+        config = interpreter.env['server']
+        config['static_files']['/static'] = static
+        server = WebServer(config, interpreter, model=model)
+        base = f'http://127.0.0.1:{server.start()}'
+        try:
+            with HTTPSession(retries=0) as session:
+                user = session.get(f'{base}/users/42?tab=posts')
+                assert user['text'] == 'user 42 posts'
+                assert user['headers']['X-Served-By'] == 'shibo'
+                created = session.post(f'{base}/users', '{"name": "ada"}', {'Content-Type': 'application/json'})
+                assert created['text'] == '{"status": "success", "data": {"name": "ada"}}'
+                assert session.get(f'{base}/files/a/b.txt')['text'] == 'a/b.txt'
+                assert session.get(f'{base}/slow')['text'] == 'slept'
+                css = session.get(f'{base}/static/site.css')
+                assert css['text'] == 'body { color: red }'
+                assert css['headers']['Content-Type'] == 'text/css'
+                cached = session.get(f'{base}/static/site.css', {'If-None-Match': css['headers']['ETag']})
+                assert cached['status'] == 304 and cached['text'] == ''
+                for path, status in (('/missing', 404), ('/static/../secret', 403), ('/static/nope.css', 404)):
+                    try:
+                        session.get(base + path)
+                        assert False, f"expected {status} for {path}"
+                    except NetworkError as e:
+                        assert e.status == status, (path, e.status)
+                try:
+                    session.delete(f'{base}/users/1')
+                    assert False, "expected 405"
+                except NetworkError as e:
+                    assert e.status == 405
+                # Every request above went over one keep-alive connection
+                assert session.stats()['connections_opened'] == 1
+        finally:
+            server.stop()
+
+def test_handlers_run_concurrently():
+    """Test that slow script handlers overlap on either model"""
+    # Compile handlers on their first call, so the tiered path is covered too
+    set_jit_threshold(1)
+    try:
+        check_handlers_run_concurrently()
+    finally:
+        set_jit_threshold(DEFAULT_JIT_THRESHOLD)
+
+def check_handlers_run_concurrently():
+    for model in WebServer.MODELS:
+        interpreter = Interpreter()
+        interpreter.eval(get_ast('\n'.join([
+            'var server = web.create_web_server(0)',
+            'func busy(request) {',
+            '    time.sleep(0.3)',
+            '    return "ok"',
+            '}',
+            'web.add_route(server, "/busy", "GET", busy)',
+        ])))
+        server = WebServer(interpreter.env['server'], interpreter, model=model, workers=4)
+        base = f'http://127.0.0.1:{server.start()}'
+        texts = []
+        try:
+            clients = [threading.Thread(target=lambda: texts.append(HTTPSession(retries=0).get(base + '/busy')['text']))
+                       for _ in range(4)]
+            started = time.perf_counter()
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            server.stop()
+        assert texts == ['ok'] * 4, model
+        assert elapsed < 0.9, (model, elapsed)
+
+def exchange(port, request):
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+        client.sendall(request)
+        response = b''
+        while True:
+            data = client.recv(4096)
+            if not data:
+                return response
+            response += data
+
+def test_chunked_requests():
+    """Test chunked request bodies, and rejecting bad chunk sizes, on both models"""
+    head = b'POST /users HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+    head += b'Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n'
+    for model in WebServer.MODELS:
+        interpreter = Interpreter()
+        interpreter.eval(get_ast(APP))
+        server = WebServer(interpreter.env['server'], interpreter, model=model)
+        port = server.start()
+        try:
+            response = exchange(port, head + b'5;ext=1\r\n{"nam\r\nb\r\ne": "ada"}\r\n0\r\n\r\n')
+            assert response.startswith(b'HTTP/1.1 200'), (model, response)
+            assert response.endswith(b'{"status": "success", "data": {"name": "ada"}}'), (model, response)
+            assert exchange(port, head + b'zz\r\n').startswith(b'HTTP/1.1 400'), model
+        finally:
+            server.stop()
+
+def test_header_names_and_lengths():
+    """Test case-insensitive request headers and rejecting bad Content-Length"""
+    for model in WebServer.MODELS:
+        interpreter = Interpreter()
+        interpreter.eval(get_ast(APP))
+        config = interpreter.env['server']
+        with tempfile.TemporaryDirectory() as static:
+            with open(os.path.join(static, 'site.css'), 'w') as f:
+                f.write('body { color: red }')
+            config['static_files']['/static'] = static
+            server = WebServer(config, interpreter, model=model)
+            port = server.start()
+            try:
+                body = b'{"name": "ada"}'
+                response = exchange(port, b'POST /users HTTP/1.1\r\nhost: localhost\r\ncontent-type: application/json\r\n'
+                                    b'content-length: 15\r\nconnection: close\r\n\r\n' + body)
+                assert response.endswith(b'{"status": "success", "data": {"name": "ada"}}'), (model, response)
+                css = exchange(port, b'GET /static/site.css HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n')
+                etag = [line.split(b': ', 1)[1] for line in css.split(b'\r\n') if line.startswith(b'ETag: ')][0]
+                revalidated = exchange(port, b'GET /static/site.css HTTP/1.1\r\nhost: localhost\r\nif-none-match: ' + etag +
+                                       b'\r\nconnection: close\r\n\r\n')
+                assert revalidated.startswith(b'HTTP/1.1 304'), (model, revalidated)
+                for length in (b'-5', b'abc'):
+                    response = exchange(port, b'POST /users HTTP/1.1\r\nHost: localhost\r\nContent-Length: ' + length +
+                                        b'\r\nConnection: close\r\n\r\n')
+                    assert response.startswith(b'HTTP/1.1 400'), (model, length, response)
+            finally:
+                server.stop()
+
+def test_stop_closes_connections():
+    """Test that stop() closes idle keep-alive connections on the asyncio model"""
+    interpreter = Interpreter()
+    interpreter.eval(get_ast(APP))
+    server = WebServer(interpreter.env['server'], interpreter, model='asyncio')
+    port = server.start()
+    unraisable = []
+    hook, sys.unraisablehook = sys.unraisablehook, unraisable.append
+    logged = logging.Handler()
+    logged.emit = unraisable.append
+    logging.getLogger('asyncio').addHandler(logged)
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+            client.sendall(b'GET /files/x HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            response = b''
+            while not response.endswith(b'\r\n\r\nx'):
+                response += client.recv(4096)
+            assert response.startswith(b'HTTP/1.1 200')
+            server.stop()
+            assert client.recv(4096) == b''
+        gc.collect()
+    finally:
+        sys.unraisablehook = hook
+        logging.getLogger('asyncio').removeHandler(logged)
+    assert unraisable == []
+
+def test_threaded_server():
+    """Test routing, middleware, static files and keep-alive on threads"""
+    check_server('threaded')
+
+def test_asyncio_server():
+    """Test the same application on the asyncio worker model"""
+    check_server('asyncio')
+
+if __name__ == "__main__":
+    test_route_trie()
+    test_handlers_run_concurrently()
+    test_threaded_server()
+    test_asyncio_server()
+    test_chunked_requests()
+    test_header_names_and_lengths()
+    test_stop_closes_connections()
+    print("All web server tests passed!")
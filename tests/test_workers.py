@@ -0,0 +1,60 @@
+"""Test the pre-forked interpreter worker pool"""
+import sys
+import os
+import tempfile
+import time
+import multiprocessing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from shiboscript.workers import WorkerPool, submit_job
+
+def test_worker_pool_runs_isolated_jobs():
+    """Test that jobs run in a fresh environment and report output and timing"""
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, 'workers.sock')
+        pool = WorkerPool(socket_path, workers=2)
+        server = multiprocessing.Process(target=pool.serve)
+        server.start()
+        try:
+            for _ in range(50):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(0.1)
+            first = submit_job('var leaked = 1\nmath.pi = 3\nprint("hello")\n6 * 7', socket_path=socket_path, job_id=1)
+            assert first['ok'] and first['id'] == 1
+            assert first['output'] == 'hello\n'
+            assert first['result'] == 42
+            assert 'total_ms' in first['timing']
+            second = submit_job('print(leaked)\nprint(math.pi)', socket_path=socket_path)
+            assert second['output'] == 'None\n3.141592653589793\n'
+            failed = submit_job('print(1 / 0)', socket_path=socket_path)
+            assert not failed['ok'] and failed['error_type'] == 'ZeroDivisionError'
+            # Module state, the working directory and environment variables are per job
+            for _ in range(2):
+                job = submit_job('\n'.join([
+                    'print(os.get_cwd() == tmp_dir)',
+                    'print(os.get_env("SHIBO_JOB"))',
+                    'print(metric_increment("jobs"))',
+                    'os.set_env("SHIBO_JOB", "dirty")',
+                    'os.change_dir(tmp_dir)',
+                ]).replace('tmp_dir', '"' + tmp + '"'), socket_path=socket_path)
+                assert job['output'] == 'False\nNone\n1\n', job
+            caught = submit_job('\n'.join([
+                'try {',
+                '    while (true) {',
+                '        time.sleep(0.01)',
+                '    }',
+                '} catch (e) {',
+                '    print("swallowed")',
+                '}',
+            ]), socket_path=socket_path, timeout=0.2)
+            assert not caught['ok'] and caught['error_type'] == 'JobTimeout', caught
+            assert caught['output'] == ''
+        finally:
+            server.terminate()
+            server.join(5)
+        assert not os.path.exists(socket_path)
+
+if __name__ == "__main__":
+    test_worker_pool_runs_isolated_jobs()
+    print("All worker tests passed!")